@@ -1,12 +1,46 @@
 const API_BASE = 'http://localhost:3001/api';
 
+// Compact responses send each list of objects as { columns, rows } so keys go
+// over the wire once; expand them back into objects for callers.
+function isTable(value) {
+  return (
+    value !== null &&
+    typeof value === 'object' &&
+    Array.isArray(value.columns) &&
+    Array.isArray(value.rows)
+  );
+}
+
+function expandTable({ columns, rows }) {
+  return rows.map((row) => {
+    const item = {};
+    columns.forEach((column, i) => {
+      item[column] = row[i];
+    });
+    return item;
+  });
+}
+
+function expandCompact(payload) {
+  if (isTable(payload)) return expandTable(payload);
+  if (payload !== null && typeof payload === 'object' && !Array.isArray(payload)) {
+    return Object.fromEntries(
+      Object.entries(payload).map(([key, value]) => [key, isTable(value) ? expandTable(value) : value])
+    );
+  }
+  return payload;
+}
+
 async function request(endpoint, options = {}) {
   const url = `${API_BASE}${endpoint}`;
+  const { compact, ...fetchOptions } = options;
   const config = {
+    ...fetchOptions,
     headers: {
       'Content-Type': 'application/json',
+      ...(compact ? { 'X-Response-Shape': 'compact' } : {}),
+      ...fetchOptions.headers,
     },
-    ...options,
   };
 
   const response = await fetch(url, config);
@@ -20,7 +54,8 @@ async function request(endpoint, options = {}) {
     return null;
   }
 
-  return response.json();
+  const data = await response.json();
+  return response.headers.get('X-Response-Shape') === 'compact' ? expandCompact(data) : data;
 }
 
 // Problems API
@@ -31,11 +66,20 @@ export const problemsApi = {
       if (value) searchParams.append(key, value);
     });
     const query = searchParams.toString();
-    return request(`/problems${query ? `?${query}` : ''}`);
+    return request(`/problems${query ? `?${query}` : ''}`, { compact: true });
   },
 
   get: (id) => request(`/problems/${id}`),
 
+  // Many problems in one request, in the order given; unknown ids are skipped
+  getMany: (ids, { includeAttempts = false } = {}) =>
+    request('/problems/batch-get', {
+      method: 'POST',
+      body: JSON.stringify({ ids, include_attempts: includeAttempts }),
+    }),
+
+  related: (id, limit = 10) => request(`/problems/${id}/related?limit=${limit}`, { compact: true }),
+
   create: (data) =>
     request('/problems', {
       method: 'POST',
@@ -53,6 +97,25 @@ export const problemsApi = {
       method: 'DELETE',
     }),
 
+  // Bulk operations take { ids: [...] } or { filter: { difficulty, tag, status, last_attempted_before, ... } }
+  bulkDelete: (selection) =>
+    request('/problems/bulk-delete', {
+      method: 'POST',
+      body: JSON.stringify(selection),
+    }),
+
+  bulkArchive: (selection) =>
+    request('/problems/bulk-archive', {
+      method: 'POST',
+      body: JSON.stringify(selection),
+    }),
+
+  bulkUnarchive: (selection) =>
+    request('/problems/bulk-unarchive', {
+      method: 'POST',
+      body: JSON.stringify(selection),
+    }),
+
   logAttempt: (id, data) =>
     request(`/problems/${id}/attempt`, {
       method: 'POST',
@@ -67,12 +130,38 @@ export const problemsApi = {
 
 // Today API
 export const todayApi = {
-  get: () => request('/today'),
+  get: ({ groupRelated = false } = {}) =>
+    request(`/today${groupRelated ? '?group_related=true' : ''}`, { compact: true }),
+
+  plan: (minutes = 60) => request(`/today/plan?minutes=${minutes}`),
 };
 
 // Stats API
+// Dashboard API: today, stats and recent history from one consistent read
+export const dashboardApi = {
+  get: (historyLimit = 10) => request(`/dashboard?history_limit=${historyLimit}`),
+};
+
+export const suggestApi = {
+  // kind: 'tag' | 'title' | undefined (both)
+  get: (q, { kind, limit = 8 } = {}) => {
+    const searchParams = new URLSearchParams({ q, limit });
+    if (kind) searchParams.append('kind', kind);
+    return request(`/suggest?${searchParams}`);
+  },
+};
+
 export const statsApi = {
   get: () => request('/stats'),
+
+  timing: (params = {}) => {
+    const searchParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') searchParams.append(key, value);
+    });
+    const query = searchParams.toString();
+    return request(`/stats/timing${query ? `?${query}` : ''}`);
+  },
 };
 
 // History API
@@ -83,6 +172,34 @@ export const historyApi = {
       if (value !== undefined && value !== '') searchParams.append(key, value);
     });
     const query = searchParams.toString();
-    return request(`/history${query ? `?${query}` : ''}`);
+    return request(`/history${query ? `?${query}` : ''}`, { compact: true });
+  },
+};
+
+// Change events (server-sent). handlers maps event type -> callback(data);
+// onStatus(connected) reports stream state. Returns an unsubscribe function.
+export const eventsApi = {
+  subscribe: (handlers, onStatus) => {
+    const source = new EventSource(`${API_BASE}/events`);
+    Object.entries(handlers).forEach(([type, handler]) => {
+      source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+    });
+    source.onopen = () => onStatus?.(true);
+    source.onerror = () => onStatus?.(false);
+    return () => source.close();
   },
 };
+
+// Delta sync. pull(token) returns changes since token (0 = everything);
+// keep calling with the returned token while has_more is true. push sends
+// attempts recorded offline, each with a client-generated client_id so a
+// retried push is not applied twice.
+export const syncApi = {
+  pull: (since = 0) => request(`/sync?since=${since}`),
+
+  push: (attempts) =>
+    request('/sync/push', {
+      method: 'POST',
+      body: JSON.stringify({ attempts }),
+    }),
+};
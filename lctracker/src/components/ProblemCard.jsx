@@ -6,7 +6,7 @@ import QuickActions from './QuickActions';
 import { formatRelativeDate } from '../utils/formatters';
 
 export default function ProblemCard({ problem, onAction, showActions = true }) {
-  const isOverdue = new Date(problem.next_due_date) < new Date();
+  const isOverdue = Boolean(problem.next_due_date) && new Date(problem.next_due_date) < new Date();
 
   return (
     <div className="bg-white dark:bg-gray-800 rounded-lg border border-gray-200 dark:border-gray-700 p-4 hover:shadow-md transition-shadow">
@@ -152,7 +152,7 @@ export default function LibraryPage() {
             </thead>
             <tbody className="divide-y divide-gray-200 dark:divide-gray-700">
               {problems.map((problem) => {
-                const isOverdue = new Date(problem.next_due_date) < new Date();
+                const isOverdue = Boolean(problem.next_due_date) && new Date(problem.next_due_date) < new Date();
                 return (
                   <tr key={problem.id} className="hover:bg-gray-50 dark:hover:bg-gray-700">
                     <td className="px-4 py-4">
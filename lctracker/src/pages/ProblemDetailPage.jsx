@@ -139,7 +139,7 @@ export default function ProblemDetailPage() {
     );
   }
 
-  const isOverdue = new Date(problem.next_due_date) < new Date();
+  const isOverdue = Boolean(problem.next_due_date) && new Date(problem.next_due_date) < new Date();
 
   return (
     <div className="space-y-6">
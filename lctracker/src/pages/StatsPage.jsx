@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { statsApi, problemsApi } from '../api/client';
+import { statsApi, problemsApi, eventsApi } from '../api/client';
 
 export default function StatsPage() {
   const [stats, setStats] = useState(null);
@@ -38,6 +38,34 @@ export default function StatsPage() {
     fetchData();
   }, []);
 
+  // Keep the counters current from change events instead of polling
+  useEffect(() => {
+    const applyCounters = ({ counters }) =>
+      setStats((current) => (current ? { ...current, ...counters } : current));
+    const countAttempt = (data) =>
+      setStats((current) =>
+        current
+          ? {
+              ...current,
+              ...data.counters,
+              attempts_last_7_days: current.attempts_last_7_days + 1,
+              attempts_last_30_days: current.attempts_last_30_days + 1,
+            }
+          : current
+      );
+    return eventsApi.subscribe({
+      'attempt.logged': countAttempt,
+      'problem.postponed': countAttempt,
+      'problem.created': applyCounters,
+      'problem.updated': applyCounters,
+      'problem.deleted': applyCounters,
+      'problems.deleted': applyCounters,
+      'problems.archived': applyCounters,
+      'problems.unarchived': applyCounters,
+      'day.rollover': applyCounters,
+    });
+  }, []);
+
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -1,7 +1,33 @@
 import { useState, useEffect } from 'react';
-import { todayApi } from '../api/client';
+import { todayApi, eventsApi } from '../api/client';
 import ProblemCard from '../components/ProblemCard';
 
+function isDueToday(problem) {
+  const endOfToday = new Date();
+  endOfToday.setUTCHours(23, 59, 59, 999);
+  return new Date(`${problem.next_due_date}Z`) <= endOfToday;
+}
+
+// Apply a changed problem to the due/new lists without refetching
+function patchProblem(data, problem) {
+  const due = data.due.filter((p) => p.id !== problem.id);
+  const fresh = data.new.filter((p) => p.id !== problem.id);
+  if (isDueToday(problem)) {
+    due.push(problem);
+    due.sort((a, b) => a.next_due_date.localeCompare(b.next_due_date));
+  } else if (!problem.last_attempted_at && data.new.some((p) => p.id === problem.id)) {
+    fresh.push(problem);
+  }
+  return { due, new: fresh };
+}
+
+function removeProblem(data, id) {
+  return {
+    due: data.due.filter((p) => p.id !== id),
+    new: data.new.filter((p) => p.id !== id),
+  };
+}
+
 export default function TodayPage() {
   const [data, setData] = useState({ due: [], new: [] });
   const [loading, setLoading] = useState(true);
@@ -23,6 +49,37 @@ export default function TodayPage() {
     fetchData();
   }, []);
 
+  // Events patch the lists in place. Events sent while the stream is down
+  // (server restart, or closed for falling behind) are lost, so refetch
+  // once it reconnects.
+  useEffect(() => {
+    let dropped = false;
+    const onStatus = (connected) => {
+      if (!connected) {
+        dropped = true;
+      } else if (dropped) {
+        dropped = false;
+        fetchData();
+      }
+    };
+    const patch = ({ problem }) => setData((current) => patchProblem(current, problem));
+    return eventsApi.subscribe(
+      {
+        'attempt.logged': patch,
+        'problem.postponed': patch,
+        'problem.updated': patch,
+        'problem.created': ({ problem }) =>
+          setData((current) => ({ ...current, new: [problem, ...current.new].slice(0, 5) })),
+        'problem.deleted': ({ id }) => setData((current) => removeProblem(current, id)),
+        'problems.deleted': ({ ids }) => setData((current) => ids.reduce(removeProblem, current)),
+        'problems.archived': ({ ids }) => setData((current) => ids.reduce(removeProblem, current)),
+        'problems.unarchived': () => fetchData(),
+        'day.rollover': () => fetchData(),
+      },
+      onStatus
+    );
+  }, []);
+
   const today = new Date().toLocaleDateString('en-US', {
     weekday: 'long',
     year: 'numeric',
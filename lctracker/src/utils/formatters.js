@@ -1,4 +1,6 @@
 export function formatRelativeDate(dateString) {
+  // Archived problems have no due date
+  if (!dateString) return 'Not scheduled';
   const date = new Date(dateString);
   const now = new Date();
   const diffTime = date - now;
@@ -0,0 +1,269 @@
+"""
+Production launcher. From the repository root:
+
+    python -m server
+    python -m server --workers 4 --port 3001
+
+(or `python .` from the server directory). Serves main:app with uvicorn on
+LCTRACKER_SERVER_HOST:LCTRACKER_SERVER_PORT, 127.0.0.1:3001 by default,
+which is the API_BASE the frontend calls. The working directory is
+switched to server/ so the default database and the backup, export and
+profile directories resolve as they do under `uvicorn main:app`.
+
+With more than one worker the app is preloaded and forked. This process
+imports main and brings the schema up to date once, so workers never race
+through migrations. It then binds the listening socket with
+SERVER_BACKLOG and forks the workers. Workers share the imported code
+copy-on-write and accept from the one socket. Each worker drops the
+pooled connections it inherited, then runs its own lifespan (caches, due
+index, attempt writer, job runner). A worker that dies is replaced; one
+that fails its startup stops the server.
+
+SIGTERM or SIGINT is passed to every worker once. A worker stops
+accepting, gives in-flight requests up to SERVER_GRACEFUL_TIMEOUT seconds,
+then runs the lifespan shutdown, which drains the group-commit queue, so
+every attempt that got a response is committed. A second signal makes
+workers exit without waiting; workers still running 10 seconds after the
+timeout are killed.
+
+Settings that differ from plain `uvicorn main:app`:
+
+- workers: 1 by default. /api/events is fed by an in-process broker
+  (services/events.py), so with several workers a stream only carries
+  the writes handled by its own worker; the Today page would miss the
+  others, including the user's own attempts. --workers N (or 0 for one
+  per CPU available to the process, at most 4 on SQLite, where extra
+  processes only queue on the write lock) is for deployments that don't
+  rely on live events, and logs a warning. Each worker also keeps its
+  own problem cache and due index. Because these can miss another
+  worker's writes, LCTRACKER_PROBLEM_CACHE_VERIFY and
+  LCTRACKER_DUE_INDEX_VERIFY are switched on unless set explicitly.
+- event loop and HTTP parser: uvloop and httptools when installed
+  (uvicorn[standard]), asyncio and h11 otherwise. The choice is logged.
+- keep-alive: SERVER_KEEPALIVE_SECONDS instead of 5 s, so clients polling
+  every few seconds reuse their connection.
+- access log: off unless SERVER_ACCESS_LOG is set.
+
+Where fork() is unavailable, uvicorn's own supervisor is used. It spawns
+the workers, so each imports the app itself.
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+# The app uses flat imports and paths relative to the server directory
+sys.path.insert(0, SERVER_DIR)
+os.chdir(SERVER_DIR)
+
+import uvicorn  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from uvicorn.config import STARTUP_FAILURE  # noqa: E402
+
+import config  # noqa: E402
+
+logger = logging.getLogger("uvicorn.error")
+
+SQLITE_MAX_WORKERS = 4
+# Extra time past the graceful timeout for the lifespan shutdown (attempt drain, job runner)
+_SHUTDOWN_MARGIN_SECONDS = 10
+# A worker exiting sooner than this after its start is restarted after a pause
+_MIN_WORKER_SECONDS = 1.0
+
+_MULTI_WORKER_FLAGS = ("LCTRACKER_PROBLEM_CACHE_VERIFY", "LCTRACKER_DUE_INDEX_VERIFY")
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def auto_workers(database_url: str) -> int:
+    cpus = available_cpus()
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return min(cpus, SQLITE_MAX_WORKERS)
+    return cpus
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def uvicorn_options(args) -> dict:
+    """Config keyword arguments shared by the forked and the fallback paths."""
+    return {
+        "host": args.host,
+        "port": args.port,
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "backlog": args.backlog,
+        "timeout_keep_alive": args.keepalive,
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        "access_log": args.access_log,
+        "log_level": args.log_level,
+    }
+
+
+def _share_caches_across_workers() -> None:
+    # Forked workers read these attributes; spawned ones read the environment
+    for name in _MULTI_WORKER_FLAGS:
+        if name not in os.environ:
+            os.environ[name] = "1"
+    config.PROBLEM_CACHE_VERIFY = config._flag("LCTRACKER_PROBLEM_CACHE_VERIFY")
+    config.DUE_INDEX_VERIFY = config._flag("LCTRACKER_DUE_INDEX_VERIFY")
+
+
+def _exit_with_parent(parent: int) -> None:
+    # Workers run in their own process group, so a killed supervisor would otherwise leave them behind
+    while os.getppid() == parent:
+        time.sleep(1)
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def _run_worker(server_config: uvicorn.Config, sock, parent: int) -> int:
+    from database import engine
+
+    # Terminal signals go to the supervisor only, which passes them on once
+    os.setpgid(0, 0)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_DFL)
+    # Pooled connections opened before the fork belong to the supervisor
+    engine.dispose(close=False)
+    threading.Thread(target=_exit_with_parent, args=(parent,), daemon=True).start()
+    server = uvicorn.Server(server_config)
+    try:
+        server.run(sockets=[sock])
+    except SystemExit as exc:
+        return exc.code if isinstance(exc.code, int) else 1
+    return 0 if server.started else STARTUP_FAILURE
+
+
+class Supervisor:
+    """Pre-fork worker supervisor: fork, restart, forward signals, reap."""
+
+    def __init__(self, server_config: uvicorn.Config, workers: int, graceful_timeout: float):
+        self.config = server_config
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children: dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+        self.deadline = None
+        self.exit_code = 0
+
+    def spawn(self, sock) -> None:
+        parent = os.getpid()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _run_worker(self.config, sock, parent)
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def signal_children(self, sig: int) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def stop(self, *_) -> None:
+        if self.stopping:
+            # A second signal: uvicorn treats a repeated SIGINT as "exit without waiting"
+            logger.info("Forcing shutdown")
+            self.signal_children(signal.SIGINT)
+            return
+        logger.info("Stopping %d worker(s)", len(self.children))
+        self.stopping = True
+        self.deadline = time.monotonic() + self.graceful_timeout + _SHUTDOWN_MARGIN_SECONDS
+        self.signal_children(signal.SIGTERM)
+
+    def run(self) -> int:
+        sock = self.config.bind_socket()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.stop)
+        for _ in range(self.workers):
+            self.spawn(sock)
+        logger.info("Supervisor %d started %d worker(s): %s", os.getpid(), self.workers, sorted(self.children))
+        while self.children:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                logger.warning("Killing %d worker(s) still running after the graceful timeout", len(self.children))
+                self.signal_children(signal.SIGKILL)
+                self.deadline = None
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                logger.error("Worker %d failed to start; stopping", pid)
+                self.exit_code = STARTUP_FAILURE
+                self.stop()
+                continue
+            logger.warning("Worker %d exited with status %d; restarting", pid, code)
+            if time.monotonic() - started < _MIN_WORKER_SECONDS:
+                time.sleep(_MIN_WORKER_SECONDS)
+            self.spawn(sock)
+        sock.close()
+        logger.info("Supervisor %d stopped", os.getpid())
+        return self.exit_code
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m server", description="Run the LeetReview API.")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS,
+                        help="0: one per available CPU (events then stay per worker)")
+    parser.add_argument("--keepalive", type=int, default=config.SERVER_KEEPALIVE_SECONDS, metavar="SECONDS")
+    parser.add_argument("--backlog", type=int, default=config.SERVER_BACKLOG)
+    parser.add_argument("--graceful-timeout", type=int, default=config.SERVER_GRACEFUL_TIMEOUT, metavar="SECONDS")
+    parser.add_argument("--access-log", action="store_true", default=config.SERVER_ACCESS_LOG)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or auto_workers(config.DATABASE_URL)
+    if workers > 1:
+        _share_caches_across_workers()
+    options = uvicorn_options(args)
+
+    if workers > 1 and not hasattr(os, "fork"):
+        uvicorn.run("main:app", app_dir=SERVER_DIR, workers=workers, **options)
+        return 0
+
+    # Preload: import the app and migrate once, before any worker exists
+    from database import engine
+    from main import app
+    from migrations import ensure_schema
+
+    ensure_schema(engine)
+    engine.dispose()
+    server_config = uvicorn.Config(app, **options)
+    logger.info(
+        "LeetReview API on http://%s:%d: %d worker(s), %s loop, %s parser, keep-alive %ds, backlog %d",
+        args.host, args.port, workers, options["loop"], options["http"], args.keepalive, args.backlog,
+    )
+    if workers > 1:
+        logger.warning("%d workers: each /api/events stream only sees writes handled by its own worker", workers)
+    if workers == 1:
+        server = uvicorn.Server(server_config)
+        server.run()
+        return 0 if server.started else STARTUP_FAILURE
+    return Supervisor(server_config, workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
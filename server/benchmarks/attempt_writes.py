@@ -0,0 +1,97 @@
+"""
+Attempt logging latency: read-modify-write vs the single-statement path.
+
+"orm" is the shape log_attempt used to have: SELECT the problem, apply
+update_schedule in Python, flush the attempt and the problem, commit.
+"atomic" is apply_attempt(): INSERT ... SELECT ... RETURNING for the
+attempt, then one UPDATE ... RETURNING for the ladder transition.
+
+One thread, median wall time and SQL statements per attempt. That both
+paths write the same rows, and that concurrent writers lose no updates,
+is checked in tests/test_attempt_writes.py.
+
+Run from the server directory:
+
+    python -m benchmarks.attempt_writes --runs 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+OUTCOMES = ["PASS", "SHAKY", "FAIL", "SKIP", "POSTPONE"]
+
+
+def make_problems(count: int, stage: int = 0) -> list[int]:
+    from database import SessionLocal
+    from models import Problem
+
+    with SessionLocal() as db:
+        problems = [Problem(title="Bench", difficulty="MEDIUM", mastery_stage=stage) for _ in range(count)]
+        db.add_all(problems)
+        db.commit()
+        return [p.id for p in problems]
+
+
+def log_orm(problem_id: int, outcome: str, minutes=None) -> None:
+    from database import SessionLocal
+    from models import Problem
+    from services.attempts import record_attempt
+
+    with SessionLocal() as db:
+        problem = db.query(Problem).filter(Problem.id == problem_id).first()
+        record_attempt(db, problem, outcome, minutes)
+        db.commit()
+
+
+def log_atomic(problem_id: int, outcome: str, minutes=None) -> None:
+    from database import SessionLocal
+    from services.attempts import apply_attempt
+
+    with SessionLocal() as db:
+        apply_attempt(db, problem_id, outcome, minutes)
+        db.commit()
+
+
+def latency(runs: int) -> None:
+    from sqlalchemy import event
+
+    from database import engine
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    (problem_id,) = make_problems(1)
+    print(f"\n{'path':<8}{'untimed ms':>12}{'stmts':>7}{'timed ms':>10}{'stmts':>7}")
+    for name, log in (("orm", log_orm), ("atomic", log_atomic)):
+        row = []
+        for minutes in (None, 20):
+            timings = []
+            for _ in range(runs):
+                statements.clear()
+                start = time.perf_counter()
+                log(problem_id, random.choice(OUTCOMES[:4]), minutes)
+                timings.append(time.perf_counter() - start)
+            row += [statistics.median(timings) * 1000, len(statements)]
+        print(f"{name:<8}{row[0]:>12.3f}{row[1]:>7}{row[2]:>10.3f}{row[3]:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="Attempts per latency measurement")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-attempts-")
+    os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'attempts.db')}"
+
+    from database import engine
+    from migrations import migrate
+
+    migrate(engine)
+    latency(args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Snapshot cost and its effect on concurrent attempt logging.
+
+Builds a scratch SQLite database padded with --attempts historical
+attempts, then keeps writer threads logging attempts (record_attempt +
+commit, the POST /api/problems/{id}/attempts path) at --rate per second
+while taking:
+
+- nothing (baseline),
+- services.backup.snapshot() with the configured page steps,
+- a single-step backup (whole copy under one read lock),
+- VACUUM INTO (one read transaction for the whole copy).
+
+For each it prints the median copy time over --repeats copies and the
+writers' latency percentiles for attempts that started during a copy. Run from the server directory:
+
+    python -m benchmarks.backup --attempts 300000 --rate 50
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def pad_database(path: str, attempts: int) -> None:
+    rng = random.Random(0)
+    conn = sqlite3.connect(path)
+    problem_ids = [row[0] for row in conn.execute("SELECT id FROM problems")]
+    rows = (
+        (rng.choice(problem_ids), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00.000000",
+         rng.choice(["PASS", "SHAKY", "FAIL"]), rng.randint(5, 60), "x" * rng.randint(0, 120), 0, 1)
+        for _ in range(attempts)
+    )
+    conn.executemany(
+        "INSERT INTO attempts (problem_id, attempted_at, outcome, time_spent_minutes, notes, stage_before, stage_after)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+class Writers:
+    """Threads logging attempts at a fixed total rate, recording (start, latency)."""
+
+    def __init__(self, threads: int, rate: float):
+        self.threads = threads
+        self.interval = threads / rate
+        self.samples: list[tuple[float, float]] = []
+        self.errors: list[str] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _run(self, seed: int) -> None:
+        from database import SessionLocal
+        from models import Problem
+        from services.attempts import record_attempt
+
+        rng = random.Random(seed)
+        with SessionLocal() as db:
+            problem_ids = [row[0] for row in db.query(Problem.id)]
+        next_start = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    problem = db.get(Problem, rng.choice(problem_ids))
+                    record_attempt(db, problem, rng.choice(["PASS", "SHAKY", "FAIL"]), rng.randint(5, 60))
+                    db.commit()
+                latency = time.perf_counter() - start
+                with self._lock:
+                    self.samples.append((start, latency))
+            except Exception as exc:
+                with self._lock:
+                    self.errors.append(f"{type(exc).__name__}: {exc}".splitlines()[0])
+            next_start += self.interval
+            self._stop.wait(max(0.0, next_start - time.perf_counter()))
+
+    def __enter__(self):
+        self._workers = [threading.Thread(target=self._run, args=(i,), daemon=True) for i in range(self.threads)]
+        for worker in self._workers:
+            worker.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+
+    def between(self, start: float, end: float) -> list[float]:
+        with self._lock:
+            return [latency for began, latency in self.samples if start <= began < end]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=300_000)
+    parser.add_argument("--rate", type=float, default=50, help="attempts per second across all writers")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--baseline-seconds", type=float, default=1)
+    parser.add_argument("--repeats", type=int, default=5, help="copies per method")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-backup-")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["LCTRACKER_BACKUP_DIR"] = os.path.join(workdir, "backups")
+    os.environ["LCTRACKER_JOBS_ENABLED"] = "0"
+
+    import seed
+    from services import backup
+
+    seed.seed_database()
+    pad_database(db_path, args.attempts)
+    print(f"Database: {os.path.getsize(db_path) / 1e6:.1f} MB; {args.writers} writers at {args.rate:g} attempts/s")
+
+    def single_step():
+        conn, target = sqlite3.connect(db_path), sqlite3.connect(os.path.join(workdir, "single.db"))
+        conn.backup(target)
+        conn.close()
+        target.close()
+        return {}
+
+    def vacuum_into():
+        target = os.path.join(workdir, "vacuum.db")
+        if os.path.exists(target):
+            os.remove(target)
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.execute("VACUUM INTO ?", (target,))
+        conn.close()
+        return {}
+
+    def baseline():
+        time.sleep(args.baseline_seconds)
+        return {}
+
+    methods = [
+        ("baseline", baseline),
+        ("snapshot()", backup.snapshot),
+        ("single step", single_step),
+        ("VACUUM INTO", vacuum_into),
+    ]
+    print(f"{'method':<13} {'copy s':>7} {'attempts':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  notes")
+    with Writers(args.writers, args.rate) as writers:
+        time.sleep(1)
+        for label, method in methods:
+            copy_seconds, latencies, notes = [], [], ""
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                result = method() or {}
+                end = time.perf_counter()
+                copy_seconds.append(end - start)
+                # Let writes that started during the copy finish before collecting them
+                time.sleep(1)
+                latencies += [latency * 1000 for latency in writers.between(start, end)]
+                if "steps" in result:
+                    notes = f"last run: {result['steps']} steps, {result['restarts']} restarts" + (
+                        ", final pass in one step" if result["single_step"] else "")
+            print(f"{label:<13} {statistics.median(copy_seconds):>7.2f} {len(latencies):>9}"
+                  f" {statistics.median(latencies) if latencies else 0:>8.1f}"
+                  f" {percentile(latencies, 0.99):>8.1f} {max(latencies, default=0):>8.1f}  {notes}")
+    if writers.errors:
+        print(f"{len(writers.errors)} attempt writes failed, e.g. {writers.errors[0]}")
+
+    snapshot = backup.list_snapshots()[-1]
+    assert backup.verify(snapshot) == "ok"
+    result = backup.restore(snapshot)
+    print(f"Restored {os.path.basename(result['restored'])}; previous saved as {os.path.basename(result['previous'])}")
+
+
+if __name__ == "__main__":
+    main()
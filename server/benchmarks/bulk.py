@@ -0,0 +1,224 @@
+"""
+Bulk delete and archive: set-based statements against per-problem deletes.
+
+Fills a scratch SQLite database with --problems problems, each with
+--attempts-per-problem attempts and a timing sketch, then prunes --prune
+problems three ways, each on its own slice of the library:
+
+    ORM cascade    the previous delete path: load each problem and its
+                   attempts and delete them through the session (what
+                   cascade="all, delete-orphan" without passive_deletes
+                   did), in one transaction
+    DELETE each    DELETE /api/problems/{id} per problem; the attempts go
+                   through ON DELETE CASCADE
+    bulk-delete    one POST /api/problems/bulk-delete with the ids
+
+For each it reports wall time and statements executed, and checks that no
+attempt or timing sketch of a deleted problem is left.
+
+It then archives and unarchives by filter, with the due index on, and
+checks the effects. Archived problems must leave /api/today, the due
+counters and the default list. They must be listed with status=archived,
+logging an attempt must bring one back, unarchived problems must be due
+now, and sync must report the bulk deletes as tombstones.
+
+Run from the server directory:
+
+    python -m benchmarks.bulk --problems 2000 --attempts-per-problem 200 --prune 500
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def fill(problems: int, per_problem: int) -> None:
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import Attempt, Problem, ProblemTimingSketch
+
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(Problem), [
+            {"title": f"Problem {i}", "difficulty": ("EASY", "MEDIUM", "HARD")[i % 3], "tags": [f"tag-{i % 40}"],
+             "next_due_date": now + timedelta(days=rng.uniform(-10, 30)), "interval_days": 1,
+             "mastery_stage": rng.randint(0, 5), "consecutive_successes": 0,
+             "created_at": now - timedelta(days=400), "updated_at": now,
+             "last_attempted_at": now - timedelta(days=rng.uniform(1, 300))}
+            for i in range(problems)
+        ])
+        for start in range(0, problems * per_problem, 100000):
+            db.execute(insert(Attempt), [
+                {"problem_id": n // per_problem + 1, "attempted_at": now - timedelta(minutes=n),
+                 "outcome": rng.choice(["PASS", "SHAKY", "FAIL"]), "time_spent_minutes": rng.randint(5, 60)}
+                for n in range(start, min(start + 100000, problems * per_problem))
+            ])
+        db.execute(insert(ProblemTimingSketch), [
+            {"problem_id": i + 1, "count": per_problem, "digest": b"", "median_minutes": 30.0}
+            for i in range(problems)
+        ])
+        db.commit()
+
+
+class Statements:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def orm_cascade(ids: list[int]) -> None:
+    from database import SessionLocal
+    from models import Problem
+
+    with SessionLocal() as db:
+        for problem in db.query(Problem).filter(Problem.id.in_(ids)):
+            # A loaded collection is still cascaded by the ORM, one attempt at a time
+            problem.attempts
+            db.delete(problem)
+        db.commit()
+
+
+def leftovers(ids: list[int]) -> tuple[int, int]:
+    from sqlalchemy import func
+
+    from database import SessionLocal
+    from models import Attempt, ProblemTimingSketch
+
+    with SessionLocal() as db:
+        attempts = db.query(func.count(Attempt.id)).filter(Attempt.problem_id.in_(ids)).scalar()
+        sketches = db.query(func.count(ProblemTimingSketch.problem_id)).filter(
+            ProblemTimingSketch.problem_id.in_(ids)
+        ).scalar()
+    return attempts, sketches
+
+
+def prune(client, engine, prune_count: int, per_problem: int) -> None:
+    slices = {name: list(range(index * prune_count + 1, (index + 1) * prune_count + 1))
+              for index, name in enumerate(("ORM cascade", "DELETE each", "bulk-delete"))}
+    print(f"pruning {prune_count} problems with {per_problem} attempts each ({prune_count * per_problem} attempts)")
+    print(f"{'':>14}{'ms':>10}{'statements':>12}")
+    for name, ids in slices.items():
+        start = time.perf_counter()
+        with Statements(engine) as statements:
+            if name == "ORM cascade":
+                orm_cascade(ids)
+            elif name == "DELETE each":
+                for problem_id in ids:
+                    assert client.delete(f"/api/problems/{problem_id}").status_code == 204
+            else:
+                body = client.post("/api/problems/bulk-delete", json={"ids": ids}).json()
+                assert body["count"] == len(ids), body
+        elapsed = time.perf_counter() - start
+        assert leftovers(ids) == (0, 0), (name, leftovers(ids))
+        print(f"{name:>14}{elapsed * 1000:>10.0f}{statements.count:>12}")
+
+
+def archive_checks(client) -> None:
+    from database import SessionLocal
+    from models import Problem
+
+    def due_ids():
+        body = client.get("/api/today").json()
+        return {p["id"] for p in body["due"]}
+
+    def counters():
+        body = client.get("/api/stats").json()
+        return body["due_today"], body["overdue"]
+
+    def sql_counters():
+        now = datetime.utcnow()
+        end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        with SessionLocal() as db:
+            return (db.query(Problem).filter(Problem.next_due_date <= end).count(),
+                    db.query(Problem).filter(Problem.next_due_date < start).count())
+
+    with SessionLocal() as db:
+        hard = {problem_id for (problem_id,) in db.query(Problem.id).filter(Problem.difficulty == "HARD")}
+    token = client.get("/api/sync", params={"since": 0}).json()["token"]
+
+    start = time.perf_counter()
+    body = client.post("/api/problems/bulk-archive", json={"filter": {"difficulty": "HARD"}}).json()
+    archive_ms = (time.perf_counter() - start) * 1000
+    assert set(body["ids"]) == hard, "archive by filter missed problems"
+    assert client.post("/api/problems/bulk-archive", json={"filter": {"difficulty": "HARD"}}).json()["count"] == 0
+    assert not due_ids() & hard, "archived problems still in the queue"
+    assert counters() == sql_counters(), (counters(), sql_counters())
+    listed = {p["id"] for p in client.get("/api/problems").json()}
+    assert not listed & hard, "archived problems in the default list"
+    assert {p["id"] for p in client.get("/api/problems", params={"status": "archived"}).json()} == hard
+    one = min(hard)
+    assert client.get("/api/problems", params={"ids": str(one)}).json()[0]["archived_at"] is not None
+
+    client.post(f"/api/problems/{one}/attempt", json={"outcome": "PASS"})
+    revived = client.get(f"/api/problems/{one}").json()
+    assert revived["archived_at"] is None and revived["next_due_date"] is not None, revived
+
+    start = time.perf_counter()
+    body = client.post("/api/problems/bulk-unarchive", json={"filter": {"status": "archived"}}).json()
+    unarchive_ms = (time.perf_counter() - start) * 1000
+    assert set(body["ids"]) == hard - {one}, "unarchive by filter missed problems"
+    assert hard - {one} <= due_ids(), "unarchived problems are not due"
+    assert counters() == sql_counters(), (counters(), sql_counters())
+    print(f"\narchive {len(hard)} by filter {archive_ms:.0f} ms, unarchive {len(hard) - 1} {unarchive_ms:.0f} ms; "
+          "queue, counters, list, attempt revival ok")
+
+    pruned = client.post("/api/problems/bulk-delete",
+                         json={"filter": {"last_attempted_before": (datetime.utcnow() - timedelta(days=250)).isoformat()}}
+                         ).json()
+    tombstones = client.get("/api/sync", params={"since": token, "limit": 5000}).json()["deleted"]["problems"]
+    assert set(pruned["ids"]) <= set(tombstones), "bulk delete missing from sync"
+    print(f"pruned {pruned['count']} not attempted in 250 days by filter; sync tombstones ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=2000)
+    parser.add_argument("--attempts-per-problem", type=int, default=200)
+    parser.add_argument("--prune", type=int, default=500, help="Problems deleted by each method")
+    args = parser.parse_args()
+    assert args.prune * 3 < args.problems, "--problems must leave room for three prune slices"
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-bulk-")
+    os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bulk.db')}"
+    os.environ["LCTRACKER_JOBS_ENABLED"] = "0"
+    os.environ["LCTRACKER_DUE_INDEX"] = "1"
+
+    from fastapi.testclient import TestClient
+
+    from database import engine
+    from main import app
+    from migrations import migrate
+
+    migrate(engine)
+    start = time.perf_counter()
+    fill(args.problems, args.attempts_per_problem)
+    print(f"filled {args.problems} problems, {args.problems * args.attempts_per_problem} attempts "
+          f"in {time.perf_counter() - start:.1f}s\n")
+
+    with TestClient(app) as client:
+        prune(client, engine, args.prune, args.attempts_per_problem)
+        archive_checks(client)
+
+
+if __name__ == "__main__":
+    main()
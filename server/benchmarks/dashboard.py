@@ -0,0 +1,153 @@
+"""
+Cold page load and consistency of /api/dashboard.
+
+1. Page load: with an empty problem cache, the requests the app used to
+   make on open (today, stats, history and a few problem details) against
+   GET /api/dashboard plus one POST /api/problems/batch-get. Reports
+   requests, SQL statements and wall time for each.
+2. Consistency: a writer thread logs PASS attempts (each moves a due
+   problem out of today) while readers build today, stats and history
+   either in separate sessions, as separate requests would, or in one
+   session under begin_read_snapshot as the dashboard does. Every read is
+   checked for stats.due_today == len(today.due) and
+   stats.attempts_last_7_days == history.total.
+
+Run from the server directory:
+
+    python -m benchmarks.dashboard --problems 2000 --details 5
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+
+def fill(count: int) -> None:
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import Problem
+
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(Problem), [
+            {"title": f"Problem {i}", "difficulty": ("EASY", "MEDIUM", "HARD")[i % 3], "tags": ["array", f"t{i % 20}"],
+             "next_due_date": now - timedelta(hours=i % 48), "interval_days": 1, "mastery_stage": 0,
+             "consecutive_successes": 0, "created_at": now, "updated_at": now}
+            for i in range(count)
+        ])
+        db.commit()
+
+
+def page_loads(client, details: int, runs: int) -> None:
+    from services.problem_cache import problem_cache
+    from services.query_budget import count_statements
+
+    ids = [p["id"] for p in client.get("/api/today").json()["due"][:details]]
+
+    def before():
+        client.get("/api/today")
+        client.get("/api/stats")
+        client.get("/api/history", params={"limit": 10})
+        for problem_id in ids:
+            client.get(f"/api/problems/{problem_id}")
+        return 3 + len(ids)
+
+    def after():
+        client.get("/api/dashboard")
+        client.post("/api/problems/batch-get", json={"ids": ids, "include_attempts": True})
+        return 2
+
+    print(f"{'flow':>10} {'requests':>9} {'statements':>11} {'cold ms':>8}")
+    for name, flow in (("separate", before), ("dashboard", after)):
+        timings = []
+        for _ in range(runs):
+            problem_cache.clear()
+            with count_statements() as counter:
+                start = time.perf_counter()
+                requests = flow()
+                timings.append(time.perf_counter() - start)
+        print(f"{name:>10} {requests:>9} {counter.count:>11} {statistics.median(timings) * 1000:>8.1f}")
+
+
+def consistency(seconds: float) -> None:
+    from database import SessionLocal, begin_read_snapshot
+    from models import Problem
+    from routers.history import recent_history
+    from routers.stats import build_stats
+    from routers.today import build_today
+    from services.attempts import record_attempt
+
+    stop = threading.Event()
+
+    def writer():
+        with SessionLocal() as db:
+            for problem in db.query(Problem).order_by(Problem.id):
+                if stop.is_set():
+                    return
+                record_attempt(db, problem, "PASS")
+                db.commit()
+                time.sleep(0.001)
+
+    def read(snapshot: bool):
+        if snapshot:
+            with SessionLocal() as db:
+                begin_read_snapshot(db)
+                return build_today(db), build_stats(db), recent_history(db, limit=10)
+        results = []
+        for build in (build_today, build_stats, lambda db: recent_history(db, limit=10)):
+            with SessionLocal() as db:
+                results.append(build(db))
+        return results
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    counts = {True: [0, 0], False: [0, 0]}
+    deadline = time.monotonic() + seconds
+    snapshot = False
+    while time.monotonic() < deadline and thread.is_alive():
+        today, stats, history = read(snapshot)
+        consistent = stats.due_today == len(today["due"]) and stats.attempts_last_7_days == history["total"]
+        counts[snapshot][0] += 1
+        counts[snapshot][1] += not consistent
+        snapshot = not snapshot
+    stop.set()
+    thread.join()
+
+    print(f"\n{'reads':>10} {'count':>6} {'inconsistent':>13}")
+    for snapshot, label in ((False, "separate"), (True, "snapshot")):
+        print(f"{label:>10} {counts[snapshot][0]:>6} {counts[snapshot][1]:>13}")
+    assert counts[True][1] == 0, "a snapshot read saw two different states"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=2000)
+    parser.add_argument("--details", type=int, default=5, help="problem detail requests in the old page load")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=5.0, help="length of the consistency run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-dashboard-")
+    os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'dashboard.db')}"
+
+    from fastapi.testclient import TestClient
+
+    from database import engine
+    from main import app
+    from migrations import migrate
+
+    migrate(engine)
+    fill(args.problems)
+    with TestClient(app) as client:
+        page_loads(client, args.details, args.runs)
+    consistency(args.seconds)
+
+
+if __name__ == "__main__":
+    main()
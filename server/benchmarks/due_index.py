@@ -0,0 +1,184 @@
+"""
+Due-date index: query latency and consistency.
+
+1. Latency: a scratch SQLite database with --problems rows. Times the
+   due_counts() counters, the due list behind /api/today and the
+   status=overdue listing, each from SQL and from the index.
+2. Consistency: random attempts, postpones, creates, edits and deletes
+   through the API, then DueIndex.check() against the table. Then another
+   worker is simulated by writing rows and change-log entries on a
+   separate connection that the index never hears about. Without
+   DUE_INDEX_VERIFY, check() must report and repair those rows. With it,
+   the next read must already have caught up.
+
+Run from the server directory:
+
+    python -m benchmarks.due_index --problems 10000 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def fill(count: int) -> None:
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import Problem
+
+    rng = random.Random(count)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(Problem), [
+            {"title": f"Problem {i}", "difficulty": "MEDIUM", "tags": ["array"],
+             "next_due_date": now + timedelta(days=rng.uniform(-30, 60)), "interval_days": 1,
+             "mastery_stage": rng.randint(0, 5), "consecutive_successes": 0, "created_at": now, "updated_at": now}
+            for i in range(count)
+        ])
+        db.commit()
+
+
+def median_ms(fn, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def latency(count: int, runs: int) -> None:
+    import config
+    from database import SessionLocal
+    from models import Problem
+    from services.due_index import due_index
+    from services.scheduling import due_counts
+
+    now = datetime.utcnow()
+    end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        due_index.load(db)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        def sql_due():
+            return (db.query(Problem.id, Problem.updated_at).filter(Problem.next_due_date <= end_of_today)
+                    .order_by(Problem.next_due_date.asc()).all())
+
+        def sql_overdue():
+            return (db.query(Problem.id, Problem.updated_at).filter(Problem.next_due_date < now)
+                    .order_by(Problem.next_due_date.asc()).all())
+
+        config.DUE_INDEX = False
+        sql = (median_ms(lambda: due_counts(db, now), runs), median_ms(sql_due, runs), median_ms(sql_overdue, runs))
+        expected = (due_counts(db, now), [row[0] for row in sql_due()])
+        config.DUE_INDEX = True
+        index = (
+            median_ms(lambda: due_counts(db, now), runs),
+            median_ms(lambda: due_index.rows_between(end=end_of_today), runs),
+            median_ms(lambda: due_index.rows_between(end=now, include_end=False), runs),
+        )
+        assert due_counts(db, now) == expected[0], (due_counts(db, now), expected[0])
+        assert sorted(row[0] for row in due_index.rows_between(end=end_of_today)) == sorted(expected[1])
+    for name, sql_ms, index_ms in zip(("counters", "due list", "overdue list"), sql, index):
+        print(f"{count:>8} {name:>13} {sql_ms:>9.3f} {index_ms:>9.3f}")
+    print(f"{count:>8} {'index load':>13} {'':>9} {load_ms:>9.1f}")
+
+
+def consistency(rounds: int) -> None:
+    from fastapi.testclient import TestClient
+    from sqlalchemy import update
+
+    import config
+    from database import SessionLocal, engine
+    from main import app
+    from models import Problem
+    from services.changes import record_changes
+    from services.due_index import due_index
+
+    rng = random.Random(7)
+    with TestClient(app) as client:
+        ids = [p["id"] for p in client.get("/api/problems").json()][:200]
+        for _ in range(rounds):
+            action = rng.random()
+            problem_id = rng.choice(ids)
+            if action < 0.5:
+                client.post(f"/api/problems/{problem_id}/attempt", json={"outcome": rng.choice(["PASS", "FAIL", "SHAKY"])})
+            elif action < 0.65:
+                client.post(f"/api/problems/{problem_id}/postpone")
+            elif action < 0.8:
+                client.put(f"/api/problems/{problem_id}", json={"notes_trick": f"edit {rng.random()}"})
+            elif action < 0.9:
+                ids.append(client.post("/api/problems", json={"title": "New", "difficulty": "EASY"}).json()["id"])
+            elif len(ids) > 10:
+                ids.remove(problem_id)
+                client.delete(f"/api/problems/{problem_id}")
+        with SessionLocal() as db:
+            report = due_index.check(db, repair=False)
+        print(f"after {rounds} API writes: consistent={report['consistent']} ({report['checked']} rows)")
+        assert report["consistent"], report
+
+        # Another worker: a plain connection, so no session hooks fire here
+        def other_worker_write(problem_ids):
+            with engine.begin() as conn:
+                conn.execute(update(Problem).where(Problem.id.in_(problem_ids))
+                             .values(next_due_date=datetime.utcnow() - timedelta(days=400)))
+            with SessionLocal() as db:
+                record_changes(db, "problem", problem_ids)
+                db.commit()
+
+        foreign = rng.sample(ids, 5)
+        other_worker_write(foreign)
+        with SessionLocal() as db:
+            report = due_index.check(db, repair=True)
+        print(f"other worker, no verify: mismatched={report['mismatched']} (repaired)")
+        assert sorted(report["mismatched"]) == sorted(foreign), report
+        with SessionLocal() as db:
+            assert due_index.check(db, repair=False)["consistent"]
+
+        foreign = rng.sample(ids, 5)
+        other_worker_write(foreign)
+        config.DUE_INDEX_VERIFY = True
+        overdue = client.get("/api/stats").json()["overdue"]
+        with SessionLocal() as db:
+            report = due_index.check(db, repair=False)
+        config.DUE_INDEX_VERIFY = False
+        print(f"other worker, verify: consistent={report['consistent']} after one read (overdue={overdue})")
+        assert report["consistent"], report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=500, help="random API writes in the consistency check")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-due-index-")
+    os.environ["LCTRACKER_DUE_INDEX"] = "1"
+    for count in args.problems:
+        os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, f'due-{count}.db')}"
+        # Modules bind the engine at import; reload them against this size's database
+        for name in [name for name in sys.modules if name in ("config", "database", "models", "migrations", "main")
+                     or name.startswith(("services", "routers"))]:
+            del sys.modules[name]
+        from database import engine
+        from migrations import migrate
+
+        migrate(engine)
+        fill(count)
+        print(f"\n{'problems':>8} {'query':>13} {'sql ms':>9} {'index ms':>9}")
+        latency(count, args.runs)
+        if count == args.problems[0]:
+            # Before the next reload: stale copies of the modules keep their session hooks
+            consistency(args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Columnar export: write, append and load times, and a round-trip check.
+
+Fills a scratch SQLite database with --problems problems and --attempts
+attempts, then for each format:
+
+1. Full export, then an incremental one after --append new attempts.
+2. load(), with the time to first read a column (the mean of
+   time_spent_minutes) and the resident set size before and after. A
+   zero-copy load maps the files, so its time doesn't grow with row count.
+3. Every exported column is compared with the database after decoding.
+4. An interrupted run is simulated: junk is appended past the manifest's
+   counts. The next export must truncate it.
+
+For comparison, it also times paging the same attempts through
+/api/history?include_archived=true as JSON.
+
+Run from the server directory:
+
+    python -m benchmarks.export --attempts 1000000
+"""
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def fill(problems: int, attempts: int) -> None:
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import Problem
+
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    outcomes = ["PASS", "PASS", "SHAKY", "FAIL", "SKIP", "POSTPONE"]
+    with SessionLocal() as db:
+        db.execute(insert(Problem), [
+            {"title": f"Problem {i}", "difficulty": ("EASY", "MEDIUM", "HARD")[i % 3],
+             "tags": rng.sample([f"tag-{t}" for t in range(60)], rng.randint(0, 4)),
+             "next_due_date": now + timedelta(days=rng.uniform(-10, 30)), "interval_days": 1,
+             "mastery_stage": rng.randint(0, 5), "consecutive_successes": 0, "created_at": now, "updated_at": now,
+             "last_outcome": rng.choice(outcomes + [None])}
+            for i in range(problems)
+        ])
+        add_attempts(db, problems, attempts, rng, now - timedelta(days=400))
+        db.commit()
+
+
+def add_attempts(db, problems: int, count: int, rng, start: datetime) -> None:
+    from sqlalchemy import insert
+
+    from models import Attempt
+
+    outcomes = ["PASS", "PASS", "SHAKY", "FAIL", "SKIP", "POSTPONE"]
+    for offset in range(0, count, 100000):
+        db.execute(insert(Attempt), [
+            {"problem_id": rng.randint(1, problems), "attempted_at": start + timedelta(seconds=30 * (offset + i)),
+             "outcome": rng.choice(outcomes), "time_spent_minutes": rng.choice([None, rng.randint(5, 60)]),
+             "stage_before": rng.randint(0, 5), "stage_after": rng.randint(0, 5),
+             "next_due_date_after": start + timedelta(days=rng.randint(1, 60))}
+            for i in range(min(100000, count - offset))
+        ])
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def check_round_trip(data: dict, fmt: str) -> None:
+    import numpy as np
+    from sqlalchemy import select
+
+    from database import SessionLocal
+    from models import Problem
+    from services.archive import ATTEMPTS_ALL
+
+    dictionaries = data["dictionaries"]
+    attempts = data["attempts"]
+    problems = data["problems"]
+    if fmt == "arrow":
+        attempts = {name: attempts[name].to_numpy(zero_copy_only=False) for name in ("id", "outcome", "attempted_at",
+                                                                                        "time_spent_minutes")}
+        outcome = attempts["outcome"]
+        problems = {"id": problems["id"].to_numpy(), "title": problems["title"].to_numpy(zero_copy_only=False)}
+        tags = data["problem_tags"].to_pydict()
+        tag_pairs = set(zip(tags["problem_id"], tags["tag"]))
+    else:
+        outcome = np.array(dictionaries["outcome"], dtype=object)[attempts["outcome"]]
+        tag_names = np.array(dictionaries["tag"], dtype=object)
+        tag_pairs = set(zip(data["problem_tags"]["problem_id"].tolist(), tag_names[data["problem_tags"]["tag"]]))
+
+    with SessionLocal() as db:
+        rows = db.execute(select(ATTEMPTS_ALL.c.id, ATTEMPTS_ALL.c.outcome, ATTEMPTS_ALL.c.attempted_at,
+                                 ATTEMPTS_ALL.c.time_spent_minutes).order_by(ATTEMPTS_ALL.c.id)).all()
+        problem_rows = db.query(Problem.id, Problem.title, Problem.tags).order_by(Problem.id).all()
+    ids, outcomes, attempted_at, minutes = zip(*rows)
+    assert np.array_equal(np.asarray(attempts["id"]), np.array(ids)), "attempt ids differ"
+    assert list(outcome) == list(outcomes), "outcomes differ"
+    assert np.array_equal(np.asarray(attempts["attempted_at"], dtype="datetime64[us]"),
+                          np.array(attempted_at, dtype="datetime64[us]")), "attempted_at differs"
+    assert np.allclose(np.asarray(attempts["time_spent_minutes"], dtype=np.float64),
+                       np.array(minutes, dtype=np.float64), equal_nan=True), "time_spent_minutes differs"
+    assert list(problems["id"]) == [row.id for row in problem_rows]
+    assert list(problems["title"]) == [row.title for row in problem_rows]
+    assert tag_pairs == {(row.id, tag) for row in problem_rows for tag in row.tags}, "tags differ"
+
+
+def run_format(fmt: str, directory: str, problems: int, append: int) -> None:
+    import numpy as np
+
+    from database import SessionLocal
+    from services import export
+
+    full = export.export(directory, fmt, full=True)
+    with SessionLocal() as db:
+        add_attempts(db, problems, append, random.Random(2), datetime.utcnow())
+        db.commit()
+    incremental = export.export(directory, fmt)
+    unchanged = export.export(directory, fmt)
+    assert unchanged["unchanged"], unchanged
+    print(f"{fmt:>6} full export       {full['attempts']:>9} attempts  {full['seconds'] * 1000:>9.0f} ms")
+    print(f"{fmt:>6} incremental       {incremental['appended']:>9} attempts  {incremental['seconds'] * 1000:>9.0f} ms")
+
+    before = rss_mb()
+    start = time.perf_counter()
+    data = export.load(directory)
+    loaded = time.perf_counter() - start
+    minutes = data["attempts"]["time_spent_minutes"]
+    if fmt == "npy":
+        mean = float(np.nanmean(minutes))
+    else:
+        import pyarrow.compute as pc
+
+        mean = pc.mean(minutes).as_py()
+    first_read = time.perf_counter() - start
+    print(f"{fmt:>6} load              {len(data['attempts']['id']) if fmt == 'npy' else data['attempts'].num_rows:>9}"
+          f" attempts  {loaded * 1000:>9.2f} ms  (+ first column mean {first_read * 1000:.1f} ms, "
+          f"RSS +{rss_mb() - before:.0f} MB, mean {mean:.2f})")
+
+    check_round_trip(data, fmt)
+
+    # Interrupted append: bytes or part files past what the manifest records
+    manifest = export.read_manifest(directory)
+    if fmt == "npy":
+        with open(os.path.join(directory, "attempts", "id.npy"), "ab") as f:
+            f.write(b"\xff" * 8 * 1000)
+    else:
+        stray = f"part-{len(manifest['attempts']['parts']) + 1:06d}.arrow"
+        with open(os.path.join(directory, "attempts", stray), "wb") as f:
+            f.write(b"\xff" * 1000)
+    with SessionLocal() as db:
+        add_attempts(db, problems, 10, random.Random(3), datetime.utcnow())
+        db.commit()
+    after = export.export(directory, fmt)
+    assert after["attempts"] == manifest["attempts"]["rows"] + 10, after
+    check_round_trip(export.load(directory), fmt)
+    print(f"{fmt:>6} round trip and interrupted-append recovery ok")
+
+
+def scrape_json(client, limit: int = 200) -> tuple[int, float]:
+    start = time.perf_counter()
+    rows, offset = 0, 0
+    while True:
+        page = client.get("/api/history", params={"limit": limit, "offset": offset, "include_archived": True}).json()
+        rows += len(page["attempts"])
+        offset += limit
+        if offset >= page["total"] or offset >= 20000:
+            return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=3000)
+    parser.add_argument("--attempts", type=int, default=1000000)
+    parser.add_argument("--append", type=int, default=10000, help="attempts added before the incremental run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-export-")
+    os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'export.db')}"
+    os.environ["LCTRACKER_JOBS_ENABLED"] = "0"
+
+    from fastapi.testclient import TestClient
+
+    from database import engine
+    from main import app
+    from migrations import migrate
+    from services import export
+
+    migrate(engine)
+    start = time.perf_counter()
+    fill(args.problems, args.attempts)
+    print(f"filled {args.problems} problems, {args.attempts} attempts in {time.perf_counter() - start:.1f}s\n")
+
+    formats = export.available_formats()
+    for fmt in formats:
+        run_format(fmt, os.path.join(workdir, fmt), args.problems, args.append)
+    if "arrow" not in formats:
+        print(" arrow skipped (pyarrow not installed)")
+
+    with TestClient(app) as client:
+        rows, seconds = scrape_json(client)
+    print(f"\n  json /api/history {rows:>9} attempts  {seconds * 1000:>9.0f} ms "
+          f"(~{seconds * args.attempts / rows:.0f} s for all {args.attempts})")
+
+
+if __name__ == "__main__":
+    main()
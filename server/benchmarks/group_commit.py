@@ -0,0 +1,105 @@
+"""
+Attempt-logging throughput: direct per-request commits vs group commit.
+
+Runs against a throwaway SQLite file. Each of --threads workers logs
+--attempts attempts against random problems, first through the direct path
+(one transaction per attempt, as log_attempt does by default) and then
+through AttemptWriter. Run from the server directory:
+
+    python -m benchmarks.group_commit --threads 32 --attempts 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+OUTCOMES = ["PASS", "SHAKY", "FAIL", "SKIP"]
+
+
+def run_workers(threads: int, attempts: int, log_one) -> dict:
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = []
+        for _ in range(attempts):
+            start = time.perf_counter()
+            try:
+                log_one(rng)
+            except Exception as exc:
+                with lock:
+                    errors.append(type(exc).__name__)
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=50, help="Attempts per thread")
+    parser.add_argument("--problems", type=int, default=500)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Imported after the URL is set so the engine points at the scratch file
+    from database import SessionLocal, engine
+    from migrations import migrate
+    from models import Problem
+    from services.attempts import AttemptWriter, apply_attempt
+
+    migrate(engine)
+    with SessionLocal() as db:
+        db.add_all(Problem(title=f"Problem {i}", difficulty="MEDIUM") for i in range(args.problems))
+        db.commit()
+
+    def direct(rng):
+        with SessionLocal() as db:
+            apply_attempt(db, rng.randint(1, args.problems), rng.choice(OUTCOMES))
+            db.commit()
+
+    writer = AttemptWriter(args.max_batch, args.max_delay_ms)
+
+    def grouped(rng):
+        writer.submit(rng.randint(1, args.problems), rng.choice(OUTCOMES)).result()
+
+    print(f"{args.threads} threads x {args.attempts} attempts, {args.problems} problems")
+    results = {"direct": run_workers(args.threads, args.attempts, direct)}
+    writer.start()
+    results["group commit"] = run_workers(args.threads, args.attempts, grouped)
+    writer.stop()
+
+    print(f"{'mode':<14}{'attempts/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['throughput']:>12.0f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
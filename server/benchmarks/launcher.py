@@ -0,0 +1,200 @@
+"""
+`python -m server` against a default `uvicorn main:app`.
+
+Seeds one scratch SQLite database and starts each configuration on it in
+turn:
+
+    uvicorn main:app            uvicorn's defaults (uvloop and httptools
+                                when installed, access log on, 5 s keep-alive)
+    uvicorn, no extras          --loop asyncio --http h11, what a plain
+                                `pip install uvicorn` runs
+    python -m server            the launcher's tuned settings
+
+For each one it reports the time until /health answers, the resident memory
+of the server's processes, and req/s and latency percentiles for closed-loop
+users running the load test's review/stats/browse mix against the same
+endpoints. It also reports whether a connection left idle for --idle
+seconds is still open. The load generator runs on the same machine, so
+with few CPUs the throughput numbers are relative.
+
+Then a shutdown check runs the launcher with --drain-workers workers and
+group commit on. Users log attempts until SIGTERM is sent mid-load. Every
+attempt that got a 2xx must be in the database once the server has
+exited, and no request may fail with a 5xx while it drains.
+
+Run from the server directory:
+
+    python -m benchmarks.launcher --users 16 --duration 15
+"""
+
+import argparse
+import asyncio
+import http.client
+import os
+import random
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.loadtest import SERVER_DIR, free_port, parse_mix, run_step, seed_database, summarize
+
+REPO_DIR = os.path.dirname(SERVER_DIR)
+# name -> (python arguments, working directory); the launcher runs from the repository root
+CONFIGURATIONS = {
+    "uvicorn main:app": (["-m", "uvicorn", "main:app"], SERVER_DIR),
+    "uvicorn, no extras": (["-m", "uvicorn", "main:app", "--loop", "asyncio", "--http", "h11"], SERVER_DIR),
+    "python -m server": (["-m", "server"], REPO_DIR),
+}
+
+
+def start(arguments: list, cwd: str, env: dict) -> tuple[subprocess.Popen, str, float]:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *arguments, "--port", str(port)],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{arguments} exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url, time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Server did not become healthy within 30s")
+
+
+def tree_rss_mb(pid: int) -> float:
+    """Resident memory of a process and its children."""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        return 0.0
+    total = 0
+    for each in pids:
+        try:
+            with open(f"/proc/{each}/statm") as f:
+                total += int(f.read().split()[1])
+        except OSError:
+            pass
+    return total * resource.getpagesize() / 2 ** 20
+
+
+def survives_idle(url: str, idle: float) -> bool:
+    """Whether a keep-alive connection still answers after `idle` seconds of silence."""
+    host, port = url.removeprefix("http://").split(":")
+    connection = http.client.HTTPConnection(host, int(port), timeout=5)
+    try:
+        connection.request("GET", "/health")
+        connection.getresponse().read()
+        time.sleep(idle)
+        connection.request("GET", "/health")
+        connection.getresponse().read()
+        return True
+    except (http.client.HTTPException, OSError):
+        return False
+    finally:
+        connection.close()
+
+
+async def drain_load(url: str, process: subprocess.Popen, users: int, problems: int, signal_after: float) -> dict:
+    acknowledged, server_errors, refused = 0, 0, 0
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    stop_at = time.perf_counter() + signal_after
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+
+        async def user(index: int) -> None:
+            nonlocal acknowledged, server_errors, refused
+            rng = random.Random(index)
+            while True:
+                try:
+                    response = await client.post(f"/api/problems/{rng.randint(1, problems)}/attempt",
+                                                 json={"outcome": rng.choice(["PASS", "SHAKY", "FAIL"])})
+                except httpx.HTTPError:
+                    refused += 1
+                    return
+                if response.status_code < 300:
+                    acknowledged += 1
+                elif response.status_code >= 500:
+                    server_errors += 1
+
+        async def terminate() -> None:
+            await asyncio.sleep(max(0.0, stop_at - time.perf_counter()))
+            process.send_signal(signal.SIGTERM)
+
+        await asyncio.gather(terminate(), *(user(i) for i in range(users)))
+    return {"acknowledged": acknowledged, "server_errors": server_errors, "disconnected": refused}
+
+
+def count_attempts() -> int:
+    from sqlalchemy import func, select
+
+    from database import SessionLocal
+    from models import Attempt
+
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(Attempt))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=16, help="Concurrent closed-loop users")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load per configuration")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("review=6,stats=2,browse=2"))
+    parser.add_argument("--idle", type=float, default=7, help="Idle seconds for the keep-alive check")
+    parser.add_argument("--problems", type=int, default=500)
+    parser.add_argument("--history", type=int, default=5000)
+    parser.add_argument("--drain-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='lctracker-launcher-'), 'launcher.db')}"
+    seed_database(database_url, args.problems, args.history)
+    env = {**os.environ, "LCTRACKER_DATABASE_URL": database_url, "LCTRACKER_JOBS_ENABLED": "0"}
+    print(f"{args.users} users, think 0, {args.duration:.0f}s each, {os.cpu_count()} CPU(s)\n")
+
+    print(f"{'configuration':<20}{'start s':>8}{'RSS MB':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'err %':>7}"
+          f"  idle {args.idle:.0f}s")
+    for name, (arguments, cwd) in CONFIGURATIONS.items():
+        process, url, startup = start(arguments, cwd, env)
+        try:
+            recorder, elapsed = asyncio.run(run_step(url, args.users, args.duration, args.mix, 0, 0))
+            result = summarize(args.users, recorder, elapsed)
+            rss = tree_rss_mb(process.pid)
+            kept = survives_idle(url, args.idle)
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+        print(f"{name:<20}{startup:>8.2f}{rss:>8.0f}{result['rps']:>9.1f}{result['p50_ms']:>9.1f}"
+              f"{result['p99_ms']:>9.1f}{result['error_rate'] * 100:>7.2f}  {'kept' if kept else 'closed'}")
+
+    before = count_attempts()
+    drain_env = {**env, "LCTRACKER_GROUP_COMMIT": "1"}
+    process, url, _ = start(["-m", "server", "--workers", str(args.drain_workers)], REPO_DIR, drain_env)
+    outcome = asyncio.run(drain_load(url, process, args.users, args.problems, signal_after=2))
+    process.wait(timeout=60)
+    stored = count_attempts() - before
+    print(f"\nSIGTERM under load ({args.drain_workers} workers, group commit): {outcome['acknowledged']} attempts "
+          f"acknowledged, {stored} stored, {outcome['server_errors']} 5xx, exit status {process.returncode}")
+    assert stored >= outcome["acknowledged"], "acknowledged attempts lost on shutdown"
+    assert outcome["server_errors"] == 0, "requests failed while draining"
+    assert process.returncode == 0, process.returncode
+
+
+if __name__ == "__main__":
+    main()
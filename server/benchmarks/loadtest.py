@@ -0,0 +1,342 @@
+"""
+Load generator replaying peak-hour usage of the lctracker pages.
+
+Starts uvicorn on a scratch database (or targets --url), then runs virtual
+users for each step of --users, each looping one scenario:
+
+    review   TodayPage + ProblemDetailPage: load /api/today, open a few due
+             problems and log attempts in quick succession, reload today
+    stats    StatsPage: poll /api/stats and the problem list
+    browse   LibraryPage + HistoryPage: filtered problem lists and history
+
+For every step it reports throughput, latency percentiles per endpoint,
+error rate, lock timeouts (503 + Retry-After from the busy handler) and,
+from the Server-Timing header, time spent in COMMIT, which is where SQLite
+busy waits show up. The largest step that meets --slo-p99-ms and
+--max-error-rate is reported as the measured concurrency limit. Run from
+the server directory:
+
+    python -m benchmarks.loadtest --workers 1 --users 4,8,16,32,64 --duration 15
+    python -m benchmarks.loadtest --workers 4 --env LCTRACKER_GROUP_COMMIT=1
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --users 16
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTCOMES = ["PASS", "PASS", "PASS", "SHAKY", "FAIL", "SKIP"]
+DIFFICULTIES = ["EASY", "MEDIUM", "HARD"]
+TAGS = ["array", "string", "hash-map", "dp", "graph", "tree", "two-pointers", "greedy", "heap", "math"]
+_TIMING_RE = re.compile(r"(\w+);dur=([\d.]+)")
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # endpoint -> seconds
+        self.statuses = Counter()
+        self.errors = Counter()  # endpoint -> failed requests
+        self.lock_timeouts = 0
+        self.transport_errors = Counter()  # exception name -> count
+        self.commit_ms = []
+        self.db_ms = []
+        self.attempts_logged = 0
+
+    @property
+    def requests(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    def record(self, endpoint: str, elapsed: float, response) -> None:
+        self.latencies[endpoint].append(elapsed)
+        self.statuses[response.status_code] += 1
+        if response.status_code >= 500:
+            self.errors[endpoint] += 1
+            if response.status_code == 503 and "retry-after" in response.headers:
+                self.lock_timeouts += 1
+        timing = dict(_TIMING_RE.findall(response.headers.get("server-timing", "")))
+        if "commit" in timing and float(timing["commit"]) > 0:
+            self.commit_ms.append(float(timing["commit"]))
+        if "db" in timing:
+            self.db_ms.append(float(timing["db"]))
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, think_ms: float):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.think_ms = think_ms
+
+    async def request(self, method: str, endpoint: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            elapsed = time.perf_counter() - start
+            self.recorder.latencies[endpoint].append(elapsed)
+            self.recorder.errors[endpoint] += 1
+            self.recorder.transport_errors[type(exc).__name__] += 1
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, response)
+        return response if response.status_code < 400 else None
+
+    async def think(self, scale: float = 1.0) -> None:
+        await asyncio.sleep(self.rng.expovariate(1 / (self.think_ms * scale / 1000)) if self.think_ms else 0)
+
+    async def review(self) -> None:
+        today = await self.request("GET", "GET /api/today", "/api/today")
+        if today is None:
+            return
+        data = today.json()
+        queue = [p["id"] for p in data["due"] + data["new"]]
+        for problem_id in queue[: self.rng.randint(1, 5)]:
+            if await self.request("GET", "GET /api/problems/{id}", f"/api/problems/{problem_id}") is None:
+                continue
+            await self.think(0.5)
+            logged = await self.request(
+                "POST",
+                "POST /api/problems/{id}/attempt",
+                f"/api/problems/{problem_id}/attempt",
+                json={"outcome": self.rng.choice(OUTCOMES), "time_spent_minutes": self.rng.randint(5, 45)},
+            )
+            if logged is not None:
+                self.recorder.attempts_logged += 1
+        await self.request("GET", "GET /api/today", "/api/today")
+
+    async def stats(self) -> None:
+        await asyncio.gather(
+            self.request("GET", "GET /api/stats", "/api/stats"),
+            self.request("GET", "GET /api/problems", "/api/problems"),
+        )
+        await self.think(5)
+
+    async def browse(self) -> None:
+        params = {"difficulty": self.rng.choice(DIFFICULTIES)}
+        if self.rng.random() < 0.5:
+            params["tag"] = self.rng.choice(TAGS)
+        await self.request("GET", "GET /api/problems", "/api/problems", params=params)
+        await self.think()
+        await self.request("GET", "GET /api/history", "/api/history", params={"limit": 50})
+
+
+async def run_step(url: str, users: int, duration: float, mix: dict, think_ms: float, seed: int) -> tuple[Recorder, float]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    deadline = time.perf_counter() + duration
+    scenarios = list(mix)
+    weights = [mix[name] for name in scenarios]
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+
+        async def user_loop(index: int) -> None:
+            rng = random.Random(seed * 100_003 + index)
+            user = VirtualUser(client, recorder, rng, think_ms)
+            scenario = getattr(user, rng.choices(scenarios, weights)[0])
+            # Stagger arrivals over the first second
+            await asyncio.sleep(rng.random())
+            while time.perf_counter() < deadline:
+                await scenario()
+                await user.think()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user_loop(i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+    return recorder, elapsed
+
+
+def summarize(users: int, recorder: Recorder, elapsed: float) -> dict:
+    latencies = sorted(value for values in recorder.latencies.values() for value in values)
+    requests = recorder.requests
+    errors = sum(recorder.errors.values())
+    commits = sorted(recorder.commit_ms)
+    return {
+        "users": users,
+        "requests": requests,
+        "rps": requests / elapsed if elapsed else 0,
+        "attempts_per_s": recorder.attempts_logged / elapsed if elapsed else 0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0) * 1000,
+        "error_rate": errors / requests if requests else 0,
+        "lock_timeout_rate": recorder.lock_timeouts / requests if requests else 0,
+        "commit_p50_ms": percentile(commits, 50),
+        "commit_p99_ms": percentile(commits, 99),
+        "commit_total_s": sum(commits) / 1000,
+    }
+
+
+def print_endpoints(recorder: Recorder) -> None:
+    print(f"    {'endpoint':<36}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for endpoint in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[endpoint])
+        print(
+            f"    {endpoint:<36}{len(values):>7}{percentile(values, 50) * 1000:>9.1f}"
+            f"{percentile(values, 95) * 1000:>9.1f}{percentile(values, 99) * 1000:>9.1f}{recorder.errors[endpoint]:>8}"
+        )
+    if recorder.transport_errors:
+        print(f"    transport errors: {dict(recorder.transport_errors)}")
+
+
+def seed_database(database_url: str, problems: int, history: int) -> None:
+    os.environ["LCTRACKER_DATABASE_URL"] = database_url
+    # Imported after the URL is set so the engine points at the scratch database
+    from database import SessionLocal, engine
+    from migrations import migrate
+    from models import Attempt, Problem
+
+    migrate(engine)
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        rows = [
+            Problem(
+                title=f"Problem {i}",
+                difficulty=rng.choice(DIFFICULTIES),
+                tags=rng.sample(TAGS, rng.randint(1, 3)),
+                next_due_date=now + timedelta(hours=rng.uniform(-72, 96)),
+                last_attempted_at=now - timedelta(days=rng.uniform(1, 30)),
+            )
+            for i in range(problems)
+        ]
+        db.add_all(rows)
+        db.flush()
+        db.add_all(
+            Attempt(
+                problem_id=rng.choice(rows).id,
+                attempted_at=now - timedelta(days=rng.uniform(0, 60)),
+                outcome=rng.choice(OUTCOMES),
+                time_spent_minutes=rng.randint(5, 45),
+            )
+            for _ in range(history)
+        )
+        db.commit()
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, workers: int, extra_env: list[str]) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {**os.environ, "LCTRACKER_DATABASE_URL": database_url, "LCTRACKER_SERVER_TIMING": "1"}
+    for item in extra_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=SERVER_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not become healthy within 30s")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("review", "stats", "browse"):
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--database-url", help="Database for the started server (default: scratch SQLite file)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the server, e.g. LCTRACKER_GROUP_COMMIT=1")
+    parser.add_argument("--users", default="4,8,16,32", help="Comma-separated concurrent users per step")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per step")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("review=6,stats=2,browse=2"))
+    parser.add_argument("--think-ms", type=float, default=300, help="Mean think time between actions")
+    parser.add_argument("--problems", type=int, default=500)
+    parser.add_argument("--history", type=int, default=5000, help="Attempts seeded before the run")
+    parser.add_argument("--slo-p99-ms", type=float, default=250)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--details", action="store_true", help="Print per-endpoint latencies for every step")
+    args = parser.parse_args()
+
+    steps = [int(users) for users in args.users.split(",")]
+    process = None
+    url = args.url
+    if url is None:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+        seed_database(database_url, args.problems, args.history)
+        process, url = start_server(database_url, args.workers, args.env)
+        print(f"Server: {args.workers} worker(s), {database_url}, env {args.env or 'default'}")
+    print(f"Mix {args.mix}, think {args.think_ms:.0f} ms, {args.duration:.0f}s per step\n")
+
+    results = []
+    try:
+        for index, users in enumerate(steps):
+            recorder, elapsed = asyncio.run(run_step(url, users, args.duration, args.mix, args.think_ms, index))
+            results.append(summarize(users, recorder, elapsed))
+            if args.details or index == len(steps) - 1:
+                print(f"  {users} users:")
+                print_endpoints(recorder)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print()
+    print(f"{'users':>6}{'req/s':>9}{'att/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'err %':>8}{'lock %':>8}{'commit p50':>12}{'commit p99':>12}")
+    for r in results:
+        print(
+            f"{r['users']:>6}{r['rps']:>9.1f}{r['attempts_per_s']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+            f"{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}{r['error_rate'] * 100:>8.2f}{r['lock_timeout_rate'] * 100:>8.2f}"
+            f"{r['commit_p50_ms']:>12.2f}{r['commit_p99_ms']:>12.2f}"
+        )
+
+    within = [r for r in results if r["p99_ms"] <= args.slo_p99_ms and r["error_rate"] <= args.max_error_rate]
+    if not within:
+        print(f"\nNo step met p99 <= {args.slo_p99_ms:.0f} ms and errors <= {args.max_error_rate:.1%}")
+    else:
+        best = max(within, key=lambda r: r["users"])
+        note = " (every step passed; raise --users to find the limit)" if len(within) == len(results) else ""
+        print(f"\nMeasured limit: {best['users']} concurrent users at {best['rps']:.1f} req/s "
+              f"within p99 <= {args.slo_p99_ms:.0f} ms and errors <= {args.max_error_rate:.1%}{note}")
+
+
+if __name__ == "__main__":
+    main()
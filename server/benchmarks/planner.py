@@ -0,0 +1,103 @@
+"""
+Session planner latency and plan quality with thousands of due problems.
+
+Fills a scratch SQLite database with --due overdue problems (about 70%
+with a precomputed median time), then times plan_session() end to end
+(query, scoring, selection, snapshots) for a few budgets. Plan value is
+compared with the greedy value-per-minute fill and with an exact knapsack
+over every due problem, to show what the candidate shortlist gives up.
+Run from the server directory:
+
+    python -m benchmarks.planner --due 1000 5000 20000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BUDGETS = (30, 60, 180)
+
+
+def fill(db_path: str, count: int) -> None:
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import Problem, ProblemTimingSketch
+    from services.scheduling import INTERVAL_LADDER
+    from services.tdigest import TDigest
+
+    rng = random.Random(count)
+    now = datetime.utcnow()
+    problems, sketches = [], []
+    for problem_id in range(1, count + 1):
+        stage = rng.randint(0, 5)
+        interval = INTERVAL_LADDER[stage]
+        due = now - timedelta(days=rng.uniform(0, 30))
+        difficulty = rng.choice(["EASY", "MEDIUM", "HARD"])
+        problems.append({
+            "id": problem_id, "title": f"Problem {problem_id}", "difficulty": difficulty, "tags": ["array"],
+            "next_due_date": due, "interval_days": interval, "mastery_stage": stage, "consecutive_successes": 0,
+            "last_attempted_at": due - timedelta(days=interval), "created_at": now, "updated_at": now,
+        })
+        if rng.random() < 0.7:
+            digest = TDigest.of(rng.randint(5, 70) for _ in range(rng.randint(1, 6)))
+            sketches.append({"problem_id": problem_id, "count": digest.count, "digest": digest.to_bytes(),
+                             "median_minutes": digest.quantile(0.5)})
+    with SessionLocal() as db:
+        db.execute(insert(Problem), problems)
+        db.execute(insert(ProblemTimingSketch), sketches)
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--due", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-planner-")
+    print(f"{'due':>6} {'budget':>6} {'plan ms':>8} {'items':>6} {'minutes':>8} {'value':>8} {'greedy':>8} {'exact':>8}")
+    for count in args.due:
+        db_path = os.path.join(workdir, f"planner-{count}.db")
+        os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{db_path}"
+        # Modules bind the engine at import; reload them against this size's database
+        import sys
+        for name in [name for name in sys.modules if name in ("config", "database", "models", "migrations")
+                     or name.startswith("services")]:
+            del sys.modules[name]
+
+        from database import SessionLocal, engine
+        from migrations import migrate
+        from services import planner
+
+        migrate(engine)
+        fill(db_path, count)
+        for budget in BUDGETS:
+            timings = []
+            with SessionLocal() as db:
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    plan = planner.plan_session(db, budget)
+                    timings.append(time.perf_counter() - start)
+
+                # Same scoring, then greedy over the shortlist and exact over everything
+                stats, planner.plan_stats = planner.plan_stats, None
+                greedy = planner.plan_session(db, budget)["value"]
+                planner.plan_stats = stats
+                shortlist = planner.MAX_CANDIDATES, planner.CANDIDATE_BUDGETS
+                planner.MAX_CANDIDATES, planner.CANDIDATE_BUDGETS = count, count
+                exact = planner.plan_session(db, budget)["value"]
+                planner.MAX_CANDIDATES, planner.CANDIDATE_BUDGETS = shortlist
+
+            print(f"{count:>6} {budget:>6} {statistics.median(timings) * 1000:>8.2f} {len(plan['items']):>6}"
+                  f" {plan['planned_minutes']:>8} {plan['value']:>8.3f} {greedy:>8.3f} {exact:>8.3f}")
+            assert plan["planned_minutes"] <= budget
+            assert plan["value"] >= greedy - 1e-6
+
+
+if __name__ == "__main__":
+    main()
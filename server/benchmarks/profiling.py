@@ -0,0 +1,92 @@
+"""
+Cost of the on-demand profiler.
+
+Runs the same untriggered requests in child interpreters alternating
+between LCTRACKER_PROFILING off and on (the middleware and hooks are only
+installed with it on) and compares the best median of each, since single
+runs on a shared machine vary more than the overhead being measured. The
+last profiled child then sends one request per mode and checks that the
+profile files were written. Run from the server directory:
+
+    python -m benchmarks.profiling --requests 2000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, os, statistics, time
+import seed
+from fastapi.testclient import TestClient
+from main import app
+
+seed.seed_database()
+timings = []
+with TestClient(app) as client:
+    for path in PATHS * 20:
+        client.get(path)
+    for i in range(REQUESTS):
+        path = PATHS[i % len(PATHS)]
+        start = time.perf_counter()
+        client.get(path)
+        timings.append(time.perf_counter() - start)
+    profiles = {}
+    if os.environ.get("LCTRACKER_PROFILING") == "1":
+        for mode in ("cprofile", "sample"):
+            response = client.get(PATHS[0], headers={"X-Profile": mode})
+            profile_id = response.headers["x-profile-id"]
+            profiles[mode] = sorted(
+                name for name in os.listdir(os.environ["LCTRACKER_PROFILE_DIR"]) if name.startswith(profile_id)
+            )
+print(json.dumps({"median": statistics.median(timings), "mean": statistics.fmean(timings), "profiles": profiles}))
+"""
+
+PATHS = ["/api/stats", "/api/problems", "/api/today"]
+
+
+def run(requests: int, profiling: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix="lctracker-profiling-")
+    env = {
+        **os.environ,
+        "LCTRACKER_DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "LCTRACKER_JOBS_ENABLED": "0",
+        "LCTRACKER_PROFILING": "1" if profiling else "0",
+        "LCTRACKER_PROFILE_DIR": os.path.join(workdir, "profiles"),
+    }
+    code = f"PATHS = {PATHS!r}\nREQUESTS = {requests}\n" + CHILD
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.getcwd(), env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = {False: [], True: []}
+    for _ in range(args.rounds):
+        for profiling in (False, True):
+            runs[profiling].append(run(args.requests, profiling))
+    off = min(runs[False], key=lambda result: result["median"])
+    on = min(runs[True], key=lambda result: result["median"])
+    on["profiles"] = runs[True][-1]["profiles"]
+    print(f"{args.requests} untriggered requests over {', '.join(PATHS)}, best of {args.rounds} runs, ms per request")
+    print(f"  {'profiling off':<16} median {off['median'] * 1000:7.3f}  mean {off['mean'] * 1000:7.3f}")
+    print(f"  {'profiling on':<16} median {on['median'] * 1000:7.3f}  mean {on['mean'] * 1000:7.3f}")
+    print(f"  overhead         median {(on['median'] / off['median'] - 1) * 100:+6.1f}%")
+    for mode, files in on["profiles"].items():
+        print(f"  {mode:<16} {', '.join(files)}")
+        assert any(name.endswith(".json") for name in files), f"{mode}: no summary written"
+    assert any(name.endswith(".prof") for name in on["profiles"]["cprofile"]), "cprofile: no .prof written"
+    assert any(name.endswith(".speedscope.json") for name in on["profiles"]["sample"]), "sample: no speedscope file"
+
+
+if __name__ == "__main__":
+    main()
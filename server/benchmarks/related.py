@@ -0,0 +1,79 @@
+"""
+Related-problem index: lookup cost versus library size, and recall.
+
+Builds services.similarity.RelatedIndex over synthetic libraries of
+growing size (tags drawn from a skewed pool, titles and notes from a word
+pool), then reports build time, mean candidates read per lookup, mean
+lookup time and recall@10 against an exact Jaccard scan of the whole
+library. Lookups should grow much more slowly than the library. Run from
+the server directory:
+
+    python -m benchmarks.related --sizes 1000 10000 50000
+"""
+
+import argparse
+import random
+import time
+
+from services.similarity import RelatedIndex, jaccard
+
+
+def synthetic(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    tags = [f"tag-{i}" for i in range(120)]
+    tag_weights = [1 / (i + 1) for i in range(len(tags))]
+    words = [f"w{i}" for i in range(3000)]
+    for problem_id in range(1, count + 1):
+        yield (
+            problem_id,
+            " ".join(rng.sample(words, rng.randint(2, 6))),
+            list(dict.fromkeys(rng.choices(tags, tag_weights, k=rng.randint(1, 4)))),
+            " ".join(rng.choices(words, k=rng.randint(0, 12))),
+            None,
+            None,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 50_000])
+    parser.add_argument("--lookups", type=int, default=300)
+    parser.add_argument("--min-similarity", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'problems':>9} {'build s':>8} {'candidates':>11} {'lookup ms':>10} {'recall@10':>10}")
+    for size in args.sizes:
+        index = RelatedIndex()
+        start = time.perf_counter()
+        index._add(list(synthetic(size)))
+        build = time.perf_counter() - start
+
+        rng = random.Random(1)
+        sample = rng.sample(range(1, size + 1), min(args.lookups, size))
+        candidates = 0
+        start = time.perf_counter()
+        results = {}
+        for problem_id in sample:
+            candidates += len(index.candidates(problem_id))
+            results[problem_id] = index.related(problem_id, 10, args.min_similarity)
+        lookup = (time.perf_counter() - start) / len(sample)
+
+        # Exact top 10 by scanning everything, on a subset to keep this quick
+        found = expected = 0
+        shingle_sets = index._shingles
+        for problem_id in sample[:50]:
+            mine = shingle_sets[problem_id]
+            exact = sorted(
+                ((jaccard(mine, other_set), other) for other, other_set in shingle_sets.items() if other != problem_id),
+                reverse=True,
+            )
+            truth = {other for score, other in exact[:10] if score >= args.min_similarity}
+            expected += len(truth)
+            found += len(truth & {row["id"] for row in results[problem_id]})
+        recall = found / expected if expected else 1.0
+
+        print(f"{size:>9} {build:>8.2f} {candidates / len(sample):>11.0f} {lookup * 1000:>10.3f} {recall:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
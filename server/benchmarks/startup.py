@@ -0,0 +1,103 @@
+"""
+Cold-start benchmark: import -> lifespan startup -> first request.
+
+Each run is a fresh interpreter, so the numbers include every import the
+app pulls in. Run from the server directory:
+
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Executed in a child interpreter; drives the ASGI app directly so the
+# measurement doesn't include an HTTP client or server.
+CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+
+async def run():
+    startup = asyncio.Queue()
+    await startup.put({"type": "lifespan.startup"})
+    started = asyncio.Event()
+    messages = []
+
+    async def lifespan_send(message):
+        if message["type"] == "lifespan.startup.complete":
+            started.set()
+
+    lifespan = asyncio.create_task(main.app({"type": "lifespan", "asgi": {"version": "3.0"}}, startup.get, lifespan_send))
+    await started.wait()
+    t2 = time.perf_counter()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": PATH, "raw_path": PATH.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    await main.app(scope, receive, send)
+    t3 = time.perf_counter()
+    await startup.put({"type": "lifespan.shutdown"})
+    await lifespan
+    return t2, t3, messages[0]["status"]
+
+
+t2, t3, status = asyncio.run(run())
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1, "first_request": t3 - t2, "status": status}))
+"""
+
+
+def run_once(path: str, cwd: str, env: dict) -> dict:
+    code = f"PATH = {path!r}\n" + CHILD
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def summarize(label: str, results: list[dict]) -> None:
+    print(f"\n{label} ({len(results)} runs), median / max in ms")
+    for key in ("import", "startup", "first_request"):
+        values = [r[key] * 1000 for r in results]
+        print(f"  {key:<14} {statistics.median(values):8.1f} {max(values):8.1f}")
+    totals = [(r["import"] + r["startup"] + r["first_request"]) * 1000 for r in results]
+    print(f"  {'total':<14} {statistics.median(totals):8.1f} {max(totals):8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/api/today", help="Path of the first request")
+    args = parser.parse_args()
+
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+
+    # Cold: empty working directory, so the first worker runs migrations
+    with tempfile.TemporaryDirectory() as workdir:
+        env["PYTHONPATH"] = server_dir
+        cold = [run_once(args.path, workdir, env)]
+        # Warm: schema already current, the common case for worker spawns
+        warm = [run_once(args.path, workdir, env) for _ in range(args.runs)]
+
+    summarize("Fresh database (migrations applied)", cold)
+    summarize("Existing database (schema check only)", warm)
+
+
+if __name__ == "__main__":
+    main()
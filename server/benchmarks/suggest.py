@@ -0,0 +1,186 @@
+"""
+Typeahead latency and correctness for /api/suggest.
+
+For each --problems size, a scratch SQLite database is filled with
+generated titles and tags. Some tags are spelled several ways
+("hash-map", "hashmap", "Hash Map") and some problems have attempts.
+Then:
+
+1. Latency: every prefix of a set of queries is typed one key at a
+   time. Reports p50/p99 of the index lookup (uncached) and of the whole
+   GET /api/suggest request, against a LIKE query doing the same title
+   match in SQL.
+2. Correctness: prefix results are compared with a brute-force scan of
+   the table, fuzzy spellings must suggest the tag they misspell, and a
+   problem created, renamed and deleted through the API shows up in the
+   very next lookup.
+
+Run from the server directory:
+
+    python -m benchmarks.suggest --problems 2000 20000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+WORDS = (
+    "two sum three longest substring without repeating characters median sorted arrays valid parentheses "
+    "merge intervals lists kth largest element stream binary tree level order traversal word ladder search "
+    "rotated array course schedule number islands minimum window maximum subarray product path cost climbing "
+    "stairs house robber coin change edit distance trapping rain water lru cache serialize deserialize graph "
+    "clone linked list cycle reverse nodes group palindrome partition jump game unique paths decode ways"
+).split()
+TAGS = [
+    "array", "string", "hash-map", "hashmap", "Hash Map", "dynamic-programming", "dp", "graph", "bfs", "dfs",
+    "two-pointers", "two_pointers", "sliding-window", "binary-search", "heap", "stack", "queue", "tree",
+    "linked-list", "backtracking", "greedy", "trie", "union-find", "bit-manipulation", "math", "sorting",
+] + [f"topic-{i}" for i in range(200)]
+QUERIES = ["two sum", "binary tree", "hash map", "dynamic", "merge int", "lru", "sliding", "x"]
+FUZZY = {"hashmaps": "hash-map", "hahsmap": "hash-map", "dynamic-programing": "dynamic-programming",
+         "slidingwindow": "sliding-window", "backtraking": "backtracking"}
+
+
+def fill(count: int) -> None:
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import Attempt, Problem
+
+    rng = random.Random(count)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(Problem), [
+            {"title": " ".join(rng.sample(WORDS, rng.randint(2, 6))).title() + f" {i}",
+             "difficulty": ("EASY", "MEDIUM", "HARD")[i % 3], "tags": rng.sample(TAGS, rng.randint(1, 4)),
+             "next_due_date": now, "interval_days": 1, "mastery_stage": 0, "consecutive_successes": 0,
+             "created_at": now, "updated_at": now}
+            for i in range(count)
+        ])
+        db.execute(insert(Attempt), [
+            {"problem_id": rng.randint(1, count), "attempted_at": now, "outcome": "PASS"} for _ in range(count * 3)
+        ])
+        db.commit()
+
+
+def percentiles(timings: list) -> tuple[float, float]:
+    timings = sorted(timings)
+    return statistics.median(timings) * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+
+def latency(client, count: int) -> None:
+    from database import SessionLocal
+    from models import Problem
+    from routers.problems import _title_filter
+    from services.suggest import suggest_index
+
+    keystrokes = [query[:i] for query in QUERIES for i in range(1, len(query) + 1)]
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        suggest_index.clear()
+        suggest_index.sync(db)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        index_timings = []
+        for q in keystrokes * 5:
+            suggest_index._cache.clear()
+            start = time.perf_counter()
+            suggest_index.suggest(q, 8)
+            index_timings.append(time.perf_counter() - start)
+
+        sql_timings = []
+        for q in keystrokes:
+            start = time.perf_counter()
+            db.query(Problem.id, Problem.title).filter(_title_filter(q)).order_by(Problem.title).limit(8).all()
+            sql_timings.append(time.perf_counter() - start)
+
+    http_timings = []
+    for q in keystrokes * 3:
+        suggest_index._cache.clear()
+        start = time.perf_counter()
+        response = client.get("/api/suggest", params={"q": q})
+        http_timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+
+    print(f"{count:>8} {'index build':>18} {build_ms:>9.1f}")
+    for name, timings in (("index lookup", index_timings), ("GET /api/suggest", http_timings),
+                          ("SQL LIKE (titles)", sql_timings)):
+        p50, p99 = percentiles(timings)
+        print(f"{count:>8} {name:>18} {p50:>9.3f} {p99:>9.3f}")
+    assert percentiles(http_timings)[1] < 5, "typeahead request slower than 5 ms at p99"
+
+
+def correctness(client) -> None:
+    from database import SessionLocal
+    from models import Problem
+    from services.suggest import normalize, squash, suggest_index
+
+    with SessionLocal() as db:
+        rows = db.query(Problem.id, Problem.title, Problem.tags).all()
+        suggest_index.sync(db)
+    for q in ("two", "hash", "sum th", "tree l", "topic-1"):
+        got = suggest_index.suggest(q, 1000)
+        expected_titles = {
+            problem_id for problem_id, title, _ in rows
+            if any(normalize(title).split(" ")[i:] and " ".join(normalize(title).split(" ")[i:]).startswith(normalize(q))
+                   for i in range(len(normalize(title).split(" "))))
+        }
+        assert {t["id"] for t in got["titles"]} == expected_titles, q
+        expected_tags = {tag for _, _, tags in rows for tag in tags if squash(tag).startswith(squash(q))}
+        assert {t["tag"] for t in got["tags"] if t["match"] == "prefix"} == expected_tags, q
+    spellings = [t["tag"] for t in suggest_index.suggest("hashm", 10)["tags"]]
+    assert {"hash-map", "hashmap", "Hash Map"} <= set(spellings), spellings
+    for typo, tag in FUZZY.items():
+        tags = [t["tag"] for t in suggest_index.suggest(typo, 8, "tag")["tags"]]
+        assert tag in tags, (typo, tags)
+    print(f"prefix results match a table scan; hashm -> {spellings[:3]}; fuzzy: "
+          + ", ".join(f"{typo} -> {tag}" for typo, tag in FUZZY.items()))
+
+    created = client.post("/api/problems", json={"title": "Zebra Crossing Puzzle", "difficulty": "EASY",
+                                                 "tags": ["zebra-stripes"]}).json()
+    body = client.get("/api/suggest", params={"q": "zebra"}).json()
+    assert [t["id"] for t in body["titles"]] == [created["id"]] and body["tags"][0]["tag"] == "zebra-stripes", body
+    client.put(f"/api/problems/{created['id']}", json={"title": "Okapi Crossing", "tags": []})
+    body = client.get("/api/suggest", params={"q": "zebra"}).json()
+    assert not body["titles"] and not any(t["match"] == "prefix" for t in body["tags"]), body
+    assert client.get("/api/suggest", params={"q": "okapi"}).json()["titles"][0]["id"] == created["id"]
+    client.delete(f"/api/problems/{created['id']}")
+    assert not client.get("/api/suggest", params={"q": "okapi"}).json()["titles"]
+    print("create, rename and delete visible on the next lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, nargs="+", default=[2000, 20000])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lctracker-suggest-")
+    os.environ["LCTRACKER_JOBS_ENABLED"] = "0"
+    print(f"{'problems':>8} {'':>18} {'p50 ms':>9} {'p99 ms':>9}")
+    for count in args.problems:
+        os.environ["LCTRACKER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, f'suggest-{count}.db')}"
+        # Modules bind the engine at import; reload them against this size's database
+        for name in [name for name in sys.modules if name in ("config", "database", "models", "migrations", "main")
+                     or name.startswith(("services", "routers"))]:
+            del sys.modules[name]
+        from fastapi.testclient import TestClient
+
+        from database import engine
+        from main import app
+        from migrations import migrate
+
+        migrate(engine)
+        fill(count)
+        with TestClient(app) as client:
+            latency(client, count)
+            if count == args.problems[0]:
+                correctness(client)
+
+
+if __name__ == "__main__":
+    main()
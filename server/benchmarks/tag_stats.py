@@ -0,0 +1,92 @@
+"""
+Timing and cross-check for the /api/stats/tags computation.
+
+Builds synthetic problems (each with 1-5 tags out of --tags) and attempts,
+checks services.tag_analytics.compute against a plain-Python reference on
+a small sample, then times it at full size. Run from the server directory:
+
+    python -m benchmarks.tag_stats --problems 10000 --tags 200 --attempts 100000
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+from itertools import combinations
+
+from services.tag_analytics import FAILED_OUTCOMES, compute
+
+OUTCOMES = ["PASS", "PASS", "SHAKY", "FAIL"]
+
+
+def synthetic(problems: int, tags: int, attempts: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = [f"tag-{i:03d}" for i in range(tags)]
+    rows = [(i, rng.sample(names, rng.randint(1, min(5, tags))), rng.randint(0, 5)) for i in range(problems)]
+    history = [(rng.randrange(problems), rng.choice(OUTCOMES)) for _ in range(attempts)]
+    return rows, history
+
+
+def per_problem_counts(history):
+    """(problem_id, graded, failed) rows, as the endpoint's GROUP BY returns them."""
+    graded, failed = Counter(), Counter()
+    for problem_id, outcome in history:
+        graded[problem_id] += 1
+        failed[problem_id] += outcome in FAILED_OUTCOMES
+    return [(problem_id, graded[problem_id], failed[problem_id]) for problem_id in graded]
+
+
+def reference(problems, attempts, min_pair_attempts):
+    """Per-tag and per-pair counts the slow way."""
+    tags_of = {problem_id: problem_tags for problem_id, problem_tags, _ in problems}
+    tag_attempts, tag_failures, pair_attempts, pair_failures = Counter(), Counter(), Counter(), Counter()
+    for problem_id, outcome in attempts:
+        failed = outcome in FAILED_OUTCOMES
+        for tag in tags_of[problem_id]:
+            tag_attempts[tag] += 1
+            tag_failures[tag] += failed
+        for pair in combinations(sorted(tags_of[problem_id]), 2):
+            pair_attempts[pair] += 1
+            pair_failures[pair] += failed
+    baseline = sum(outcome in FAILED_OUTCOMES for _, outcome in attempts) / len(attempts)
+    lifts = {
+        pair: pair_failures[pair] / count / baseline
+        for pair, count in pair_attempts.items()
+        if count >= min_pair_attempts
+    }
+    return tag_attempts, tag_failures, lifts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=10_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--attempts", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    problems, attempts = synthetic(500, 20, 5000)
+    result = compute(problems, per_problem_counts(attempts), min_pair_attempts=5, limit=1000)
+    tag_attempts, tag_failures, lifts = reference(problems, attempts, 5)
+    for row in result["tags"]:
+        expected = 1 - tag_failures[row["tag"]] / tag_attempts[row["tag"]]
+        assert row["attempts"] == tag_attempts[row["tag"]], row
+        assert abs(row["pass_rate"] - expected) < 1e-3, (row, expected)
+    assert len(result["pair_lift"]) == len(lifts)
+    for row in result["pair_lift"]:
+        assert abs(row["lift"] - lifts[tuple(row["tags"])]) < 1e-3, row
+    print("Cross-check against reference: ok")
+
+    problems, attempts = synthetic(args.problems, args.tags, args.attempts)
+    counts = per_problem_counts(attempts)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        compute(problems, counts, min_pair_attempts=5, limit=20)
+        timings.append(time.perf_counter() - start)
+    print(f"{args.problems} problems x {args.tags} tags, {args.attempts} attempts: "
+          f"best {min(timings) * 1000:.1f} ms, median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cost of the time-spent sketches behind /api/stats/timing: stored size and
+merge time. Synthetic lognormal minutes for difficulties x tags x months go
+into one t-digest per (difficulty, tag, month), round-tripped through
+bytes, then merged per difficulty, per tag and per month the way the
+endpoint does. Accuracy against exact percentiles is checked in
+tests/test_timing_sketches.py.
+
+Run from the server directory:
+
+    python -m benchmarks.timing_sketches --attempts 200000
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+
+from services.tdigest import TDigest, merge_all
+
+DIFFICULTIES = {"EASY": 2.6, "MEDIUM": 3.1, "HARD": 3.6}  # log-minutes means
+
+
+def synthetic(attempts: int, tags: int, months: int) -> None:
+    rng = random.Random(0)
+    tag_names = [f"tag-{i}" for i in range(tags)]
+    stored = defaultdict(TDigest)
+    for _ in range(attempts):
+        difficulty = rng.choice(list(DIFFICULTIES))
+        month = f"m{rng.randrange(months):02d}"
+        minutes = max(1, round(rng.lognormvariate(DIFFICULTIES[difficulty], 0.5)))
+        problem_tags = set(rng.sample(tag_names, rng.randint(1, 3)))
+        stored[(difficulty, "", month)].add(minutes)
+        for tag in problem_tags:
+            stored[(difficulty, tag, month)].add(minutes)
+
+    blobs = {key: digest.to_bytes() for key, digest in stored.items()}
+    print(f"{attempts} attempts -> {len(blobs)} sketches, "
+          f"{sum(map(len, blobs.values())) / len(blobs):.0f} bytes each on average")
+
+    start = time.perf_counter()
+    pooled = {"difficulty": defaultdict(list), "tag": defaultdict(list), "month": defaultdict(list)}
+    for (difficulty, tag, month), blob in blobs.items():
+        digest = TDigest.from_bytes(blob)
+        if tag:
+            pooled["tag"][tag].append(digest)
+        else:
+            pooled["difficulty"][difficulty].append(digest)
+            pooled["month"][month].append(digest)
+    for groups in pooled.values():
+        for digests in groups.values():
+            merge_all(digests)
+    print(f"  merge of all sketches: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=200_000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--months", type=int, default=24)
+    args = parser.parse_args()
+
+    synthetic(args.attempts, args.tags, args.months)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Runtime settings, read once from LCTRACKER_* environment variables.
+"""
+
+import os
+
+
+DATABASE_URL = os.environ.get("LCTRACKER_DATABASE_URL", "sqlite:///./leetreview.db")
+# Connection pool, per worker process. Sync endpoints run on AnyIO's
+# 40-thread pool, so up to 40 requests can be executing SQL at once; size +
+# overflow below that makes them queue for connections (see get_db in
+# database.py). On PostgreSQL keep workers x (size + overflow) under the
+# server's max_connections.
+DB_POOL_SIZE = int(os.environ.get("LCTRACKER_DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.environ.get("LCTRACKER_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("LCTRACKER_DB_POOL_TIMEOUT", "30"))
+# PostgreSQL only: replace pooled connections older than this many seconds
+DB_POOL_RECYCLE = int(os.environ.get("LCTRACKER_DB_POOL_RECYCLE", "1800"))
+# Seconds a SQLite connection waits for a lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("LCTRACKER_SQLITE_BUSY_TIMEOUT", "5"))
+
+
+def _flag(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Add a Server-Timing header (db, commit, app milliseconds) to every response
+SERVER_TIMING = _flag("LCTRACKER_SERVER_TIMING")
+
+# Development: log repeated statements and lazy loads inside a request
+DEBUG_QUERIES = _flag("LCTRACKER_DEBUG_QUERIES")
+# Same SQL text issued this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("LCTRACKER_N_PLUS_ONE_THRESHOLD", "3"))
+
+# JSON responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("LCTRACKER_COMPRESSION_MINIMUM_SIZE", "1024"))
+
+# Background job runner (see services/jobs.py)
+JOBS_ENABLED = _flag("LCTRACKER_JOBS_ENABLED", default=True)
+JOB_POLL_SECONDS = float(os.environ.get("LCTRACKER_JOB_POLL_SECONDS", "2"))
+# Rows per transaction for chunked maintenance jobs; keeps the SQLite write lock short
+JOB_CHUNK_SIZE = int(os.environ.get("LCTRACKER_JOB_CHUNK_SIZE", "200"))
+# A RUNNING job with no heartbeat for this long is assumed orphaned and requeued
+JOB_STALE_SECONDS = int(os.environ.get("LCTRACKER_JOB_STALE_SECONDS", "300"))
+# How often a running job's heartbeat is refreshed, even mid-step; keep well below JOB_STALE_SECONDS
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("LCTRACKER_JOB_HEARTBEAT_SECONDS", "30"))
+
+# Problem snapshot cache (see services/problem_cache.py); 0 disables it
+PROBLEM_CACHE_SIZE = int(os.environ.get("LCTRACKER_PROBLEM_CACHE_SIZE", "2048"))
+# Check detail-endpoint hits against updated_at; needed with more than one worker
+PROBLEM_CACHE_VERIFY = _flag("LCTRACKER_PROBLEM_CACHE_VERIFY")
+# Load the problems due soonest into the cache at startup
+PROBLEM_CACHE_WARM = _flag("LCTRACKER_PROBLEM_CACHE_WARM")
+
+# In-process due-date index (see services/due_index.py): due counters and the
+# due queue are answered from memory instead of COUNT queries
+DUE_INDEX = _flag("LCTRACKER_DUE_INDEX")
+# Catch the index up from the change log before each read; needed with more than one worker
+DUE_INDEX_VERIFY = _flag("LCTRACKER_DUE_INDEX_VERIFY")
+
+# Group-commit mode for attempt writes (see services/attempts.py)
+GROUP_COMMIT = _flag("LCTRACKER_GROUP_COMMIT")
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("LCTRACKER_GROUP_COMMIT_MAX_BATCH", "64"))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get("LCTRACKER_GROUP_COMMIT_MAX_DELAY_MS", "5"))
+
+# Attempts older than this many days are moved to monthly archive tables by
+# the archive_attempts job (see services/archive.py)
+ARCHIVE_AFTER_DAYS = int(os.environ.get("LCTRACKER_ARCHIVE_AFTER_DAYS", "365"))
+
+# On-demand request profiling (see services/profiling.py). Off by default;
+# when on, a request is profiled only if it carries X-Profile or ?_profile=
+PROFILING = _flag("LCTRACKER_PROFILING")
+# Required in X-Profile-Token (or ?_profile_token=) when set
+PROFILE_TOKEN = os.environ.get("LCTRACKER_PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("LCTRACKER_PROFILE_DIR", "./profiles")
+# Newest profiles kept in PROFILE_DIR; older ones are deleted
+PROFILE_KEEP = int(os.environ.get("LCTRACKER_PROFILE_KEEP", "50"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("LCTRACKER_PROFILE_SAMPLE_INTERVAL_MS", "1"))
+
+# Online SQLite snapshots (see services/backup.py); 0 disables the schedule
+BACKUP_INTERVAL_MINUTES = float(os.environ.get("LCTRACKER_BACKUP_INTERVAL_MINUTES", "0"))
+BACKUP_DIR = os.environ.get("LCTRACKER_BACKUP_DIR", "./backups")
+# Newest snapshots kept in BACKUP_DIR; older ones are deleted
+BACKUP_KEEP = int(os.environ.get("LCTRACKER_BACKUP_KEEP", "7"))
+# Pages copied per backup step, and the pause between steps in which writers can commit
+BACKUP_PAGES_PER_STEP = int(os.environ.get("LCTRACKER_BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP_MS = float(os.environ.get("LCTRACKER_BACKUP_STEP_SLEEP_MS", "5"))
+# Restarts caused by concurrent commits before the copy finishes in one step
+BACKUP_MAX_RESTARTS = int(os.environ.get("LCTRACKER_BACKUP_MAX_RESTARTS", "3"))
+
+# Columnar analytics export (see services/export.py)
+EXPORT_DIR = os.environ.get("LCTRACKER_EXPORT_DIR", "./exports")
+# "arrow" (Arrow IPC files, needs pyarrow), "npy" (memory-mappable NumPy), or "auto"
+EXPORT_FORMAT = os.environ.get("LCTRACKER_EXPORT_FORMAT", "auto")
+# Attempts read per keyset page; each page is one short read
+EXPORT_CHUNK_ROWS = int(os.environ.get("LCTRACKER_EXPORT_CHUNK_ROWS", "50000"))
+
+# Production launcher, `python -m server` (see server/__main__.py). The
+# frontend's API_BASE expects port 3001.
+SERVER_HOST = os.environ.get("LCTRACKER_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("LCTRACKER_SERVER_PORT", "3001"))
+# Worker processes; 0 means one per available CPU (at most 4 on SQLite, which has a single writer).
+# Live events are per process, so /api/events only sees every write with 1.
+SERVER_WORKERS = int(os.environ.get("LCTRACKER_SERVER_WORKERS", "1"))
+# Seconds an idle keep-alive connection stays open; uvicorn's default of 5 drops the SPA's between polls
+SERVER_KEEPALIVE_SECONDS = int(os.environ.get("LCTRACKER_SERVER_KEEPALIVE_SECONDS", "75"))
+# Connections the kernel queues on the listening socket while workers are busy
+SERVER_BACKLOG = int(os.environ.get("LCTRACKER_SERVER_BACKLOG", "2048"))
+# On SIGTERM, seconds in-flight requests get to finish before workers stop
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("LCTRACKER_SERVER_GRACEFUL_TIMEOUT", "30"))
+# Per-request access log lines; per-route numbers are on /metrics either way
+SERVER_ACCESS_LOG = _flag("LCTRACKER_SERVER_ACCESS_LOG")
@@ -1,16 +1,59 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+import config
+from database import engine, check_database, SessionLocal
+from migrations import ensure_schema
+from routers import problems, today, stats, history, dashboard, jobs, events, sync, export, suggest
+from services import due_index, problem_cache
+from services.attempts import attempt_writer
+from services.encoding import ContentNegotiationMiddleware
+from services.events import run_day_rollover
+from services.jobs import runner as job_runner
+from services.metrics import MetricsMiddleware, is_lock_error, render_prometheus
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema check runs once per worker at startup, not on import
+    ensure_schema(engine)
+    if config.PROBLEM_CACHE_WARM:
+        with SessionLocal() as db:
+            await asyncio.to_thread(problem_cache.warm, db)
+    if config.DUE_INDEX:
+        await asyncio.to_thread(due_index.load)
+    if config.GROUP_COMMIT:
+        attempt_writer.start()
+    if config.JOBS_ENABLED:
+        job_runner.start()
+    stop_background = asyncio.Event()
+    rollover = asyncio.create_task(run_day_rollover(stop_background))
+    backups = None
+    if config.BACKUP_INTERVAL_MINUTES > 0:
+        from services.backup import run_scheduled_backups
 
-from database import engine, Base
-from routers import problems, today, stats, history
+        backups = asyncio.create_task(run_scheduled_backups(stop_background))
+    yield
+    stop_background.set()
+    await rollover
+    if backups is not None:
+        await backups
+    await job_runner.stop()
+    # Drain queued attempt writes before the process exits
+    await asyncio.to_thread(attempt_writer.stop)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="LeetReview API",
     description="Anki-style spaced repetition tracker for LeetCode problems",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware for frontend
@@ -20,13 +63,58 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Response-Shape", "Server-Timing", "X-Profile-Id"],
 )
 
+# Compact/msgpack shapes and gzip/brotli for JSON responses
+app.add_middleware(ContentNegotiationMiddleware, minimum_size=config.COMPRESSION_MINIMUM_SIZE)
+
+# Development-mode N+1 detector
+if config.DEBUG_QUERIES:
+    from services import query_debug
+
+    query_debug.install(engine)
+    app.add_middleware(query_debug.QueryDebugMiddleware)
+
+# On-demand profiling of requests that send X-Profile
+if config.PROFILING:
+    from services import profiling
+
+    profiling.install(engine)
+    app.add_middleware(profiling.ProfilingMiddleware, directory=config.PROFILE_DIR, token=config.PROFILE_TOKEN)
+
+# Per-route latency and DB metrics (outermost, so it times the whole stack)
+app.add_middleware(MetricsMiddleware, server_timing=config.SERVER_TIMING)
+
 # Include routers
 app.include_router(problems.router)
 app.include_router(today.router)
 app.include_router(stats.router)
 app.include_router(history.router)
+app.include_router(dashboard.router)
+app.include_router(jobs.router)
+app.include_router(events.router)
+app.include_router(sync.router)
+app.include_router(export.router)
+app.include_router(suggest.router)
+
+
+@app.exception_handler(OperationalError)
+async def database_error(request: Request, exc: OperationalError):
+    # Lock timeouts are transient: tell the client to retry instead of returning a bare 500
+    if is_lock_error(exc):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Database is busy, retry shortly"},
+            headers={"Retry-After": "1"},
+        )
+    raise exc
+
+
+@app.exception_handler(StaleDataError)
+async def concurrent_update(request: Request, exc: StaleDataError):
+    # A versioned flush found the problem changed by another request since it was read
+    return JSONResponse(status_code=409, content={"detail": "Problem was changed concurrently; retry"})
 
 
 @app.get("/")
@@ -35,5 +123,13 @@ def root():
 
 
 @app.get("/health")
-def health():
-    return {"status": "healthy"}
+def health(response: Response):
+    db = check_database()
+    if not db["reachable"]:
+        response.status_code = 503
+    return {"status": "healthy" if db["reachable"] else "unhealthy", "database": db}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
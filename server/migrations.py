@@ -0,0 +1,157 @@
+"""
+Explicit schema management.
+
+The app no longer runs DDL at import time. On startup the lifespan handler
+calls ensure_schema(), which costs one SELECT when the database is current
+and only applies migrations when it is behind. Run migrations ahead of a
+deploy with:
+
+    python migrations.py
+"""
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from database import Base
+
+_meta = MetaData()
+schema_version_table = Table("schema_version", _meta, Column("version", Integer, nullable=False))
+
+
+def _create_base_tables(conn: Connection) -> None:
+    import models  # noqa: F401  (registers tables on Base.metadata)
+
+    Base.metadata.create_all(bind=conn)
+
+
+def add_column(conn: Connection, table: str, column_ddl: str) -> None:
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    name = column_ddl.split()[0]
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    if name not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column_ddl}"))
+
+
+def _create_jobs_table(conn: Connection) -> None:
+    from models import Job
+
+    Job.__table__.create(bind=conn, checkfirst=True)
+
+
+def _create_change_log(conn: Connection) -> None:
+    from models import Change
+
+    Change.__table__.create(bind=conn, checkfirst=True)
+    add_column(conn, "attempts", "client_id VARCHAR")
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_attempts_client_id ON attempts (client_id)"
+    ))
+
+
+def _create_attempt_archive(conn: Connection) -> None:
+    from models import AttemptPartition, AttemptRollup
+    from services.archive import rebuild_view
+
+    AttemptPartition.__table__.create(bind=conn, checkfirst=True)
+    AttemptRollup.__table__.create(bind=conn, checkfirst=True)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_attempts_attempted_at ON attempts (attempted_at)"))
+    rebuild_view(conn, [])
+
+
+def _create_timing_sketches(conn: Connection) -> None:
+    from models import ProblemTimingSketch, TimingSketch
+    from services.timing import rebuild
+
+    TimingSketch.__table__.create(bind=conn, checkfirst=True)
+    ProblemTimingSketch.__table__.create(bind=conn, checkfirst=True)
+    # Backfill from existing attempts
+    rebuild(conn)
+
+
+def _add_problem_median_minutes(conn: Connection) -> None:
+    from models import ProblemTimingSketch
+    from services.tdigest import TDigest
+
+    add_column(conn, "problem_timing_sketches", "median_minutes FLOAT")
+    # The session planner checks max(updated_at) on every plan
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_problem_timing_sketches_updated_at ON problem_timing_sketches (updated_at)"
+    ))
+    table = ProblemTimingSketch.__table__
+    rows = conn.execute(select(table.c.problem_id, table.c.digest).where(table.c.median_minutes.is_(None))).all()
+    for problem_id, digest in rows:
+        conn.execute(
+            table.update()
+            .where(table.c.problem_id == problem_id)
+            .values(median_minutes=TDigest.from_bytes(digest).quantile(0.5))
+        )
+
+
+def _add_problem_version(conn: Connection) -> None:
+    add_column(conn, "problems", "version INTEGER NOT NULL DEFAULT 1")
+
+
+def _add_problem_archive_and_cascades(conn: Connection) -> None:
+    add_column(conn, "problems", "archived_at TIMESTAMP")
+    # ON DELETE CASCADE looks up each deleted problem's attempts by problem_id
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_attempts_problem_id ON attempts (problem_id)"))
+
+
+# (version, description, apply). Append only; never edit a released step.
+MIGRATIONS = [
+    (1, "create base tables", _create_base_tables),
+    (2, "create jobs table", _create_jobs_table),
+    (3, "create change log and attempts.client_id", _create_change_log),
+    (4, "create attempt archive tables and attempts_all view", _create_attempt_archive),
+    (5, "create timing sketches", _create_timing_sketches),
+    (6, "add problem_timing_sketches.median_minutes and updated_at index", _add_problem_median_minutes),
+    (7, "add problems.version", _add_problem_version),
+    (8, "add problems.archived_at and attempts.problem_id index", _add_problem_archive_and_cascades),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    try:
+        version = conn.execute(select(schema_version_table.c.version)).scalar()
+    except (OperationalError, ProgrammingError):
+        conn.rollback()
+        return 0
+    return version or 0
+
+
+def migrate(engine: Engine) -> int:
+    """Apply all pending migrations. Returns the resulting schema version."""
+    with engine.begin() as conn:
+        _meta.create_all(bind=conn)
+        version = current_version(conn)
+        for step_version, description, apply in MIGRATIONS:
+            if step_version > version:
+                apply(conn)
+                version = step_version
+        conn.execute(schema_version_table.delete())
+        conn.execute(schema_version_table.insert().values(version=version))
+    return version
+
+
+def ensure_schema(engine: Engine) -> None:
+    """Fast startup check: one SELECT when current, migrate otherwise."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version >= SCHEMA_VERSION:
+        return
+    try:
+        migrate(engine)
+    except OperationalError:
+        # Another worker may have migrated concurrently
+        with engine.connect() as conn:
+            if current_version(conn) < SCHEMA_VERSION:
+                raise
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    print(f"Database schema at version {migrate(engine)}")
@@ -1,11 +1,43 @@
+import json
 from datetime import datetime, timedelta
 from enum import Enum
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, LargeBinary, PrimaryKeyConstraint, Index, func, literal_column
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 
 from database import Base
 
 
+class TagList(TypeDecorator):
+    """List of tag strings: JSONB on PostgreSQL, a JSON array in TEXT elsewhere."""
+
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        value = list(value or [])
+        return value if dialect.name == "postgresql" else json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return []
+        return json.loads(value) if isinstance(value, str) else value
+
+
+def title_tsvector(title_column):
+    """
+    tsvector for PostgreSQL title search. The configuration is a literal, not
+    a bind parameter, so queries match the expression index exactly.
+    """
+    return func.to_tsvector(literal_column("'simple'::regconfig"), title_column)
+
+
 class Difficulty(str, Enum):
     EASY = "EASY"
     MEDIUM = "MEDIUM"
@@ -28,7 +60,7 @@ class Problem(Base):
     platform = Column(String, default="LeetCode")
     url = Column(String, nullable=True)
     difficulty = Column(String, nullable=False)
-    tags = Column(Text, default="[]")  # JSON array as string
+    tags = Column(TagList, default=list)
     notes_trick = Column(Text, nullable=True)
     notes_mistakes = Column(Text, nullable=True)
     notes_edge_cases = Column(Text, nullable=True)
@@ -42,16 +74,32 @@ class Problem(Base):
     consecutive_successes = Column(Integer, default=0)
     last_outcome = Column(String, nullable=True)
     last_attempted_at = Column(DateTime, nullable=True)
+    # Set while the problem is out of rotation; archived problems have no next_due_date
+    archived_at = Column(DateTime, nullable=True)
+
+    # Optimistic concurrency: bumped by every write, ORM flushes included
+    # (they add "AND version = ?" and raise StaleDataError on a mismatch)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # The database deletes attempts with their problem (ON DELETE CASCADE), so a
+    # delete doesn't load them first
+    attempts = relationship("Attempt", back_populates="problem", cascade="all, delete-orphan", passive_deletes=True)
+
+    __mapper_args__ = {"version_id_col": version}
 
-    attempts = relationship("Attempt", back_populates="problem", cascade="all, delete-orphan")
+    __table_args__ = (
+        # PostgreSQL only: containment (@>) tag filters and full-text title search
+        Index("ix_problems_tags_gin", "tags", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_problems_title_fts", title_tsvector(title), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
 
 class Attempt(Base):
     __tablename__ = "attempts"
 
     id = Column(Integer, primary_key=True, index=True)
-    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"))
-    attempted_at = Column(DateTime, default=datetime.utcnow)
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), index=True)
+    attempted_at = Column(DateTime, default=datetime.utcnow, index=True)
     outcome = Column(String, nullable=False)
     time_spent_minutes = Column(Integer, nullable=True)
     notes = Column(Text, nullable=True)
@@ -61,4 +109,110 @@ class Attempt(Base):
     stage_after = Column(Integer, nullable=True)
     next_due_date_after = Column(DateTime, nullable=True)
 
+    # Set by offline clients so replayed pushes are idempotent
+    client_id = Column(String, nullable=True, unique=True, index=True)
+
     problem = relationship("Problem", back_populates="attempts")
+
+
+class JobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=JobStatus.QUEUED.value, index=True)
+    payload = Column(Text, default="{}")  # JSON object as string
+    result = Column(Text, nullable=True)  # JSON object as string
+    error = Column(Text, nullable=True)
+
+    progress_done = Column(Integer, default=0)
+    progress_total = Column(Integer, nullable=True)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    cancel_requested = Column(Integer, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    run_after = Column(DateTime, default=datetime.utcnow)  # retry backoff
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class Change(Base):
+    """Append-only change log backing delta sync. token is the sync cursor."""
+
+    __tablename__ = "changes"
+    __table_args__ = {"sqlite_autoincrement": True}  # tokens are never reused
+
+    token = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # "problem" or "attempt"
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # "upsert" or "delete"
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AttemptPartition(Base):
+    """Monthly archive table holding attempts moved out of `attempts`."""
+
+    __tablename__ = "attempt_partitions"
+
+    table_name = Column(String, primary_key=True)  # attempts_YYYY_MM
+    month = Column(String, nullable=False, unique=True)  # YYYY-MM
+    row_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AttemptRollup(Base):
+    """Per-problem monthly attempt counts, written before attempts are archived."""
+
+    __tablename__ = "attempt_rollups"
+    __table_args__ = (PrimaryKeyConstraint("problem_id", "month"),)
+
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), index=True)
+    month = Column(String, nullable=False)  # YYYY-MM
+    attempts = Column(Integer, default=0)
+    pass_count = Column(Integer, default=0)
+    shaky_count = Column(Integer, default=0)
+    fail_count = Column(Integer, default=0)
+    skip_count = Column(Integer, default=0)
+    postpone_count = Column(Integer, default=0)
+    timed_attempts = Column(Integer, default=0)  # attempts with time_spent_minutes set
+    total_minutes = Column(Integer, default=0)
+
+
+class TimingSketch(Base):
+    """
+    Monthly t-digest of time_spent_minutes for one (difficulty, tag). The
+    row with tag "" covers every problem of that difficulty once.
+    """
+
+    __tablename__ = "timing_sketches"
+    __table_args__ = (PrimaryKeyConstraint("difficulty", "tag", "month"),)
+
+    difficulty = Column(String, nullable=False)
+    tag = Column(String, nullable=False)
+    month = Column(String, nullable=False, index=True)  # YYYY-MM
+    count = Column(Integer, default=0)
+    digest = Column(LargeBinary, nullable=False)  # services.tdigest.TDigest.to_bytes()
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ProblemTimingSketch(Base):
+    """All-time t-digest of time_spent_minutes for one problem."""
+
+    __tablename__ = "problem_timing_sketches"
+
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    count = Column(Integer, default=0)
+    digest = Column(LargeBinary, nullable=False)
+    # p50 of the digest, kept alongside so planners can read it without decoding
+    median_minutes = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
@@ -0,0 +1,37 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from database import begin_read_snapshot, get_db
+from schemas import DashboardResponse
+from routers.history import recent_history
+from routers.stats import build_stats
+from routers.today import build_today
+
+router = APIRouter(prefix="/api", tags=["dashboard"])
+
+
+@router.get("/dashboard", response_model=DashboardResponse)
+def get_dashboard(
+    history_limit: int = Query(10, ge=1, le=50, description="Recent attempts to include"),
+    db: Session = Depends(get_db),
+):
+    """
+    Everything the app shows on open, in one request.
+
+    Returns:
+    - today: as GET /api/today
+    - stats: as GET /api/stats
+    - history: the most recent attempts, as GET /api/history?limit=history_limit
+
+    All three are read inside a single read transaction, so due counts,
+    the due list and recent attempts agree even while attempts are logged.
+    """
+    begin_read_snapshot(db)
+    generated_at = datetime.utcnow()
+    return {
+        "today": build_today(db),
+        "stats": build_stats(db),
+        "history": recent_history(db, limit=history_limit),
+        "generated_at": generated_at,
+    }
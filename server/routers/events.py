@@ -0,0 +1,50 @@
+import asyncio
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from services.events import broker
+
+router = APIRouter(prefix="/api", tags=["events"])
+
+# Comment line sent on idle streams so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """
+    Server-sent event stream of changes to problems and the review queue.
+
+    Event types:
+    - problem.created / problem.updated: {id, problem, counters}
+    - problem.deleted: {id, counters}
+    - attempt.logged: {problem_id, attempt_id, outcome, problem, counters}
+    - problem.postponed: {id, problem, counters}
+    - problems.deleted / problems.archived / problems.unarchived: {ids, counters}
+    - day.rollover: {counters}
+
+    counters is {total_problems, due_today, overdue}. Opening the stream
+    runs no queries.
+    """
+    subscription = broker.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not (subscription.closed and subscription.queue.empty()):
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+import config
+from database import get_db
+from routers.jobs import job_to_response
+from schemas import ExportCreate, ExportStatus, JobResponse
+from services import export
+from services.jobs import runner, submit_job
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+
+@router.get("", response_model=ExportStatus)
+def export_status():
+    """
+    The columnar analytics export: where it is, which formats this server
+    can write, and the manifest of the last run (None before the first).
+    """
+    return {
+        "directory": config.EXPORT_DIR,
+        "available": export.available(),
+        "formats": export.available_formats(),
+        "manifest": export.read_manifest(),
+    }
+
+
+@router.post("", response_model=JobResponse, status_code=202)
+def start_export(request: ExportCreate, db: Session = Depends(get_db)):
+    """
+    Queue an export run: appends attempts logged since the last one and
+    rewrites problems. full=true starts over. Poll GET /api/jobs/{id}.
+    """
+    if not export.available():
+        raise HTTPException(status_code=503, detail="Analytics export needs numpy installed")
+    payload = request.model_dump(mode="json", exclude_none=True)
+    try:
+        export.resolve_format(payload.get("format"))
+    except export.ExportError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    job = submit_job(db, "export_analytics", payload)
+    db.commit()
+    runner.wake()
+    return job_to_response(job)
@@ -5,32 +5,28 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import Attempt, Problem
 from schemas import HistoryResponse
+from services.archive import ATTEMPTS_ALL
 
 router = APIRouter(prefix="/api", tags=["history"])
 
 
-@router.get("/history", response_model=HistoryResponse)
-def get_history(
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-    outcome: Optional[str] = Query(None, description="Filter by outcome"),
-    db: Session = Depends(get_db),
-):
-    """
-    Get recent attempts across all problems.
-
-    Returns attempts in reverse chronological order (most recent first).
-    """
-    query = db.query(Attempt, Problem).join(Problem)
+def recent_history(db: Session, limit: int = 50, offset: int = 0, outcome: Optional[str] = None,
+                   include_archived: bool = False) -> dict:
+    """A page of attempts, most recent first, with the total matching count."""
+    source = ATTEMPTS_ALL if include_archived else Attempt.__table__
+    query = (
+        db.query(source, Problem.title, Problem.difficulty)
+        .join(Problem, Problem.id == source.c.problem_id)
+    )
 
     if outcome:
-        query = query.filter(Attempt.outcome == outcome.upper())
+        query = query.filter(source.c.outcome == outcome.upper())
 
     total = query.count()
 
     attempts = (
         query
-        .order_by(Attempt.attempted_at.desc())
+        .order_by(source.c.attempted_at.desc())
         .offset(offset)
         .limit(limit)
         .all()
@@ -41,15 +37,32 @@ def get_history(
             {
                 "id": a.id,
                 "problem_id": a.problem_id,
-                "problem_title": p.title,
-                "problem_difficulty": p.difficulty,
+                "problem_title": a.title,
+                "problem_difficulty": a.difficulty,
                 "attempted_at": a.attempted_at,
                 "outcome": a.outcome,
                 "time_spent_minutes": a.time_spent_minutes,
                 "stage_before": a.stage_before,
                 "stage_after": a.stage_after,
             }
-            for a, p in attempts
+            for a in attempts
         ],
         "total": total,
     }
+
+
+@router.get("/history", response_model=HistoryResponse)
+def get_history(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    outcome: Optional[str] = Query(None, description="Filter by outcome"),
+    include_archived: bool = Query(False, description="Also search attempts moved to archive partitions"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get recent attempts across all problems.
+
+    Returns attempts in reverse chronological order (most recent first).
+    Only the hot `attempts` table is read unless include_archived is set.
+    """
+    return recent_history(db, limit, offset, outcome, include_archived)
@@ -0,0 +1,83 @@
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import Job
+from schemas import JobCreate, JobResponse
+from services.jobs import get_handlers, request_cancel, runner, submit_job
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+def job_to_response(job: Job) -> dict:
+    """Convert Job model to response dict with parsed JSON fields."""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "payload": json.loads(job.payload) if job.payload else {},
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "progress_done": job.progress_done,
+        "progress_total": job.progress_total,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "cancel_requested": bool(job.cancel_requested),
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+@router.get("/kinds", response_model=list[str])
+def list_job_kinds():
+    """List the job kinds that can be submitted."""
+    return sorted(get_handlers())
+
+
+@router.get("", response_model=list[JobResponse])
+def list_jobs(
+    status: Optional[str] = Query(None, description="Filter by status"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    """List jobs, most recent first."""
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status == status.upper())
+    jobs = query.order_by(Job.created_at.desc()).limit(limit).all()
+    return [job_to_response(j) for j in jobs]
+
+
+@router.post("", response_model=JobResponse, status_code=202)
+def create_job(job: JobCreate, db: Session = Depends(get_db)):
+    """Queue a background job. Poll GET /api/jobs/{id} for progress."""
+    try:
+        db_job = submit_job(db, job.kind, job.payload, job.max_attempts)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    db.commit()
+    runner.wake()
+    return job_to_response(db_job)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Get a job's status and progress."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_response(job)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancel a queued job, or ask a running one to stop at its next checkpoint."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    request_cancel(db, job)
+    db.commit()
+    return job_to_response(job)
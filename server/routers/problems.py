@@ -1,45 +1,124 @@
-import json
-from datetime import datetime
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Text, delete, func, literal_column, type_coerce, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 
-from database import get_db
-from models import Problem, Attempt
+import config
+from database import IS_POSTGRESQL, get_db
+from models import Problem, title_tsvector
 from schemas import (
     ProblemCreate,
     ProblemUpdate,
     ProblemResponse,
     ProblemWithAttemptsResponse,
+    ProblemBatchRequest,
+    RelatedProblemResponse,
     AttemptCreate,
     AttemptResponse,
+    BulkProblemResult,
+    ProblemSelection,
 )
-from services.scheduling import update_schedule
+from services import due_index
+from services.changes import DELETE, lock_change_log, record_changes
+from services.events import publish_change
+from services.problem_cache import (
+    attempt_to_response,
+    details_for,
+    invalidate_on_commit,
+    problem_cache,
+    problem_to_response,
+    snapshots_for,
+)
+from services.attempts import ProblemNotFound, VersionConflict, apply_attempt, attempt_writer
+from services.similarity import related_index
 
 router = APIRouter(prefix="/api/problems", tags=["problems"])
 
+# Most problems one request may fetch by id
+MAX_BATCH_IDS = 500
+
+
+def _title_filter(search: str):
+    """Word-prefix full-text match on PostgreSQL (GIN index), substring match elsewhere."""
+    words = re.findall(r"\w+", search)
+    if IS_POSTGRESQL and words:
+        query = " & ".join(f"{word}:*" for word in words)
+        return title_tsvector(Problem.title).op("@@")(
+            func.to_tsquery(literal_column("'simple'::regconfig"), query)
+        )
+    return Problem.title.ilike(f"%{search}%")
+
+
+def _tag_filter(tag: str):
+    """JSONB containment on PostgreSQL (GIN index), match inside the JSON text elsewhere."""
+    if IS_POSTGRESQL:
+        return type_coerce(Problem.tags, JSONB).contains([tag])
+    return type_coerce(Problem.tags, Text).ilike(f'%"{tag}"%')
+
+
+def _filter_conditions(search: Optional[str], difficulty: Optional[str], tag: Optional[str],
+                       status: Optional[str], now: datetime, include_archived: bool = False) -> list:
+    """WHERE conditions for the list filters; shared by GET /api/problems and the bulk endpoints."""
+    conditions = []
+    if search:
+        conditions.append(_title_filter(search))
+    if difficulty:
+        conditions.append(Problem.difficulty == difficulty.upper())
+    if tag:
+        conditions.append(_tag_filter(tag))
+    if status == "archived":
+        conditions.append(Problem.archived_at.isnot(None))
+    elif not include_archived:
+        conditions.append(Problem.archived_at.is_(None))
+    if status == "overdue":
+        conditions.append(Problem.next_due_date < now)
+    elif status == "due_soon":
+        conditions.extend([Problem.next_due_date >= now, Problem.next_due_date <= now + timedelta(days=7)])
+    elif status == "mastered":
+        conditions.append(Problem.mastery_stage >= 4)
+    return conditions
+
+
+def _selection_conditions(selection: ProblemSelection, now: datetime) -> Optional[list]:
+    """WHERE conditions for a bulk request, or None if it selects nothing."""
+    if selection.ids is not None:
+        return [Problem.id.in_(selection.ids)] if selection.ids else None
+    selected = selection.filter
+    # Unlike the list, a filter matches archived problems unless its status excludes them
+    conditions = _filter_conditions(
+        selected.search,
+        selected.difficulty.value if selected.difficulty else None,
+        selected.tag,
+        selected.status.value if selected.status else None,
+        now,
+        include_archived=True,
+    )
+    if selected.created_before is not None:
+        conditions.append(Problem.created_at < selected.created_before)
+    if selected.last_attempted_before is not None:
+        conditions.append(func.coalesce(Problem.last_attempted_at, Problem.created_at) < selected.last_attempted_before)
+    return conditions
+
+
+def _parse_ids(ids: str) -> list[int]:
+    """Comma-separated problem ids, de-duplicated in order."""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    parsed = list(dict.fromkeys(parsed))
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
 
-def problem_to_response(problem: Problem) -> dict:
-    """Convert Problem model to response dict with parsed tags."""
-    return {
-        "id": problem.id,
-        "title": problem.title,
-        "platform": problem.platform,
-        "url": problem.url,
-        "difficulty": problem.difficulty,
-        "tags": json.loads(problem.tags) if problem.tags else [],
-        "notes_trick": problem.notes_trick,
-        "notes_mistakes": problem.notes_mistakes,
-        "notes_edge_cases": problem.notes_edge_cases,
-        "created_at": problem.created_at,
-        "updated_at": problem.updated_at,
-        "next_due_date": problem.next_due_date,
-        "interval_days": problem.interval_days,
-        "mastery_stage": problem.mastery_stage,
-        "consecutive_successes": problem.consecutive_successes,
-        "last_outcome": problem.last_outcome,
-        "last_attempted_at": problem.last_attempted_at,
-    }
+def _in_requested_order(rows: list, ids: list[int]) -> list:
+    versions = dict(rows)
+    return [(problem_id, versions[problem_id]) for problem_id in ids if problem_id in versions]
 
 
 @router.get("", response_model=list[ProblemResponse])
@@ -47,37 +126,38 @@ def list_problems(
     search: Optional[str] = Query(None, description="Search by title"),
     difficulty: Optional[str] = Query(None, description="Filter by difficulty"),
     tag: Optional[str] = Query(None, description="Filter by tag"),
-    status: Optional[str] = Query(None, description="Filter by status: overdue, due_soon, mastered"),
+    status: Optional[str] = Query(None, description="Filter by status: overdue, due_soon, mastered, archived"),
     sort: Optional[str] = Query("next_due_date", description="Sort by: next_due_date, last_attempted, difficulty, created_at"),
+    ids: Optional[str] = Query(None, description="Only these comma-separated ids, returned in that order"),
     db: Session = Depends(get_db),
 ):
     """List all problems with optional filters."""
-    query = db.query(Problem)
-
-    # Search filter
-    if search:
-        query = query.filter(Problem.title.ilike(f"%{search}%"))
-
-    # Difficulty filter
-    if difficulty:
-        query = query.filter(Problem.difficulty == difficulty.upper())
-
-    # Tag filter (search in JSON string)
-    if tag:
-        query = query.filter(Problem.tags.ilike(f'%"{tag}"%'))
-
-    # Status filter
     now = datetime.utcnow()
-    if status == "overdue":
-        query = query.filter(Problem.next_due_date < now)
-    elif status == "due_soon":
-        from datetime import timedelta
-        query = query.filter(
-            Problem.next_due_date >= now,
-            Problem.next_due_date <= now + timedelta(days=7)
-        )
-    elif status == "mastered":
-        query = query.filter(Problem.mastery_stage >= 4)
+    # Due-window listings in due order come straight from the due index
+    if (
+        status in ("overdue", "due_soon") and sort == "next_due_date"
+        and not (search or difficulty or tag or ids is not None) and due_index.ready(db)
+    ):
+        if status == "overdue":
+            rows = due_index.due_index.rows_between(end=now, include_end=False)
+        else:
+            rows = due_index.due_index.rows_between(now, now + timedelta(days=7))
+        return snapshots_for(db, rows)
+
+    # Select versions only; row snapshots come from the problem cache
+    query = db.query(Problem.id, Problem.updated_at)
+
+    # Id filter: one IN query instead of a request per problem
+    requested_ids = None
+    if ids is not None:
+        requested_ids = _parse_ids(ids)
+        if not requested_ids:
+            return []
+        query = query.filter(Problem.id.in_(requested_ids))
+
+    # Archived problems are listed by id or with status=archived only
+    query = query.filter(*_filter_conditions(search, difficulty, tag, status, now,
+                                             include_archived=requested_ids is not None))
 
     # Sorting
     if sort == "next_due_date":
@@ -90,33 +170,75 @@ def list_problems(
     elif sort == "created_at":
         query = query.order_by(Problem.created_at.desc())
 
-    problems = query.all()
-    return [problem_to_response(p) for p in problems]
+    rows = query.all()
+    if requested_ids is not None:
+        rows = _in_requested_order(rows, requested_ids)
+    return snapshots_for(db, rows)
+
+
+@router.post("/batch-get", response_model=list[ProblemWithAttemptsResponse])
+def batch_get_problems(request: ProblemBatchRequest, db: Session = Depends(get_db)):
+    """
+    Get many problems by id in one request, in the order requested. Unknown
+    ids are skipped. With include_attempts, each problem carries its attempt
+    history as in GET /api/problems/{problem_id}; otherwise attempts is empty.
+    """
+    problem_ids = list(dict.fromkeys(request.ids))
+    if not problem_ids:
+        return []
+    rows = _in_requested_order(
+        db.query(Problem.id, Problem.updated_at).filter(Problem.id.in_(problem_ids)).all(), problem_ids
+    )
+    if request.include_attempts:
+        return details_for(db, rows)
+    return snapshots_for(db, rows)
 
 
 @router.get("/{problem_id}", response_model=ProblemWithAttemptsResponse)
 def get_problem(problem_id: int, db: Session = Depends(get_db)):
     """Get a problem with its attempt history."""
+    entry = problem_cache.get(problem_id, with_attempts=True)
+    if entry is not None and config.PROBLEM_CACHE_VERIFY:
+        version = db.query(Problem.updated_at).filter(Problem.id == problem_id).scalar()
+        entry = entry if entry.version == version else None
+    if entry is not None:
+        return {**entry.problem, "attempts": entry.attempts}
+
+    generation = problem_cache.generation(problem_id)
     problem = db.query(Problem).filter(Problem.id == problem_id).first()
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
 
-    response = problem_to_response(problem)
-    response["attempts"] = [
-        {
-            "id": a.id,
-            "problem_id": a.problem_id,
-            "attempted_at": a.attempted_at,
-            "outcome": a.outcome,
-            "time_spent_minutes": a.time_spent_minutes,
-            "notes": a.notes,
-            "stage_before": a.stage_before,
-            "stage_after": a.stage_after,
-            "next_due_date_after": a.next_due_date_after,
-        }
+    snapshot = problem_to_response(problem)
+    attempts = [
+        attempt_to_response(a)
         for a in sorted(problem.attempts, key=lambda x: x.attempted_at, reverse=True)
     ]
-    return response
+    problem_cache.put(problem_id, problem.updated_at, snapshot, attempts, generation)
+    return {**snapshot, "attempts": attempts}
+
+
+@router.get("/{problem_id}/related", response_model=list[RelatedProblemResponse])
+def get_related_problems(
+    problem_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    min_similarity: float = Query(0.1, ge=0, le=1, description="Minimum Jaccard similarity"),
+    db: Session = Depends(get_db),
+):
+    """Problems with similar tags, titles and notes, most similar first."""
+    related_index.sync(db)
+    related = related_index.related(problem_id, limit, min_similarity)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    if not related:
+        return []
+
+    versions = dict(
+        db.query(Problem.id, Problem.updated_at).filter(Problem.id.in_([r["id"] for r in related])).all()
+    )
+    rows = [(r["id"], versions[r["id"]]) for r in related if r["id"] in versions]
+    snapshots = {snapshot["id"]: snapshot for snapshot in snapshots_for(db, rows)}
+    return [{**snapshots[r["id"]], **r} for r in related if r["id"] in snapshots]
 
 
 @router.post("", response_model=ProblemResponse, status_code=201)
@@ -127,40 +249,50 @@ def create_problem(problem: ProblemCreate, db: Session = Depends(get_db)):
         platform=problem.platform,
         url=problem.url,
         difficulty=problem.difficulty.value,
-        tags=json.dumps(problem.tags),
+        tags=problem.tags,
         notes_trick=problem.notes_trick,
         notes_mistakes=problem.notes_mistakes,
         notes_edge_cases=problem.notes_edge_cases,
     )
     db.add(db_problem)
+    # The INSERT returns the id and every other column is set client-side,
+    # so the response is built before commit instead of refreshing after it
+    db.flush()
+    response = problem_to_response(db_problem)
     db.commit()
-    db.refresh(db_problem)
-    return problem_to_response(db_problem)
+    publish_change(db, "problem.created", id=response["id"], problem=response)
+    return response
 
 
 @router.put("/{problem_id}", response_model=ProblemResponse)
 def update_problem(problem_id: int, problem: ProblemUpdate, db: Session = Depends(get_db)):
     """Update a problem."""
-    db_problem = db.query(Problem).filter(Problem.id == problem_id).first()
-    if not db_problem:
-        raise HTTPException(status_code=404, detail="Problem not found")
-
     update_data = problem.model_dump(exclude_unset=True)
 
-    # Handle tags specially (convert list to JSON string)
-    if "tags" in update_data:
-        update_data["tags"] = json.dumps(update_data["tags"])
-
     # Handle difficulty enum
     if "difficulty" in update_data and update_data["difficulty"]:
         update_data["difficulty"] = update_data["difficulty"].value
 
-    for field, value in update_data.items():
-        setattr(db_problem, field, value)
+    # One UPDATE ... RETURNING instead of load, flush and refresh. It bypasses
+    # the unit of work, so log the change and invalidate the cache explicitly.
+    lock_change_log(db)
+    db_problem = db.execute(
+        update(Problem)
+        .where(Problem.id == problem_id)
+        .values(**update_data, version=Problem.version + 1, updated_at=datetime.utcnow())
+        .returning(Problem),
+        execution_options={"synchronize_session": False},
+    ).scalar_one_or_none()
+    if not db_problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
 
+    record_changes(db, "problem", [problem_id])
+    invalidate_on_commit(db, [problem_id])
+    due_index.update_on_commit(db, [db_problem])
+    response = problem_to_response(db_problem)
     db.commit()
-    db.refresh(db_problem)
-    return problem_to_response(db_problem)
+    publish_change(db, "problem.updated", id=problem_id, problem=response)
+    return response
 
 
 @router.delete("/{problem_id}", status_code=204)
@@ -170,79 +302,153 @@ def delete_problem(problem_id: int, db: Session = Depends(get_db)):
     if not db_problem:
         raise HTTPException(status_code=404, detail="Problem not found")
 
+    # Attempts go with it through ON DELETE CASCADE, without being loaded
     db.delete(db_problem)
     db.commit()
+    publish_change(db, "problem.deleted", id=problem_id)
     return None
 
 
-@router.post("/{problem_id}/attempt", response_model=AttemptResponse)
-def log_attempt(problem_id: int, attempt: AttemptCreate, db: Session = Depends(get_db)):
-    """Log an attempt and update scheduling."""
-    db_problem = db.query(Problem).filter(Problem.id == problem_id).first()
-    if not db_problem:
-        raise HTTPException(status_code=404, detail="Problem not found")
+@router.post("/bulk-delete", response_model=BulkProblemResult)
+def bulk_delete_problems(selection: ProblemSelection, db: Session = Depends(get_db)):
+    """
+    Delete the problems given by ids or matching a filter, in one DELETE.
+    Their attempts, rollups and timing sketches are removed by ON DELETE
+    CASCADE in the same statement; attempts already moved to archive
+    partitions are purged by the next archive run.
+    """
+    conditions = _selection_conditions(selection, datetime.utcnow())
+    if conditions is None:
+        return {"count": 0, "ids": []}
+    lock_change_log(db)
+    deleted = sorted(db.execute(
+        delete(Problem).where(*conditions).returning(Problem.id),
+        execution_options={"synchronize_session": False},
+    ).scalars())
+
+    record_changes(db, "problem", deleted, op=DELETE)
+    invalidate_on_commit(db, deleted)
+    due_index.remove_on_commit(db, deleted)
+    db.commit()
+    if deleted:
+        publish_change(db, "problems.deleted", ids=deleted)
+    return {"count": len(deleted), "ids": deleted}
 
-    # Capture stage before update
-    stage_before = db_problem.mastery_stage
 
-    # Create attempt record
-    db_attempt = Attempt(
-        problem_id=problem_id,
-        outcome=attempt.outcome.value,
-        time_spent_minutes=attempt.time_spent_minutes,
-        notes=attempt.notes,
-        stage_before=stage_before,
-    )
-    db.add(db_attempt)
+def _set_archived(db: Session, selection: ProblemSelection, archive: bool) -> list[int]:
+    """One UPDATE ... RETURNING over the selection, skipping problems already in the target state."""
+    now = datetime.utcnow()
+    conditions = _selection_conditions(selection, now)
+    if conditions is None:
+        return []
+    if archive:
+        state = Problem.archived_at.is_(None)
+        values = {"archived_at": now, "next_due_date": None}
+    else:
+        # Back in rotation due now: an archived problem's old schedule is likely stale
+        state = Problem.archived_at.isnot(None)
+        values = {"archived_at": None, "next_due_date": now}
+    lock_change_log(db)
+    rows = db.execute(
+        update(Problem)
+        .where(*conditions, state)
+        .values(**values, version=Problem.version + 1, updated_at=now)
+        .returning(Problem.id, Problem.next_due_date, Problem.mastery_stage, Problem.updated_at),
+        execution_options={"synchronize_session": False},
+    ).all()
+
+    changed = sorted(row.id for row in rows)
+    record_changes(db, "problem", changed)
+    invalidate_on_commit(db, changed)
+    due_index.update_on_commit(db, rows)
+    db.commit()
+    return changed
 
-    # Update scheduling
-    update_schedule(db_problem, attempt.outcome.value)
 
-    # Capture stage after update
-    db_attempt.stage_after = db_problem.mastery_stage
-    db_attempt.next_due_date_after = db_problem.next_due_date
+@router.post("/bulk-archive", response_model=BulkProblemResult)
+def bulk_archive_problems(selection: ProblemSelection, db: Session = Depends(get_db)):
+    """
+    Take the selected problems out of rotation: they keep their history but
+    have no due date, so they leave the review queue and due counters, and
+    the list shows them only with status=archived. Logging an attempt on one
+    brings it back.
+    """
+    archived = _set_archived(db, selection, archive=True)
+    if archived:
+        publish_change(db, "problems.archived", ids=archived)
+    return {"count": len(archived), "ids": archived}
 
-    db.commit()
-    db.refresh(db_attempt)
 
-    return {
-        "id": db_attempt.id,
-        "problem_id": db_attempt.problem_id,
-        "attempted_at": db_attempt.attempted_at,
-        "outcome": db_attempt.outcome,
-        "time_spent_minutes": db_attempt.time_spent_minutes,
-        "notes": db_attempt.notes,
-        "stage_before": db_attempt.stage_before,
-        "stage_after": db_attempt.stage_after,
-        "next_due_date_after": db_attempt.next_due_date_after,
-    }
+@router.post("/bulk-unarchive", response_model=BulkProblemResult)
+def bulk_unarchive_problems(selection: ProblemSelection, db: Session = Depends(get_db)):
+    """Put the selected archived problems back into rotation, due now."""
+    unarchived = _set_archived(db, selection, archive=False)
+    if unarchived:
+        publish_change(db, "problems.unarchived", ids=unarchived)
+    return {"count": len(unarchived), "ids": unarchived}
+
+
+@router.post("/{problem_id}/attempt", response_model=AttemptResponse)
+def log_attempt(problem_id: int, attempt: AttemptCreate, db: Session = Depends(get_db)):
+    """Log an attempt and update scheduling."""
+    if attempt_writer.running:
+        attempt_response, problem_response = _write_through_group_commit(
+            problem_id, attempt.outcome.value, attempt.time_spent_minutes, attempt.notes, attempt.expected_version
+        )
+    else:
+        with _attempt_errors():
+            db_attempt, db_problem = apply_attempt(
+                db, problem_id, attempt.outcome.value, attempt.time_spent_minutes, attempt.notes,
+                attempt.expected_version,
+            )
+        # Both rows came back from RETURNING; serialize before commit expires them
+        attempt_response = attempt_to_response(db_attempt)
+        problem_response = problem_to_response(db_problem)
+        db.commit()
+
+    publish_change(
+        db,
+        "attempt.logged",
+        problem_id=problem_id,
+        attempt_id=attempt_response["id"],
+        outcome=attempt_response["outcome"],
+        problem=problem_response,
+    )
+
+    return attempt_response
 
 
 @router.post("/{problem_id}/postpone", response_model=ProblemResponse)
 def postpone_problem(problem_id: int, db: Session = Depends(get_db)):
     """Postpone a problem by 1 day."""
-    db_problem = db.query(Problem).filter(Problem.id == problem_id).first()
-    if not db_problem:
-        raise HTTPException(status_code=404, detail="Problem not found")
-
-    # Capture stage before update
-    stage_before = db_problem.mastery_stage
-
-    # Log postpone attempt and update schedule
-    db_attempt = Attempt(
-        problem_id=problem_id,
-        outcome="POSTPONE",
-        stage_before=stage_before,
-    )
-    db.add(db_attempt)
+    if attempt_writer.running:
+        _, response = _write_through_group_commit(problem_id, "POSTPONE")
+    else:
+        # Log postpone attempt and update schedule
+        with _attempt_errors():
+            _, db_problem = apply_attempt(db, problem_id, "POSTPONE")
+        response = problem_to_response(db_problem)
+        db.commit()
+
+    publish_change(db, "problem.postponed", id=problem_id, problem=response)
+    return response
 
-    update_schedule(db_problem, "POSTPONE")
 
-    # Capture stage after update
-    db_attempt.stage_after = db_problem.mastery_stage
-    db_attempt.next_due_date_after = db_problem.next_due_date
+@contextmanager
+def _attempt_errors():
+    try:
+        yield
+    except ProblemNotFound:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    except VersionConflict as exc:
+        raise HTTPException(
+            status_code=409, detail=f"Problem was changed (now version {exc.version}); reload and retry"
+        )
 
-    db.commit()
-    db.refresh(db_problem)
 
-    return problem_to_response(db_problem)
+def _write_through_group_commit(problem_id: int, outcome: str, time_spent_minutes=None, notes=None,
+                                expected_version=None):
+    """Queue an attempt on the group-commit writer and wait for its batch to commit."""
+    future = attempt_writer.submit(problem_id, outcome, time_spent_minutes, notes, expected_version)
+    with _attempt_errors():
+        return future.result()
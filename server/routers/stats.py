@@ -1,51 +1,27 @@
-import json
 from collections import defaultdict
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
+import config
 from database import get_db
 from models import Problem, Attempt
-from schemas import StatsResponse, TagStats
+from schemas import StatsResponse, TagStats, TagStatsResponse, TimingStatsResponse
+from services import tag_analytics, timing
+from services.scheduling import due_counts
 
 router = APIRouter(prefix="/api", tags=["stats"])
 
 
-@router.get("/stats", response_model=StatsResponse)
-def get_stats(db: Session = Depends(get_db)):
-    """
-    Get statistics for the dashboard.
-
-    Returns:
-    - total_problems: Total number of problems tracked
-    - due_today: Problems due today (next_due_date <= end of today)
-    - overdue: Problems overdue (next_due_date < start of today)
-    - attempts_last_7_days: Number of attempts in the last 7 days
-    - attempts_last_30_days: Number of attempts in the last 30 days
-    - weak_tags: Tags with fail rate > 40% in last 30 days
-    """
+def build_stats(db: Session) -> StatsResponse:
+    """Dashboard counters and weak tags, shared by GET /api/stats and GET /api/dashboard."""
     now = datetime.utcnow()
-    start_of_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
     thirty_days_ago = now - timedelta(days=30)
     seven_days_ago = now - timedelta(days=7)
 
-    # Total problems
-    total_problems = db.query(Problem).count()
-
-    # Due today (including overdue)
-    due_today = (
-        db.query(Problem)
-        .filter(Problem.next_due_date <= end_of_today)
-        .count()
-    )
-
-    # Overdue (strictly before today)
-    overdue = (
-        db.query(Problem)
-        .filter(Problem.next_due_date < start_of_today)
-        .count()
-    )
+    # Total, due today (including overdue) and overdue (strictly before today)
+    counts = due_counts(db, now)
 
     # Attempts in last 7 days
     attempts_last_7_days = (
@@ -73,8 +49,7 @@ def get_stats(db: Session = Depends(get_db)):
     tag_stats = defaultdict(lambda: {"total": 0, "failures": 0})
 
     for attempt, problem in recent_attempts:
-        tags = json.loads(problem.tags) if problem.tags else []
-        for tag in tags:
+        for tag in problem.tags:
             tag_stats[tag]["total"] += 1
             if attempt.outcome in ["FAIL", "SHAKY"]:
                 tag_stats[tag]["failures"] += 1
@@ -97,10 +72,65 @@ def get_stats(db: Session = Depends(get_db)):
     weak_tags.sort(key=lambda x: x.fail_rate, reverse=True)
 
     return StatsResponse(
-        total_problems=total_problems,
-        due_today=due_today,
-        overdue=overdue,
+        total_problems=counts["total_problems"],
+        due_today=counts["due_today"],
+        overdue=counts["overdue"],
         attempts_last_7_days=attempts_last_7_days,
         attempts_last_30_days=attempts_last_30_days,
         weak_tags=weak_tags[:5],  # Top 5 weakest tags
     )
+
+
+@router.get("/stats", response_model=StatsResponse)
+def get_stats(db: Session = Depends(get_db)):
+    """
+    Get statistics for the dashboard.
+
+    Returns:
+    - total_problems: Total number of problems tracked
+    - due_today: Problems due today (next_due_date <= end of today)
+    - overdue: Problems overdue (next_due_date < start of today)
+    - attempts_last_7_days: Number of attempts in the last 7 days
+    - attempts_last_30_days: Number of attempts in the last 30 days
+    - weak_tags: Tags with fail rate > 40% in last 30 days
+    """
+    return build_stats(db)
+
+
+@router.get("/stats/tags", response_model=TagStatsResponse)
+def get_tag_stats(
+    days: int = Query(90, ge=1, le=max(config.ARCHIVE_AFTER_DAYS, 1), description="Attempt window in whole days"),
+    min_pair_attempts: int = Query(5, ge=1, description="Minimum attempts for a tag pair to be ranked by lift"),
+    limit: int = Query(20, ge=1, le=200, description="Pairs returned per ranking"),
+    db: Session = Depends(get_db),
+):
+    """
+    Tag analytics over the attempt window:
+
+    - tags: problems, attempts, pass rate with 95% Wilson interval and
+      mastery-stage histogram per tag
+    - co_occurrence: tag pairs sharing the most problems (with Jaccard)
+    - pair_lift: tag pairs whose combined fail rate (FAIL or SHAKY) is
+      highest relative to the overall fail rate
+
+    Cached until the next problem or attempt write.
+    """
+    if not tag_analytics.available():
+        raise HTTPException(status_code=503, detail="Tag analytics require NumPy")
+    return tag_analytics.tag_stats(db, days, min_pair_attempts, limit)
+
+
+@router.get("/stats/timing", response_model=TimingStatsResponse)
+def get_timing_stats(
+    months: int = Query(12, ge=1, le=120, description="Calendar months to include, ending with this one"),
+    difficulty: Optional[str] = Query(None, description="Only this difficulty"),
+    tag: Optional[str] = Query(None, description="Only this tag"),
+    problem_id: Optional[int] = Query(None, description="Also report this problem's all-time percentiles"),
+    db: Session = Depends(get_db),
+):
+    """
+    p50/p90 time spent (minutes) on graded attempts, merged from t-digest
+    sketches: overall, by difficulty, by tag, per month (trend) and for one
+    problem. Estimates, typically within 1% in rank of the exact percentile.
+    """
+    return timing.timing_stats(db, months, difficulty, tag, problem_id)
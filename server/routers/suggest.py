@@ -0,0 +1,27 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from database import get_db
+from schemas import SuggestKind, SuggestResponse
+from services.suggest import suggest_index
+
+router = APIRouter(prefix="/api", tags=["suggest"])
+
+
+@router.get("/suggest", response_model=SuggestResponse)
+def suggest(
+    q: str = Query(..., min_length=1, max_length=100, description="What has been typed so far"),
+    kind: Optional[SuggestKind] = Query(None, description="Only tags or only titles"),
+    limit: int = Query(8, ge=1, le=25),
+    db: Session = Depends(get_db),
+):
+    """
+    Typeahead for tag and title fields.
+
+    Tags match by prefix ignoring case and separators, most used first;
+    free slots are filled with near-duplicate spellings (match="fuzzy").
+    Titles match at the start of any word, most attempted first.
+    """
+    suggest_index.sync(db)
+    return {"query": q, **suggest_index.suggest(q, limit, kind.value if kind else None)}
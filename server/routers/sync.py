@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import Attempt, Problem
+from schemas import SyncPushRequest, SyncPushResponse, SyncResponse
+from services.attempts import record_attempt
+from services.changes import DELETE, changes_since, current_token, lock_change_log
+from services.problem_cache import attempt_to_response, problem_to_response
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+@router.get("", response_model=SyncResponse)
+def pull_changes(
+    since: int = Query(0, ge=0, description="Token from the previous sync; 0 for a full download"),
+    limit: int = Query(1000, ge=1, le=5000, description="Maximum change-log entries per page"),
+    db: Session = Depends(get_db),
+):
+    """
+    Return problems and attempts created, updated or deleted since `since`.
+
+    Pass the returned token as `since` next time. While has_more is true,
+    call again immediately with the new token to fetch the next page. A
+    deleted problem implies its attempts are deleted too. Attempts moved to
+    archive partitions are not reported as deleted; a full download only
+    includes the hot attempts table.
+    """
+    # Read the cursor first: anything committed after this point is picked up
+    # by the next sync (possibly twice, which is harmless for upserts)
+    token = current_token(db)
+
+    if since == 0:
+        return {
+            "token": token,
+            "has_more": False,
+            "full": True,
+            "problems": [problem_to_response(p) for p in db.query(Problem).order_by(Problem.id)],
+            "attempts": [attempt_to_response(a) for a in db.query(Attempt).order_by(Attempt.id)],
+            "deleted": {"problems": [], "attempts": []},
+        }
+
+    latest, token, has_more = changes_since(db, since, token, limit)
+    deleted = {"problems": [], "attempts": []}
+    upserted = {}
+    for entity, model in (("problem", Problem), ("attempt", Attempt)):
+        ids = [entity_id for entity_id, op in latest[entity].items() if op != DELETE]
+        deleted[f"{entity}s"] = sorted(entity_id for entity_id, op in latest[entity].items() if op == DELETE)
+        rows = db.query(model).filter(model.id.in_(ids)).order_by(model.id).all() if ids else []
+        # Rows upserted then deleted after the cursor are reported as deleted
+        deleted[f"{entity}s"].extend(sorted(set(ids) - {row.id for row in rows}))
+        upserted[entity] = rows
+
+    return {
+        "token": token,
+        "has_more": has_more,
+        "full": False,
+        "problems": [problem_to_response(p) for p in upserted["problem"]],
+        "attempts": [attempt_to_response(a) for a in upserted["attempt"]],
+        "deleted": deleted,
+    }
+
+
+@router.post("/push", response_model=SyncPushResponse)
+def push_attempts(request: SyncPushRequest, db: Session = Depends(get_db)):
+    """
+    Apply attempts recorded while offline, oldest first, in one transaction.
+
+    Each attempt carries a client-generated client_id; attempts whose
+    client_id was already applied (by an earlier or a concurrent push) are
+    reported as duplicates, so a client can safely retry a push. An attempt
+    older than the problem's last attempt is kept as history but does not
+    reschedule the problem. attempted_at without an offset is taken as UTC.
+    """
+    now = datetime.utcnow()
+    client_ids = [a.client_id for a in request.attempts]
+    seen = {
+        client_id for (client_id,) in
+        db.query(Attempt.client_id).filter(Attempt.client_id.in_(client_ids))
+    } if client_ids else set()
+    problem_ids = {a.problem_id for a in request.attempts}
+    problems = {p.id: p for p in db.query(Problem).filter(Problem.id.in_(problem_ids))} if problem_ids else {}
+
+    applied, duplicates, rejected = [], [], []
+    if problems:
+        lock_change_log(db)
+    for attempt in sorted(request.attempts, key=lambda a: _as_utc(a.attempted_at) or now):
+        if attempt.client_id in seen:
+            duplicates.append(attempt.client_id)
+            continue
+        problem = problems.get(attempt.problem_id)
+        if problem is None:
+            rejected.append({"client_id": attempt.client_id, "reason": "Problem not found"})
+            continue
+        # Clamp clock skew: an offline attempt cannot be in the future
+        attempted_at = min(_as_utc(attempt.attempted_at), now) if attempt.attempted_at else now
+        db_attempt = record_attempt(
+            db,
+            problem,
+            attempt.outcome.value,
+            attempt.time_spent_minutes,
+            attempt.notes,
+            attempted_at=attempted_at,
+            client_id=attempt.client_id,
+        )
+        if db_attempt is None:
+            duplicates.append(attempt.client_id)
+        else:
+            applied.append(db_attempt)
+        seen.add(attempt.client_id)
+
+    db.flush()
+    applied_responses = [attempt_to_response(a) for a in applied]
+    db.commit()
+
+    return {
+        "token": current_token(db),
+        "applied": applied_responses,
+        "duplicates": duplicates,
+        "rejected": rejected,
+    }
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC, as stored; an aware value is converted first, not just stripped of its offset."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -1,65 +1,43 @@
-import json
 from datetime import datetime
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models import Problem
-from schemas import TodayResponse
+from schemas import TodayPlanResponse, TodayResponse
+from services import due_index
+from services.planner import plan_session
+from services.problem_cache import snapshots_for
+from services.similarity import related_index
 
 router = APIRouter(prefix="/api", tags=["today"])
 
 
-def problem_to_response(problem: Problem) -> dict:
-    """Convert Problem model to response dict with parsed tags."""
-    return {
-        "id": problem.id,
-        "title": problem.title,
-        "platform": problem.platform,
-        "url": problem.url,
-        "difficulty": problem.difficulty,
-        "tags": json.loads(problem.tags) if problem.tags else [],
-        "notes_trick": problem.notes_trick,
-        "notes_mistakes": problem.notes_mistakes,
-        "notes_edge_cases": problem.notes_edge_cases,
-        "created_at": problem.created_at,
-        "updated_at": problem.updated_at,
-        "next_due_date": problem.next_due_date,
-        "interval_days": problem.interval_days,
-        "mastery_stage": problem.mastery_stage,
-        "consecutive_successes": problem.consecutive_successes,
-        "last_outcome": problem.last_outcome,
-        "last_attempted_at": problem.last_attempted_at,
-    }
-
-
-@router.get("/today", response_model=TodayResponse)
-def get_today(db: Session = Depends(get_db)):
-    """
-    Get problems for today's review session.
-
-    Returns:
-    - due: Problems where next_due_date <= end of today (overdue + due today)
-    - new: Problems that have never been attempted (limit 5)
-    """
+def build_today(db: Session, group_related: bool = False, min_similarity: float = 0.2) -> dict:
+    """Due and new problems (and optional related clusters) for GET /api/today and the dashboard."""
     now = datetime.utcnow()
     end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
 
     # Due Today: problems where next_due_date <= today
-    due_problems = (
-        db.query(Problem)
-        .filter(Problem.next_due_date <= end_of_today)
-        .order_by(Problem.next_due_date.asc())
-        .all()
-    )
+    # Select versions only; row snapshots come from the problem cache
+    if due_index.ready(db):
+        due_rows = due_index.due_index.rows_between(end=end_of_today)
+    else:
+        due_rows = (
+            db.query(Problem.id, Problem.updated_at)
+            .filter(Problem.next_due_date <= end_of_today)
+            .order_by(Problem.next_due_date.asc())
+            .all()
+        )
 
     # Optional New: recently added but never attempted, limit 5
     # Exclude problems that are already in the due list
-    due_ids = [p.id for p in due_problems]
-    new_problems = (
-        db.query(Problem)
+    due_ids = [problem_id for problem_id, _ in due_rows]
+    new_rows = (
+        db.query(Problem.id, Problem.updated_at)
         .filter(
             Problem.last_attempted_at.is_(None),
+            Problem.archived_at.is_(None),
             ~Problem.id.in_(due_ids) if due_ids else True,
         )
         .order_by(Problem.created_at.desc())
@@ -67,7 +45,49 @@ def get_today(db: Session = Depends(get_db)):
         .all()
     )
 
+    clusters = None
+    if group_related:
+        related_index.sync(db)
+        clusters = [
+            {"problem_ids": members, "shared_tags": related_index.shared_tags(members) if len(members) > 1 else []}
+            for members in related_index.clusters(due_ids, min_similarity)
+        ]
+
     return {
-        "due": [problem_to_response(p) for p in due_problems],
-        "new": [problem_to_response(p) for p in new_problems],
+        "due": snapshots_for(db, due_rows),
+        "new": snapshots_for(db, new_rows),
+        "clusters": clusters,
     }
+
+
+@router.get("/today", response_model=TodayResponse)
+def get_today(
+    group_related: bool = Query(False, description="Also group due problems into related clusters"),
+    min_similarity: float = Query(0.2, ge=0, le=1, description="Similarity that links two due problems"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get problems for today's review session.
+
+    Returns:
+    - due: Problems where next_due_date <= end of today (overdue + due today)
+    - new: Problems that have never been attempted (limit 5)
+    - clusters: with group_related, due problem ids grouped by similarity,
+      in due order, so related problems can be reviewed back to back
+    """
+    return build_today(db, group_related, min_similarity)
+
+
+@router.get("/today/plan", response_model=TodayPlanResponse)
+def get_today_plan(
+    minutes: int = Query(60, ge=5, le=720, description="Study time available"),
+    db: Session = Depends(get_db),
+):
+    """
+    Plan a review session that fits in `minutes`.
+
+    Picks the due problems that together protect the most mastery (see
+    services/planner.py), using each problem's median time spent (or its
+    difficulty's) as its cost. Items are most valuable first.
+    """
+    return plan_session(db, minutes)
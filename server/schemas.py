@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 from typing import Optional
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 
 class Difficulty(str, Enum):
@@ -18,6 +18,30 @@ class Outcome(str, Enum):
     POSTPONE = "POSTPONE"
 
 
+# Attempt schemas
+class AttemptBase(BaseModel):
+    outcome: Outcome
+    time_spent_minutes: Optional[int] = None
+    notes: Optional[str] = None
+
+
+class AttemptCreate(AttemptBase):
+    time_spent_minutes: Optional[int] = Field(None, ge=0)
+    # Problem version the client last saw; the attempt is refused with 409 if it has changed since
+    expected_version: Optional[int] = None
+
+
+class AttemptResponse(AttemptBase):
+    id: int
+    problem_id: int
+    attempted_at: datetime
+    stage_before: Optional[int] = None
+    stage_after: Optional[int] = None
+    next_due_date_after: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 # Problem schemas
 class ProblemBase(BaseModel):
     title: str
@@ -67,48 +91,107 @@ class ProblemResponse(ProblemBase):
     id: int
     created_at: datetime
     updated_at: datetime
-    next_due_date: datetime
+    # None while archived
+    next_due_date: Optional[datetime] = None
     interval_days: int
     mastery_stage: int
     consecutive_successes: int
     last_outcome: Optional[str] = None
     last_attempted_at: Optional[datetime] = None
+    archived_at: Optional[datetime] = None
+    version: int = 1
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ProblemWithAttemptsResponse(ProblemResponse):
-    attempts: list["AttemptResponse"] = []
+    attempts: list[AttemptResponse] = []
 
 
-# Attempt schemas
-class AttemptBase(BaseModel):
-    outcome: Outcome
-    time_spent_minutes: Optional[int] = None
-    notes: Optional[str] = None
+class ProblemBatchRequest(BaseModel):
+    ids: list[int] = Field(..., max_length=500)
+    include_attempts: bool = False
 
 
-class AttemptCreate(AttemptBase):
-    pass
+class RelatedProblemResponse(ProblemResponse):
+    similarity: float
+    shared_tags: list[str] = []
 
 
-class AttemptResponse(AttemptBase):
-    id: int
-    problem_id: int
-    attempted_at: datetime
-    stage_before: Optional[int] = None
-    stage_after: Optional[int] = None
-    next_due_date_after: Optional[datetime] = None
+# Bulk delete/archive/unarchive
+class ProblemStatus(str, Enum):
+    OVERDUE = "overdue"
+    DUE_SOON = "due_soon"
+    MASTERED = "mastered"
+    ARCHIVED = "archived"
+
+
+class ProblemFilter(BaseModel):
+    """The list endpoint's filters, plus cutoffs for pruning old problems. Conditions are ANDed."""
+
+    search: Optional[str] = None
+    difficulty: Optional[Difficulty] = None
+    tag: Optional[str] = None
+    status: Optional[ProblemStatus] = None
+    created_before: Optional[datetime] = None
+    # Problems never attempted count as last attempted at creation
+    last_attempted_before: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def require_condition(self):
+        if not any(value is not None and value != "" for value in self.model_dump().values()):
+            raise ValueError("filter needs at least one condition")
+        return self
+
+
+class ProblemSelection(BaseModel):
+    """Either explicit ids or a filter, not both."""
+
+    ids: Optional[list[int]] = Field(None, max_length=500)
+    filter: Optional[ProblemFilter] = None
 
-    class Config:
-        from_attributes = True
+    @model_validator(mode="after")
+    def require_one(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("give either ids or filter")
+        return self
+
+
+class BulkProblemResult(BaseModel):
+    # Problems the statement changed; ids already in the requested state are not counted
+    count: int
+    ids: list[int]
 
 
 # Today endpoint response
+class TodayCluster(BaseModel):
+    problem_ids: list[int]
+    shared_tags: list[str] = []
+
+
 class TodayResponse(BaseModel):
     due: list[ProblemResponse]
     new: list[ProblemResponse]
+    clusters: Optional[list[TodayCluster]] = None
+
+
+class PlanItem(BaseModel):
+    problem: ProblemResponse
+    estimated_minutes: int
+    estimate: str  # "history" (own median time) or "difficulty"
+    overdue_days: float
+    recall: float  # estimated chance it is still remembered now
+    value: float  # expected mastery stages lost if skipped
+
+
+class TodayPlanResponse(BaseModel):
+    minutes: int
+    planned_minutes: int
+    due_count: int
+    value: float
+    value_all_due: float
+    method: str  # "knapsack", or "greedy" without NumPy
+    items: list[PlanItem]
 
 
 # Stats response
@@ -127,6 +210,71 @@ class StatsResponse(BaseModel):
     weak_tags: list[TagStats]
 
 
+class TagAnalytics(BaseModel):
+    tag: str
+    problems: int
+    attempts: int
+    pass_rate: Optional[float] = None
+    pass_rate_ci: Optional[list[float]] = None  # Wilson 95% [low, high]
+    mastery_histogram: list[int]  # problems per mastery stage 0-5
+
+
+class TagPairCount(BaseModel):
+    tags: list[str]
+    problems: int
+    jaccard: float
+
+
+class TagPairLift(BaseModel):
+    tags: list[str]
+    attempts: int
+    fail_rate: float
+    lift: float
+    excess_fail_rate: float
+
+
+class TagStatsResponse(BaseModel):
+    data_version: int
+    window_days: int
+    problems: int
+    attempts: int
+    baseline_fail_rate: float
+    tags: list[TagAnalytics]
+    co_occurrence: list[TagPairCount]
+    pair_lift: list[TagPairLift]
+
+
+class TimingSummary(BaseModel):
+    count: int
+    p50: Optional[float] = None  # minutes
+    p90: Optional[float] = None
+
+
+class DifficultyTiming(TimingSummary):
+    difficulty: str
+
+
+class TagTiming(TimingSummary):
+    tag: str
+
+
+class MonthTiming(TimingSummary):
+    month: str  # YYYY-MM
+
+
+class ProblemTiming(TimingSummary):
+    problem_id: int
+
+
+class TimingStatsResponse(BaseModel):
+    months: int
+    overall: TimingSummary
+    by_difficulty: list[DifficultyTiming]
+    by_tag: list[TagTiming]
+    trend: list[MonthTiming]
+    problem: Optional[ProblemTiming] = None
+
+
 # History response
 class HistoryAttemptResponse(BaseModel):
     id: int
@@ -139,8 +287,7 @@ class HistoryAttemptResponse(BaseModel):
     stage_before: Optional[int] = None
     stage_after: Optional[int] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class HistoryResponse(BaseModel):
@@ -148,5 +295,116 @@ class HistoryResponse(BaseModel):
     total: int
 
 
-# Update forward reference
-ProblemWithAttemptsResponse.model_rebuild()
+# Dashboard: today, stats and recent history read from one snapshot
+class DashboardResponse(BaseModel):
+    today: TodayResponse
+    stats: StatsResponse
+    history: HistoryResponse
+    generated_at: datetime
+
+
+# Typeahead
+class SuggestKind(str, Enum):
+    TAG = "tag"
+    TITLE = "title"
+
+
+class TagSuggestion(BaseModel):
+    tag: str
+    count: int  # problems carrying the tag
+    match: str  # "prefix", or "fuzzy" for a near-duplicate spelling
+    similarity: Optional[float] = None
+
+
+class TitleSuggestion(BaseModel):
+    id: int
+    title: str
+    difficulty: str
+    attempts: int
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    tags: list[TagSuggestion]
+    titles: list[TitleSuggestion]
+
+
+# Job schemas
+class JobCreate(BaseModel):
+    kind: str
+    payload: dict = {}
+    max_attempts: int = Field(3, ge=1, le=10)
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    payload: dict
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    progress_done: int
+    progress_total: Optional[int] = None
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+# Analytics export schemas
+class ExportFormat(str, Enum):
+    AUTO = "auto"
+    ARROW = "arrow"
+    NPY = "npy"
+
+
+class ExportCreate(BaseModel):
+    full: bool = False  # rewrite instead of appending
+    format: Optional[ExportFormat] = None
+
+
+class ExportStatus(BaseModel):
+    directory: str
+    available: bool
+    formats: list[str]
+    manifest: Optional[dict] = None
+
+
+# Sync schemas
+class SyncDeleted(BaseModel):
+    problems: list[int] = []
+    attempts: list[int] = []
+
+
+class SyncResponse(BaseModel):
+    token: int
+    has_more: bool
+    full: bool
+    problems: list[ProblemResponse]
+    attempts: list[AttemptResponse]
+    deleted: SyncDeleted
+
+
+class SyncAttempt(AttemptBase):
+    time_spent_minutes: Optional[int] = Field(None, ge=0)
+    client_id: str = Field(..., min_length=1, max_length=64)
+    problem_id: int
+    attempted_at: Optional[datetime] = None
+
+
+class SyncPushRequest(BaseModel):
+    attempts: list[SyncAttempt] = Field(..., max_length=500)
+
+
+class SyncRejected(BaseModel):
+    client_id: str
+    reason: str
+
+
+class SyncPushResponse(BaseModel):
+    token: int
+    applied: list[AttemptResponse]
+    duplicates: list[str]
+    rejected: list[SyncRejected]
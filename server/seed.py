@@ -3,16 +3,16 @@ Seed script to populate the database with real problem data.
 Run with: python seed.py
 """
 
-import json
 from datetime import datetime, timedelta
 
-from database import engine, Base, SessionLocal
+from database import engine, SessionLocal
+from migrations import migrate
 from models import Problem, Attempt
 
 
 def seed_database():
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    migrate(engine)
 
     db = SessionLocal()
 
@@ -489,7 +489,7 @@ def seed_database():
     # Create problems
     for data in problems_data:
         tags = data.pop("tags")
-        problem = Problem(**data, tags=json.dumps(tags))
+        problem = Problem(**data, tags=tags)
         db.add(problem)
 
     db.commit()
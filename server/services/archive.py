@@ -0,0 +1,238 @@
+"""
+Attempt archival into monthly partitions.
+
+`attempts` is the hot partition: everything the app reads day to day
+(/api/today, /api/stats, problem detail, recent history) only ever looks at
+the last ARCHIVE_AFTER_DAYS, which must cover the longest window those
+endpoints use. The archive_attempts job moves older attempts, one calendar
+month per transaction, into `attempts_YYYY_MM` tables registered in
+`attempt_partitions`:
+
+1. add the month's counts to `attempt_rollups` (per problem, per month);
+2. copy the rows into the month's table, creating it on first use;
+3. delete them from `attempts`;
+4. recreate the `attempts_all` view (hot UNION ALL every partition) when a
+   new partition was added.
+
+Problem scheduling fields (mastery_stage, last_outcome, ...) already
+summarize every attempt, so nothing else needs recomputing. Readers that
+want full history (export, replay, /api/history?include_archived=true)
+select from ATTEMPTS_ALL instead of Attempt.
+
+Partitions have no foreign key to problems; rows belonging to deleted
+problems are purged on the next archive run. Rollups and per-problem timing
+sketches are removed with their problem by ON DELETE CASCADE; the purge
+also clears any left from before SQLite foreign keys were enforced.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text, func, select, text
+from sqlalchemy.orm import Session
+
+import config
+from database import SessionLocal
+from models import Attempt, AttemptPartition, AttemptRollup, Problem, ProblemTimingSketch
+from services.jobs import JobContext, job_handler
+from services.problem_cache import invalidate_on_commit
+
+VIEW_NAME = "attempts_all"
+
+# Shortest horizon allowed: /api/stats looks back 30 days
+MIN_ARCHIVE_AFTER_DAYS = 31
+
+_archive_meta = MetaData()
+
+
+def _columns():
+    return [
+        Column("id", Integer, primary_key=True),
+        Column("problem_id", Integer, nullable=False),
+        Column("attempted_at", DateTime),
+        Column("outcome", String, nullable=False),
+        Column("time_spent_minutes", Integer),
+        Column("notes", Text),
+        Column("stage_before", Integer),
+        Column("stage_after", Integer),
+        Column("next_due_date_after", DateTime),
+        Column("client_id", String),
+    ]
+
+
+COLUMN_NAMES = [column.name for column in _columns()]
+
+# Read-only handle on the union view; same columns as `attempts`
+ATTEMPTS_ALL = Table(VIEW_NAME, _archive_meta, *_columns())
+
+
+def partition_name(month: str) -> str:
+    return "attempts_" + month.replace("-", "_")
+
+
+def partition_table(month: str) -> Table:
+    name = partition_name(month)
+    if name in _archive_meta.tables:
+        return _archive_meta.tables[name]
+    return Table(
+        name,
+        _archive_meta,
+        *_columns(),
+        Index(f"ix_{name}_problem_id", "problem_id"),
+        Index(f"ix_{name}_attempted_at", "attempted_at"),
+    )
+
+
+def rebuild_view(conn, months: list[str]) -> None:
+    """(Re)create attempts_all over the hot table and the given partitions."""
+    column_list = ", ".join(COLUMN_NAMES)
+    selects = [f"SELECT {column_list} FROM attempts"]
+    selects += [f"SELECT {column_list} FROM {partition_name(month)}" for month in sorted(months)]
+    conn.execute(text(f"DROP VIEW IF EXISTS {VIEW_NAME}"))
+    conn.execute(text(f"CREATE VIEW {VIEW_NAME} AS " + " UNION ALL ".join(selects)))
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    return (_month_start(value) + timedelta(days=32)).replace(day=1)
+
+
+def months_to_archive(db: Session, cutoff: datetime) -> list[datetime]:
+    """Start of each month that has hot attempts older than `cutoff`, oldest first."""
+    oldest = db.query(func.min(Attempt.attempted_at)).filter(Attempt.attempted_at < cutoff).scalar()
+    months = []
+    month = _month_start(oldest) if oldest else None
+    while month is not None and month < cutoff:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+_OUTCOME_COLUMNS = {
+    "PASS": "pass_count",
+    "SHAKY": "shaky_count",
+    "FAIL": "fail_count",
+    "SKIP": "skip_count",
+    "POSTPONE": "postpone_count",
+}
+
+
+def _add_to_rollups(db: Session, month: str, start: datetime, end: datetime) -> int:
+    rows = (
+        db.query(
+            Attempt.problem_id,
+            Attempt.outcome,
+            func.count(Attempt.id),
+            func.count(Attempt.time_spent_minutes),
+            func.coalesce(func.sum(Attempt.time_spent_minutes), 0),
+        )
+        .filter(Attempt.attempted_at >= start, Attempt.attempted_at < end)
+        .group_by(Attempt.problem_id, Attempt.outcome)
+        .all()
+    )
+    problem_ids = {problem_id for problem_id, *_ in rows}
+    # Cached problem details list the attempts about to move
+    invalidate_on_commit(db, problem_ids)
+    rollups = {
+        rollup.problem_id: rollup
+        for rollup in db.query(AttemptRollup).filter(
+            AttemptRollup.month == month, AttemptRollup.problem_id.in_(problem_ids)
+        )
+    }
+    for problem_id, outcome, count, timed, minutes in rows:
+        rollup = rollups.get(problem_id)
+        if rollup is None:
+            rollup = rollups[problem_id] = AttemptRollup(
+                problem_id=problem_id, month=month, attempts=0, pass_count=0, shaky_count=0,
+                fail_count=0, skip_count=0, postpone_count=0, timed_attempts=0, total_minutes=0,
+            )
+            db.add(rollup)
+        rollup.attempts += count
+        rollup.timed_attempts += timed
+        rollup.total_minutes += minutes
+        column = _OUTCOME_COLUMNS.get(outcome)
+        if column:
+            setattr(rollup, column, getattr(rollup, column) + count)
+    db.flush()
+    return len(rows)
+
+
+def archive_month(db: Session, start: datetime, cutoff: datetime) -> int:
+    """
+    Move hot attempts in [start, min(next month, cutoff)) to the month's
+    partition. Returns the number of rows moved. Caller commits.
+    """
+    end = min(_next_month(start), cutoff)
+    month = start.strftime("%Y-%m")
+
+    # Rollups first: this DML also opens the transaction, so the DDL below
+    # commits or rolls back together with the move
+    if not _add_to_rollups(db, month, start, end):
+        return 0
+
+    conn = db.connection()
+    table = partition_table(month)
+    partition = db.get(AttemptPartition, table.name)
+    if partition is None:
+        table.create(bind=conn, checkfirst=True)
+
+    in_range = (Attempt.attempted_at >= start) & (Attempt.attempted_at < end)
+    source = select(*(Attempt.__table__.c[name] for name in COLUMN_NAMES)).where(in_range)
+    conn.execute(table.insert().from_select(COLUMN_NAMES, source))
+    moved = conn.execute(Attempt.__table__.delete().where(in_range)).rowcount
+
+    if partition is None:
+        partition = AttemptPartition(table_name=table.name, month=month, row_count=0)
+        db.add(partition)
+        db.flush()
+        months = [m for (m,) in db.query(AttemptPartition.month)]
+        rebuild_view(conn, months)
+    partition.row_count += moved
+    return moved
+
+
+def purge_orphans(db: Session) -> int:
+    """Delete archived attempts and rollups whose problem no longer exists. Caller commits."""
+    conn = db.connection()
+    problem_ids = select(Problem.id)
+    purged = 0
+    for (month,) in db.query(AttemptPartition.month).all():
+        table = partition_table(month)
+        purged += conn.execute(table.delete().where(table.c.problem_id.not_in(problem_ids))).rowcount
+    db.query(AttemptRollup).filter(AttemptRollup.problem_id.not_in(problem_ids)).delete(synchronize_session=False)
+    db.query(ProblemTimingSketch).filter(ProblemTimingSketch.problem_id.not_in(problem_ids)).delete(
+        synchronize_session=False
+    )
+    return purged
+
+
+@job_handler("archive_attempts")
+def archive_attempts(ctx: JobContext) -> dict:
+    """
+    Move attempts older than `older_than_days` (default ARCHIVE_AFTER_DAYS)
+    into monthly partitions, one month per transaction.
+    """
+    days = int(ctx.payload.get("older_than_days", config.ARCHIVE_AFTER_DAYS))
+    if days < MIN_ARCHIVE_AFTER_DAYS:
+        raise ValueError(f"older_than_days must be at least {MIN_ARCHIVE_AFTER_DAYS}")
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    with SessionLocal() as db:
+        months = months_to_archive(db, cutoff)
+
+    moved = 0
+
+    def apply(db, chunk):
+        nonlocal moved
+        for start in chunk:
+            moved += archive_month(db, start, cutoff)
+
+    ctx.run_in_chunks(months, apply, chunk_size=1)
+
+    with SessionLocal() as db:
+        purged = purge_orphans(db)
+        db.commit()
+
+    return {"months": len(months), "attempts_archived": moved, "orphans_purged": purged}
@@ -0,0 +1,383 @@
+"""
+Attempt write paths.
+
+apply_attempt() is the live write path: the attempt is inserted by an
+INSERT ... SELECT from the problem row (stage_before read and written in
+one statement) and the ladder transition is applied by a single
+UPDATE ... RETURNING whose SET is computed from the row's own columns
+(scheduling.schedule_values). Both return the written rows, so nothing is
+read before or refreshed after. The INSERT takes the write lock on SQLite
+and the row lock on PostgreSQL (SELECT ... FOR UPDATE), so concurrent
+attempts on one problem apply one after the other instead of both
+starting from the same stage. POSTPONE moves the due date relative to
+the stored one, so it reads the row and applies a compare-and-swap on
+problems.version, retrying if another write got in between. A caller
+that passes expected_version gets VersionConflict instead of applying an
+attempt to a problem that changed since the client last read it.
+
+record_attempt() is the ORM form, for replayed offline attempts that carry
+their own timestamp and client id. The ORM checks problems.version on its
+flush too (StaleDataError on a concurrent change). Attempts with a client
+id are inserted with ON CONFLICT DO NOTHING, so a replay is skipped rather
+than failing the transaction on the unique index.
+
+AttemptWriter is the optional group-commit mode (LCTRACKER_GROUP_COMMIT):
+request threads enqueue attempts and block on a future while one writer
+thread applies everything that arrived within a few milliseconds (or up to
+GROUP_COMMIT_MAX_BATCH items) in a single transaction.
+
+Durability: a caller's future resolves only after the transaction holding
+its attempt has committed, so an acknowledged attempt is exactly as durable
+as on the direct path. Batches are all-or-nothing: if the commit fails,
+every caller in that batch gets the error and none of its attempts are
+written. Attempts still queued when the process dies were never
+acknowledged. On shutdown the writer drains its queue before exiting.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import DateTime, Integer, Text, bindparam, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import config
+from database import SessionLocal
+from models import Attempt, Problem
+from services import due_index
+from services.changes import lock_change_log, record_entity_changes
+from services.problem_cache import attempt_to_response, invalidate_on_commit, problem_to_response
+from services.scheduling import schedule_params, schedule_values, update_schedule
+from services.timing import record_time
+
+logger = logging.getLogger("lctracker.attempts")
+
+
+class ProblemNotFound(LookupError):
+    pass
+
+
+class VersionConflict(Exception):
+    """The problem's version no longer matches the one the caller expected."""
+
+    def __init__(self, problem_id: int, version: Optional[int]):
+        super().__init__(f"Problem {problem_id} is at version {version}")
+        self.problem_id = problem_id
+        self.version = version
+
+
+# Compare-and-swap retries for POSTPONE; a retry only happens when another
+# write to the same problem committed between its read and its update
+_CAS_RETRIES = 5
+
+
+def record_attempt(
+    db: Session,
+    problem: Problem,
+    outcome: str,
+    time_spent_minutes: Optional[int] = None,
+    notes: Optional[str] = None,
+    attempted_at: Optional[datetime] = None,
+    client_id: Optional[str] = None,
+) -> Optional[Attempt]:
+    """
+    Add an attempt for `problem` and apply its schedule transition. Caller commits.
+
+    attempted_at backdates an attempt recorded offline; the schedule is then
+    computed from that time rather than now. An attempt older than the
+    problem's last one is recorded as history only: replaying it would move
+    the schedule back in time. Returns None, changing nothing, when an
+    attempt with this client_id already exists (e.g. a concurrent push of
+    the same offline attempt committed first).
+    """
+    attempted_at = attempted_at or datetime.utcnow()
+    if client_id is not None:
+        # Write out earlier attempts' changes, so undoing this one on a
+        # duplicate (expire below) can't drop them
+        db.flush()
+
+    # Capture stage before update
+    stage_before = problem.mastery_stage
+    reschedule = problem.last_attempted_at is None or attempted_at >= problem.last_attempted_at
+
+    # Update scheduling
+    if reschedule:
+        update_schedule(problem, outcome, attempted_at)
+
+    values = {
+        "problem_id": problem.id,
+        "attempted_at": attempted_at,
+        "outcome": outcome,
+        "time_spent_minutes": time_spent_minutes,
+        "notes": notes,
+        "stage_before": stage_before,
+        # Capture stage after update
+        "stage_after": problem.mastery_stage,
+        "next_due_date_after": problem.next_due_date if reschedule else None,
+        "client_id": client_id,
+    }
+    if client_id is None:
+        db_attempt = Attempt(**values)
+        db.add(db_attempt)
+    else:
+        # The duplicate check and the insert are one statement, so two pushes
+        # of the same attempt can't both get past it
+        dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        db_attempt = db.execute(
+            select(Attempt).from_statement(
+                dialect_insert(Attempt).values(**values)
+                .on_conflict_do_nothing(index_elements=[Attempt.client_id])
+                .returning(Attempt)
+            )
+        ).scalar_one_or_none()
+        if db_attempt is None:
+            # Drop the unflushed schedule change; the problem reloads on next access
+            db.expire(problem)
+            return None
+        record_entity_changes(db, [("attempt", db_attempt.id)])
+        # The Core insert skips the flush hook that evicts the cached problem, and
+        # a history-only attempt leaves the problem row unchanged
+        invalidate_on_commit(db, [problem.id])
+
+    record_time(db, problem, outcome, time_spent_minutes, attempted_at)
+    return db_attempt
+
+
+@lru_cache(maxsize=None)
+def _ladder_statements(outcome: str, versioned: bool):
+    """
+    The attempt INSERT ... SELECT and the problem UPDATE for one outcome.
+    Built once; everything per call is a bound parameter.
+    """
+    values = schedule_values(outcome)
+    target = Problem.id == bindparam("target_id")
+    source = select(
+        Problem.id,
+        bindparam("now", type_=DateTime),
+        literal(outcome),
+        bindparam("attempt_minutes", type_=Integer),
+        bindparam("attempt_notes", type_=Text),
+        Problem.mastery_stage,
+        values.get("mastery_stage", Problem.mastery_stage),
+        values["next_due_date"],
+    ).where(target)
+    if versioned:
+        source = source.where(Problem.version == bindparam("expected_version"))
+    # from_statement keeps ORM loading of the returned row with Core-style parameters
+    insert_attempt = select(Attempt).from_statement(
+        insert(Attempt)
+        .from_select(
+            [Attempt.problem_id, Attempt.attempted_at, Attempt.outcome, Attempt.time_spent_minutes,
+             Attempt.notes, Attempt.stage_before, Attempt.stage_after, Attempt.next_due_date_after],
+            source.with_for_update(),
+        )
+        .returning(Attempt)
+    )
+    update_problem = (
+        update(Problem)
+        .where(target)
+        .values(**values, version=Problem.version + 1, updated_at=bindparam("now", type_=DateTime))
+        .returning(Problem)
+    )
+    return insert_attempt, update_problem
+
+
+def _missing_or_conflict(db: Session, problem_id: int) -> Exception:
+    version = db.query(Problem.version).filter(Problem.id == problem_id).scalar()
+    if version is None:
+        return ProblemNotFound(problem_id)
+    return VersionConflict(problem_id, version)
+
+
+def _postpone(db: Session, problem_id: int, now: datetime, expected_version: Optional[int]) -> Problem:
+    for _ in range(_CAS_RETRIES):
+        row = db.query(Problem.version, Problem.next_due_date).filter(Problem.id == problem_id).first()
+        if row is None:
+            raise ProblemNotFound(problem_id)
+        if expected_version is not None and row.version != expected_version:
+            raise VersionConflict(problem_id, row.version)
+        problem = db.execute(
+            update(Problem)
+            .where(Problem.id == problem_id, Problem.version == row.version)
+            .values(
+                next_due_date=(row.next_due_date or now) + timedelta(days=1),
+                last_attempted_at=now,
+                last_outcome="POSTPONE",
+                archived_at=None,
+                version=Problem.version + 1,
+                updated_at=now,
+            )
+            .returning(Problem),
+            execution_options={"synchronize_session": False, "populate_existing": True},
+        ).scalar_one_or_none()
+        if problem is not None:
+            return problem
+    raise VersionConflict(problem_id, None)
+
+
+def apply_attempt(
+    db: Session,
+    problem_id: int,
+    outcome: str,
+    time_spent_minutes: Optional[int] = None,
+    notes: Optional[str] = None,
+    expected_version: Optional[int] = None,
+) -> tuple[Attempt, Problem]:
+    """
+    Log an attempt and apply its schedule transition without loading the
+    problem first. Returns the inserted attempt and the updated problem.
+    Raises ProblemNotFound, or VersionConflict when expected_version is
+    given and the problem has moved on. Caller commits.
+    """
+    now = datetime.utcnow()
+    # Before the statements below take the problem's row lock
+    lock_change_log(db)
+
+    if schedule_values(outcome) is None:
+        problem = _postpone(db, problem_id, now, expected_version)
+        attempt = db.execute(
+            insert(Attempt)
+            .values(
+                problem_id=problem_id, attempted_at=now, outcome=outcome, time_spent_minutes=time_spent_minutes,
+                notes=notes, stage_before=problem.mastery_stage, stage_after=problem.mastery_stage,
+                next_due_date_after=problem.next_due_date,
+            )
+            .returning(Attempt)
+        ).scalar_one()
+    else:
+        insert_attempt, update_problem = _ladder_statements(outcome, expected_version is not None)
+        params = {
+            **schedule_params(now),
+            "target_id": problem_id,
+            "attempt_minutes": time_spent_minutes,
+            "attempt_notes": notes,
+            "expected_version": expected_version,
+        }
+        attempt = db.execute(insert_attempt, params).scalar_one_or_none()
+        if attempt is None:
+            raise _missing_or_conflict(db, problem_id)
+        # The INSERT holds the lock, so this applies to the state it just read
+        problem = db.execute(
+            update_problem, params,
+            execution_options={"synchronize_session": False, "populate_existing": True},
+        ).scalar_one()
+
+    # Core statements bypass the unit-of-work hooks
+    record_entity_changes(db, [("problem", problem_id), ("attempt", attempt.id)])
+    invalidate_on_commit(db, [problem_id])
+    due_index.update_on_commit(db, [problem])
+    record_time(db, problem, outcome, time_spent_minutes, now)
+    return attempt, problem
+
+
+class _PendingAttempt:
+    __slots__ = ("problem_id", "outcome", "time_spent_minutes", "notes", "expected_version", "future")
+
+    def __init__(self, problem_id, outcome, time_spent_minutes, notes, expected_version):
+        self.problem_id = problem_id
+        self.outcome = outcome
+        self.time_spent_minutes = time_spent_minutes
+        self.notes = notes
+        self.expected_version = expected_version
+        self.future: Future = Future()
+
+
+class AttemptWriter:
+    """Single writer thread that coalesces attempt writes into batched transactions."""
+
+    def __init__(self, max_batch: int, max_delay_ms: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="attempt-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting work, drain the queue, and wait for the thread to exit."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        # Anything that slipped in after the final drain is rejected, not dropped
+        while not self._queue.empty():
+            self._queue.get_nowait().future.set_exception(RuntimeError("Attempt writer stopped"))
+
+    def submit(self, problem_id: int, outcome: str, time_spent_minutes: Optional[int] = None,
+               notes: Optional[str] = None, expected_version: Optional[int] = None) -> Future:
+        """
+        Queue an attempt. The future resolves to (attempt_response, problem_response)
+        after commit, or raises ProblemNotFound / VersionConflict / the commit error.
+        """
+        if self._stopping.is_set():
+            raise RuntimeError("Attempt writer is shutting down")
+        pending = _PendingAttempt(problem_id, outcome, time_spent_minutes, notes, expected_version)
+        self._queue.put(pending)
+        return pending.future
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._apply(batch)
+
+    def _apply(self, batch: list[_PendingAttempt]) -> None:
+        resolved = []
+        try:
+            with SessionLocal() as db:
+                for pending in batch:
+                    try:
+                        db_attempt, problem = apply_attempt(
+                            db, pending.problem_id, pending.outcome, pending.time_spent_minutes, pending.notes,
+                            pending.expected_version,
+                        )
+                    except (ProblemNotFound, VersionConflict) as exc:
+                        # Raised before this item wrote anything; the rest of the batch goes ahead
+                        resolved.append((pending, exc))
+                        continue
+                    # Serialize this item's state before later items in the batch change the problem
+                    resolved.append((pending, (attempt_to_response(db_attempt), problem_to_response(problem))))
+                db.commit()
+        except Exception as exc:
+            logger.exception("Group commit of %d attempts failed", len(batch))
+            for pending in batch:
+                pending.future.set_exception(exc)
+            return
+
+        for pending, value in resolved:
+            if isinstance(value, Exception):
+                pending.future.set_exception(value)
+            else:
+                pending.future.set_result(value)
+
+
+attempt_writer = AttemptWriter(config.GROUP_COMMIT_MAX_BATCH, config.GROUP_COMMIT_MAX_DELAY_MS)
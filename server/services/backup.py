@@ -0,0 +1,313 @@
+"""
+Online SQLite snapshots and restore.
+
+snapshot() copies the live database with SQLite's online backup API, a few
+pages per step with a short sleep in between. The read lock is only held
+for one step at a time, so attempt writes commit between steps instead of
+waiting for the whole copy. (VACUUM INTO would hold a read transaction, and
+so block writers, for the full copy.) A commit from another connection
+makes SQLite restart the copy from the first page; each restart
+quadruples the step size, and after BACKUP_MAX_RESTARTS the copy is done
+in a single step, which blocks writers for one full-speed pass rather than
+retrying forever under heavy write load. In WAL mode readers never block
+writers, so the copy is always a single step.
+
+Every snapshot is written to a .partial file, checked with
+PRAGMA integrity_check, and only then renamed into BACKUP_DIR as
+leetreview-YYYYmmdd-HHMMSS.db; the newest BACKUP_KEEP are kept.
+
+With BACKUP_INTERVAL_MINUTES set, run_scheduled_backups() (started from
+the app lifespan) takes a snapshot whenever the newest one is older than
+the interval, so restarts and extra workers don't snapshot more often.
+The snapshot_database job takes one on demand. Snapshots into one
+directory are serialized by an exclusive lock on BACKUP_DIR/.snapshot.lock,
+so workers whose schedulers fire together, the job and the CLI never
+write the same .partial file or rotate at the same time; a scheduler that
+waited on the lock finds the new snapshot and skips its own.
+
+Restore with the app stopped:
+
+    python -m services.backup list
+    python -m services.backup snapshot
+    python -m services.backup verify backups/leetreview-20260101-030000.db
+    python -m services.backup restore backups/leetreview-20260101-030000.db
+
+restore verifies the snapshot, snapshots the current database first (as
+leetreview-...-pre-restore.db), then copies the snapshot over it with the
+backup API. PostgreSQL deployments should use pg_dump / pg_basebackup.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from sqlalchemy.engine import make_url
+
+import config
+from services.jobs import JobContext, job_handler
+
+logger = logging.getLogger("lctracker.backup")
+
+SNAPSHOT_PREFIX = "leetreview-"
+SNAPSHOT_SUFFIX = ".db"
+LOCK_NAME = ".snapshot.lock"
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+def database_path() -> str:
+    url = make_url(config.DATABASE_URL)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise BackupError("Snapshots need a file-backed SQLite database; use pg_dump for PostgreSQL")
+    return url.database
+
+
+def list_snapshots(directory: Optional[str] = None) -> list[str]:
+    """Snapshot paths in `directory`, oldest first."""
+    directory = directory or config.BACKUP_DIR
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        name for name in os.listdir(directory) if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def verify(path: str) -> str:
+    """Run PRAGMA integrity_check on a snapshot; returns "ok" or the first problem found."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return "ok" if rows == [("ok",)] else "; ".join(row[0] for row in rows[:5])
+
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, pages: int, sleep_ms: float,
+          max_restarts: int) -> dict:
+    stats = {"steps": 0, "restarts": 0, "single_step": False}
+    if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        # WAL readers don't block writers, so one step is both fastest and non-blocking
+        pages = -1
+    while True:
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal last_remaining
+            stats["steps"] += 1
+            stats["pages"] = total
+            if last_remaining is not None and remaining > last_remaining:
+                # Another connection committed and SQLite started over from page 1
+                raise _Restarted
+            last_remaining = remaining
+
+        if stats["restarts"] >= max_restarts:
+            pages = -1
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep_ms / 1000)
+        except _Restarted:
+            stats["restarts"] += 1
+            # Fewer, larger steps leave fewer gaps for commits to land in
+            pages *= 4
+            continue
+        stats["single_step"] = pages == -1
+        return stats
+
+
+@contextmanager
+def snapshot_lock(directory: str):
+    """Hold the exclusive snapshot lock for `directory`, across processes and threads."""
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            # Released when the descriptor is closed, also if the process dies
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+            return
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                # LK_LOCK gives up after about 10 seconds; a snapshot can take longer
+                continue
+        try:
+            yield
+        finally:
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def snapshot(directory: Optional[str] = None, pages: Optional[int] = None, sleep_ms: Optional[float] = None,
+             keep: Optional[int] = None, suffix: str = "") -> dict:
+    """Copy the live database into a new verified snapshot and rotate old ones."""
+    directory = directory or config.BACKUP_DIR
+    with snapshot_lock(directory):
+        return _snapshot(directory, pages, sleep_ms, keep, suffix)
+
+
+def _snapshot(directory: str, pages: Optional[int], sleep_ms: Optional[float], keep: Optional[int],
+              suffix: str) -> dict:
+    pages = pages or config.BACKUP_PAGES_PER_STEP
+    sleep_ms = config.BACKUP_STEP_SLEEP_MS if sleep_ms is None else sleep_ms
+    keep = config.BACKUP_KEEP if keep is None else keep
+
+    name = f"{SNAPSHOT_PREFIX}{datetime.utcnow():%Y%m%d-%H%M%S}{suffix}{SNAPSHOT_SUFFIX}"
+    path = os.path.join(directory, name)
+    partial = path + ".partial"
+
+    start = time.perf_counter()
+    source = sqlite3.connect(database_path(), timeout=config.SQLITE_BUSY_TIMEOUT)
+    target = sqlite3.connect(partial)
+    try:
+        stats = _copy(source, target, pages, sleep_ms, config.BACKUP_MAX_RESTARTS)
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    target.close()
+    copied = time.perf_counter() - start
+
+    integrity = verify(partial)
+    if integrity != "ok":
+        os.remove(partial)
+        raise BackupError(f"Snapshot failed integrity check: {integrity}")
+    os.replace(partial, path)
+
+    removed = []
+    if keep > 0:
+        # Pre-restore snapshots are rotated like any other
+        for old in list_snapshots(directory)[:-keep]:
+            os.remove(old)
+            removed.append(os.path.basename(old))
+
+    result = {
+        "path": path,
+        "bytes": os.path.getsize(path),
+        **stats,
+        "copy_seconds": round(copied, 3),
+        "total_seconds": round(time.perf_counter() - start, 3),
+        "removed": removed,
+    }
+    logger.info("snapshot %s: %d bytes in %.2fs (%d steps, %d restarts)", name, result["bytes"],
+                result["total_seconds"], stats["steps"], stats["restarts"])
+    return result
+
+
+def restore(path: str) -> dict:
+    """Replace the live database with a snapshot. Stop the app first."""
+    integrity = verify(path)
+    if integrity != "ok":
+        raise BackupError(f"{path} failed integrity check: {integrity}")
+    live = database_path()
+    safety = snapshot(suffix="-pre-restore", keep=0) if os.path.exists(live) else None
+
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    target = sqlite3.connect(live, timeout=config.SQLITE_BUSY_TIMEOUT)
+    try:
+        # Copies page by page under the live database's own locking, so no
+        # stale journal or half-copied file is ever left behind
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return {"restored": path, "database": live, "previous": safety["path"] if safety else None}
+
+
+@job_handler("snapshot_database")
+def snapshot_database(ctx: JobContext) -> dict:
+    """Take an online snapshot of the SQLite database into BACKUP_DIR."""
+    return snapshot()
+
+
+def _seconds_until_due(directory: str, interval: float) -> float:
+    snapshots = list_snapshots(directory)
+    if not snapshots:
+        return 0.0
+    return max(0.0, os.path.getmtime(snapshots[-1]) + interval - time.time())
+
+
+def snapshot_if_due(directory: str, interval: float) -> Optional[dict]:
+    """Snapshot unless another process took one within `interval` seconds while we waited for the lock."""
+    with snapshot_lock(directory):
+        if _seconds_until_due(directory, interval) > 0:
+            return None
+        return _snapshot(directory, None, None, None, "")
+
+
+async def run_scheduled_backups(stop: Optional[asyncio.Event] = None) -> None:
+    """Snapshot every BACKUP_INTERVAL_MINUTES for the app lifetime."""
+    stop = stop or asyncio.Event()
+    interval = config.BACKUP_INTERVAL_MINUTES * 60
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=_seconds_until_due(config.BACKUP_DIR, interval))
+        except asyncio.TimeoutError:
+            try:
+                await asyncio.to_thread(snapshot_if_due, config.BACKUP_DIR, interval)
+            except Exception:
+                logger.exception("scheduled snapshot failed")
+                # Don't retry in a tight loop when the disk is full or the path is wrong
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=min(interval, 300))
+                except asyncio.TimeoutError:
+                    pass
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m services.backup", description="SQLite snapshots and restore")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list snapshots in LCTRACKER_BACKUP_DIR")
+    commands.add_parser("snapshot", help="take a snapshot now")
+    verify_parser = commands.add_parser("verify", help="integrity-check a snapshot")
+    verify_parser.add_argument("path")
+    restore_parser = commands.add_parser("restore", help="replace the database with a snapshot (app stopped)")
+    restore_parser.add_argument("path")
+    restore_parser.add_argument("--yes", action="store_true", help="don't ask for confirmation")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for path in list_snapshots():
+            print(f"{path}  {os.path.getsize(path):>12} bytes  {datetime.fromtimestamp(os.path.getmtime(path)):%Y-%m-%d %H:%M:%S}")
+    elif args.command == "snapshot":
+        result = snapshot()
+        print(f"Wrote {result['path']} ({result['bytes']} bytes, {result['total_seconds']}s)")
+    elif args.command == "verify":
+        integrity = verify(args.path)
+        print(integrity)
+        return 0 if integrity == "ok" else 1
+    elif args.command == "restore":
+        if not args.yes:
+            answer = input(f"Replace {database_path()} with {args.path}? Stop the app first. [y/N] ")
+            if answer.strip().lower() not in ("y", "yes"):
+                return 1
+        result = restore(args.path)
+        print(f"Restored {result['restored']} into {result['database']}; previous database saved as {result['previous']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Change log for delta sync.
+
+Every flush that inserts, updates or deletes a Problem or Attempt appends
+one row per entity to `changes` inside the same transaction, so the log
+commits or rolls back with the data. Set-based Core statements bypass the
+ORM and must call record_changes() themselves.
+
+Deleting a problem implies deleting its attempts; clients should drop a
+deleted problem's attempts without waiting for individual tombstones.
+
+Tokens must become visible in token order: readers take max(token) as
+their cursor and later ask for token > cursor, so a token that commits
+after a higher one would never be delivered. A token is drawn when its
+row is inserted, not when the transaction commits, so every transaction
+that writes the log holds one lock from its first change row to commit.
+On SQLite that is the database write lock, which the first INSERT already
+takes. On PostgreSQL it is a transaction-scoped advisory lock: writers to
+the log commit one at a time, other statements still run concurrently.
+To keep that lock from deadlocking with row locks, take it before the
+transaction's first write: ORM flushes do so automatically, set-based
+Core writes call lock_change_log() first.
+"""
+
+from typing import Iterable
+
+from sqlalchemy import event, func, insert, text
+from sqlalchemy.orm import Session
+
+from models import Attempt, Change, Problem
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Arbitrary 64-bit key for pg_advisory_xact_lock; only the change log uses it
+_TOKEN_LOCK_KEY = 0x6C63_7472_6B63_6867
+# Session.info flag: this transaction already holds the token lock
+_TOKEN_LOCK_HELD = "changes.token_lock"
+
+
+def lock_change_log(session: Session) -> None:
+    """
+    Serialize change-log writes with other transactions until this one
+    ends. Call before the transaction's first write to a problem or attempt.
+    """
+    if session.info.get(_TOKEN_LOCK_HELD):
+        return
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _TOKEN_LOCK_KEY})
+    session.info[_TOKEN_LOCK_HELD] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _token_lock_released(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_TOKEN_LOCK_HELD, None)
+
+
+def record_changes(db: Session, entity: str, ids: Iterable[int], op: str = UPSERT) -> None:
+    """Append change rows for writes made outside the ORM unit of work."""
+    rows = [{"entity": entity, "entity_id": entity_id, "op": op} for entity_id in ids]
+    if rows:
+        lock_change_log(db)
+        db.execute(insert(Change), rows)
+
+
+def record_entity_changes(db: Session, changes: Iterable[tuple[str, int]], op: str = UPSERT) -> None:
+    """record_changes() for (entity, id) pairs of mixed entities, in one statement."""
+    rows = [{"entity": entity, "entity_id": entity_id, "op": op} for entity, entity_id in changes]
+    if rows:
+        lock_change_log(db)
+        db.execute(insert(Change), rows)
+
+
+def current_token(db: Session) -> int:
+    """Highest committed token; every lower token is committed too (see the module docstring)."""
+    return db.query(func.max(Change.token)).scalar() or 0
+
+
+def changes_since(db: Session, since: int, until: int, limit: int) -> tuple[dict, int, bool]:
+    """
+    Collapse changes in (since, until] to the latest op per entity.
+
+    Returns ({"problem": {id: op}, "attempt": {id: op}}, last_token, has_more).
+    """
+    rows = (
+        db.query(Change.token, Change.entity, Change.entity_id, Change.op)
+        .filter(Change.token > since, Change.token <= until)
+        .order_by(Change.token.asc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {"problem": {}, "attempt": {}}
+    for _, entity, entity_id, op in rows:
+        latest[entity][entity_id] = op
+    last_token = rows[-1].token if rows else until
+    return latest, (last_token if has_more else until), has_more
+
+
+@event.listens_for(Session, "before_flush")
+def _lock_before_flush(session, flush_context, instances):
+    if any(isinstance(obj, (Problem, Attempt)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        lock_change_log(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _log_flushed_changes(session, flush_context):
+    rows = {}
+    for obj, op in (
+        *((obj, UPSERT) for obj in session.new),
+        *((obj, UPSERT) for obj in session.dirty if session.is_modified(obj, include_collections=False)),
+        *((obj, DELETE) for obj in session.deleted),
+    ):
+        if isinstance(obj, Problem):
+            rows[("problem", obj.id)] = op
+        elif isinstance(obj, Attempt):
+            rows[("attempt", obj.id)] = op
+    if rows:
+        lock_change_log(session)
+        session.connection().execute(
+            insert(Change.__table__),
+            [{"entity": entity, "entity_id": entity_id, "op": op} for (entity, entity_id), op in rows.items()],
+        )
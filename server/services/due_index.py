@@ -0,0 +1,312 @@
+"""
+In-process due-date index.
+
+Holds (next_due_date, id) for every problem in a sorted list, plus each
+problem's mastery stage and updated_at. With LCTRACKER_DUE_INDEX set,
+due_counts() and the due list of /api/today are answered from it by
+bisection in O(log n). Those are the total/due/overdue counters that
+/api/stats and every change event report, and that list is the due
+queue. The same applies to list_problems with status=overdue or due_soon
+when no other filter is given. None of these queries touches the
+database. (Moving an entry is O(log n) to find plus a list memmove, which
+is negligible at library sizes.)
+
+It is built at startup and kept current write-through. Session hooks
+collect every Problem the ORM inserts, updates or deletes, which covers
+update_schedule, create and delete, and apply them after commit. Writes
+that bypass the ORM call update_on_commit / remove_on_commit. A per-id
+generation counter stops a reload that read a row before a commit from
+overwriting the newer value afterwards.
+
+The index is per process, so with more than one worker, writes made by
+the others are invisible to it. Set LCTRACKER_DUE_INDEX_VERIFY to have
+every read first check the change-log token (one indexed MAX) and reload
+only the problems changed since, as the related index does. Reads made
+under begin_read_snapshot (the dashboard) always go to the database, so
+they stay consistent with the other queries in that snapshot.
+
+check(), run by the check_due_index job, compares the index with the
+table row by row and reloads any rows that differ.
+"""
+
+import bisect
+import threading
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import config
+from database import READ_SNAPSHOT_KEY, SessionLocal
+from models import Change, Problem
+from services.changes import current_token
+from services.jobs import JobContext, job_handler
+
+_COLUMNS = (Problem.id, Problem.next_due_date, Problem.mastery_stage, Problem.updated_at)
+# Sorts after every id, so bisect_right((when, _MAX_ID)) includes due dates equal to `when`
+_MAX_ID = float("inf")
+
+
+class DueIndex:
+    """Thread-safe sorted index of problems by next_due_date."""
+
+    def __init__(self):
+        self._keys: list[tuple[datetime, int]] = []  # (next_due_date, id), sorted
+        self._entries: dict[int, tuple] = {}  # id -> (next_due_date, stage, updated_at)
+        self._generations: dict[int, int] = {}
+        self._token: Optional[int] = None
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Maintenance
+
+    def _set(self, problem_id: int, due, stage, version) -> None:
+        self._discard(problem_id)
+        self._entries[problem_id] = (due, stage, version)
+        if due is not None:
+            bisect.insort(self._keys, (due, problem_id))
+
+    def _discard(self, problem_id: int) -> None:
+        entry = self._entries.pop(problem_id, None)
+        if entry is not None and entry[0] is not None:
+            position = bisect.bisect_left(self._keys, (entry[0], problem_id))
+            del self._keys[position]
+
+    def _apply_rows(self, rows, generations: dict, expected: Iterable[int] = ()) -> None:
+        """Apply rows read from the table, skipping ids written since `generations` was taken."""
+        seen = set()
+        for problem_id, due, stage, version in rows:
+            seen.add(problem_id)
+            if self._generations.get(problem_id, 0) == generations.get(problem_id, 0):
+                self._set(problem_id, due, stage, version)
+        # Expected but not read back: deleted
+        for problem_id in set(expected) - seen:
+            if self._generations.get(problem_id, 0) == generations.get(problem_id, 0):
+                self._discard(problem_id)
+
+    def load(self, db: Session) -> int:
+        """Build the index from the table. Returns the number of problems indexed."""
+        token = current_token(db)
+        with self._lock:
+            generations = dict(self._generations)
+        rows = db.query(*_COLUMNS).all()
+        with self._lock:
+            # Keep entries written through while the table was read
+            written = {
+                problem_id: entry for problem_id, entry in self._entries.items()
+                if self._generations.get(problem_id, 0) != generations.get(problem_id, 0)
+            }
+            removed = {
+                problem_id for problem_id, generation in self._generations.items()
+                if generation != generations.get(problem_id, 0) and problem_id not in written
+            }
+            self._keys = sorted((due, problem_id) for problem_id, due, _, _ in rows if due is not None)
+            self._entries = {problem_id: (due, stage, version) for problem_id, due, stage, version in rows}
+            for problem_id in removed:
+                self._discard(problem_id)
+            for problem_id, entry in written.items():
+                self._set(problem_id, *entry)
+            self._token = token
+            self.loaded = True
+            return len(self._entries)
+
+    def apply(self, written: dict) -> None:
+        """Apply committed writes: {id: (next_due_date, stage, updated_at), or None if deleted}."""
+        with self._lock:
+            for problem_id, entry in written.items():
+                self._generations[problem_id] = self._generations.get(problem_id, 0) + 1
+                if entry is None:
+                    self._discard(problem_id)
+                else:
+                    self._set(problem_id, *entry)
+
+    def sync(self, db: Session) -> None:
+        """Reload problems changed (by any worker) since the last change-log token applied."""
+        token = current_token(db)
+        with self._lock:
+            if self._token == token:
+                return
+            since = self._token
+            generations = dict(self._generations)
+        changed = [
+            problem_id
+            for (problem_id,) in db.query(Change.entity_id).filter(
+                Change.entity == "problem", Change.token > since, Change.token <= token
+            ).distinct()
+        ]
+        rows = db.query(*_COLUMNS).filter(Problem.id.in_(changed)).all() if changed else []
+        with self._lock:
+            self._apply_rows(rows, generations, changed)
+            self._token = max(self._token or 0, token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = []
+            self._entries = {}
+            self._token = None
+            self.loaded = False
+
+    # Queries
+
+    def count_due(self, until: datetime, inclusive: bool = True) -> int:
+        """Problems with next_due_date <= until (< until when not inclusive)."""
+        with self._lock:
+            if inclusive:
+                return bisect.bisect_right(self._keys, (until, _MAX_ID))
+            return bisect.bisect_left(self._keys, (until,))
+
+    def counts(self, start_of_today: datetime, end_of_today: datetime) -> dict:
+        """The due_counts() counters."""
+        with self._lock:
+            return {
+                "total_problems": len(self._entries),
+                "due_today": bisect.bisect_right(self._keys, (end_of_today, _MAX_ID)),
+                "overdue": bisect.bisect_left(self._keys, (start_of_today,)),
+            }
+
+    def rows_between(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     include_end: bool = True) -> list[tuple]:
+        """(id, updated_at) for start <= next_due_date <= end (< end unless include_end), soonest first."""
+        with self._lock:
+            low = bisect.bisect_left(self._keys, (start,)) if start is not None else 0
+            if end is None:
+                high = len(self._keys)
+            elif include_end:
+                high = bisect.bisect_right(self._keys, (end, _MAX_ID))
+            else:
+                high = bisect.bisect_left(self._keys, (end,))
+            return [(problem_id, self._entries[problem_id][2]) for _, problem_id in self._keys[low:high]]
+
+    def next_due(self, limit: int, after: Optional[datetime] = None) -> list[tuple]:
+        """(id, next_due_date, stage) of the `limit` problems due soonest (after `after`, if given)."""
+        with self._lock:
+            low = bisect.bisect_right(self._keys, (after, _MAX_ID)) if after is not None else 0
+            return [
+                (problem_id, due, self._entries[problem_id][1]) for due, problem_id in self._keys[low:low + limit]
+            ]
+
+    def check(self, db: Session, repair: bool = True) -> dict:
+        """
+        Compare the index with the problems table. Rows missing from the
+        index, present only in the index, or with a different due date,
+        stage or version are reported by id and, with repair, reloaded.
+        """
+        with self._lock:
+            generations = dict(self._generations)
+        rows = db.query(*_COLUMNS).all()
+        with self._lock:
+            table = {problem_id: (due, stage, version) for problem_id, due, stage, version in rows}
+            missing = sorted(set(table) - set(self._entries))
+            extra = sorted(set(self._entries) - set(table))
+            mismatched = sorted(
+                problem_id for problem_id, entry in table.items()
+                if problem_id in self._entries and self._entries[problem_id] != entry
+            )
+            ordered = all(a <= b for a, b in zip(self._keys, self._keys[1:]))
+            keyed = len(self._keys) == sum(1 for entry in self._entries.values() if entry[0] is not None)
+            # Rows written through while the table was read may legitimately differ
+            racing = {
+                problem_id for problem_id, generation in self._generations.items()
+                if generation != generations.get(problem_id, 0)
+            }
+            missing, extra, mismatched = (
+                [problem_id for problem_id in ids if problem_id not in racing] for ids in (missing, extra, mismatched)
+            )
+            if repair and (missing or extra or mismatched or not ordered or not keyed):
+                if not ordered or not keyed:
+                    self._keys = sorted(
+                        (entry[0], problem_id) for problem_id, entry in self._entries.items() if entry[0] is not None
+                    )
+                self._apply_rows(
+                    [(problem_id, *table[problem_id]) for problem_id in missing + mismatched],
+                    generations, missing + mismatched + extra,
+                )
+        return {
+            "checked": len(table),
+            "indexed": len(self),
+            "missing": missing,
+            "extra": extra,
+            "mismatched": mismatched,
+            "ordered": ordered and keyed,
+            "consistent": not (missing or extra or mismatched) and ordered and keyed,
+            "repaired": repair,
+        }
+
+
+due_index = DueIndex()
+
+
+def ready(db: Session) -> bool:
+    """
+    Whether due queries for `db` can be answered from the index. Catches up
+    from the change log first when LCTRACKER_DUE_INDEX_VERIFY is set.
+    """
+    if not (config.DUE_INDEX and due_index.loaded) or db.info.get(READ_SNAPSHOT_KEY):
+        return False
+    if config.DUE_INDEX_VERIFY:
+        due_index.sync(db)
+    return True
+
+
+def load() -> int:
+    """Build the index in its own session; called from the app lifespan."""
+    with SessionLocal() as db:
+        return due_index.load(db)
+
+
+# Write-through maintenance
+_PENDING_KEY = "due_index.pending"
+
+
+def update_on_commit(session: Session, problems: Iterable) -> None:
+    """Apply written problem rows (ORM objects or rows) when `session` commits; for writes that bypass the ORM."""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for problem in problems:
+        pending[problem.id] = (problem.next_due_date, problem.mastery_stage, problem.updated_at)
+
+
+def remove_on_commit(session: Session, problem_ids: Iterable[int]) -> None:
+    """Drop `problem_ids` from the index when `session` commits; for deletes that bypass the ORM."""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for problem_id in problem_ids:
+        pending[problem_id] = None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_problems(session, flush_context):
+    if not config.DUE_INDEX:
+        return
+    written = [obj for obj in (*session.new, *session.dirty) if isinstance(obj, Problem)]
+    if written:
+        update_on_commit(session, written)
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Problem)]
+    if deleted:
+        remove_on_commit(session, deleted)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and due_index.loaded:
+        due_index.apply(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+@job_handler("check_due_index")
+def check_due_index(ctx: JobContext) -> dict:
+    """
+    Compare this worker's due index with the problems table and reload any
+    rows that differ. payload {"repair": false} only reports.
+    """
+    if not due_index.loaded:
+        return {"loaded": False}
+    with SessionLocal() as db:
+        return due_index.check(db, repair=ctx.payload.get("repair", True))
@@ -0,0 +1,167 @@
+"""
+Response encoding negotiated per request, applied to JSON responses only.
+
+- Compact shape: with `X-Response-Shape: compact`, every list of objects in
+  the payload (top level or one level down, e.g. today's `due`/`new`) is
+  sent as {"columns": [...], "rows": [[...], ...]} so keys go out once.
+- MessagePack: with `Accept: application/msgpack` the body is re-encoded
+  as MessagePack (when the msgpack package is installed), unless the header
+  ranks application/json higher.
+- Compression: bodies of at least `minimum_size` bytes are compressed with
+  brotli (when installed) or gzip, whichever Accept-Encoding ranks higher.
+
+q=0 in either header means "not acceptable" and is honoured. Compact and
+MessagePack apply to 2xx responses only; errors are only compressed.
+
+Other responses (streams, plain text) pass through untouched.
+"""
+
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+SHAPE_HEADER = "x-response-shape"
+
+
+def compact_rows(items: list) -> object:
+    """Turn a list of same-keyed dicts into columns + rows; leave anything else alone."""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return items
+    columns = list(items[0].keys())
+    if any(item.keys() != items[0].keys() for item in items):
+        return items
+    return {"columns": columns, "rows": [[item[column] for column in columns] for item in items]}
+
+
+def compact_payload(payload: object) -> object:
+    if isinstance(payload, list):
+        return compact_rows(payload)
+    if isinstance(payload, dict):
+        return {
+            key: compact_rows(value) if isinstance(value, list) else value
+            for key, value in payload.items()
+        }
+    return payload
+
+
+def _quality(header: str, token: str) -> float:
+    """
+    q-value given to `token` in an Accept or Accept-Encoding header; 0 when
+    it isn't listed (wildcards are not expanded) or is marked q=0, which
+    means "not acceptable".
+    """
+    for part in header.split(","):
+        name, *params = part.split(";")
+        if name.strip().lower() != token:
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return max(0.0, min(1.0, float(value)))
+                except ValueError:
+                    return 0.0
+        return 1.0
+    return 0.0
+
+
+class ContentNegotiationMiddleware:
+    """ASGI middleware implementing compact/msgpack/compression negotiation."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        compact = headers.get(SHAPE_HEADER, "").lower() == "compact"
+        accept = headers.get("accept", "")
+        msgpack_quality = _quality(accept, "application/msgpack") if msgpack is not None else 0.0
+        want_msgpack = msgpack_quality > 0 and msgpack_quality >= _quality(accept, "application/json")
+        accept_encoding = headers.get("accept-encoding", "")
+        br_quality = _quality(accept_encoding, "br") if brotli is not None else 0.0
+        gzip_quality = _quality(accept_encoding, "gzip")
+        if br_quality > 0 and br_quality >= gzip_quality:
+            encoding = "br"
+        elif gzip_quality > 0:
+            encoding = "gzip"
+        else:
+            encoding = None
+
+        if not (compact or want_msgpack or encoding):
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                response_headers = {key.lower(): value for key, value in message.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"")
+                if not content_type.startswith(b"application/json") or b"content-encoding" in response_headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_encoded(send, start_message, b"".join(body_parts), compact, want_msgpack, encoding)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_encoded(self, send, start_message, body, compact, want_msgpack, encoding):
+        headers = [
+            (key, value) for key, value in start_message.get("headers", [])
+            if key.lower() not in (b"content-length", b"content-type")
+        ]
+        content_type = b"application/json"
+
+        # Error bodies keep their JSON shape: clients read detail[0].msg
+        if body and 200 <= start_message["status"] < 300 and (compact or want_msgpack):
+            payload = json.loads(body)
+            if compact:
+                payload = compact_payload(payload)
+                headers.append((b"x-response-shape", b"compact"))
+            if want_msgpack:
+                body = msgpack.packb(payload, use_bin_type=True)
+                content_type = b"application/msgpack"
+            else:
+                body = json.dumps(payload, separators=(",", ":")).encode()
+
+        if encoding and len(body) >= self.minimum_size:
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers.append((b"content-encoding", encoding.encode()))
+
+        headers.append((b"content-type", content_type))
+        headers.append((b"content-length", str(len(body)).encode()))
+        headers.append((b"vary", b"Accept, Accept-Encoding, X-Response-Shape"))
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
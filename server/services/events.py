@@ -0,0 +1,112 @@
+"""
+In-process pub/sub for server-sent change events.
+
+Write paths call publish_change() after they commit; every /api/events
+stream in this process receives the event. Counters are only computed when
+someone is listening, so writes cost nothing extra while no tab is open.
+
+Events are per process: with several uvicorn workers, a client only sees
+writes handled by the worker it is connected to. `python -m server` runs
+a single worker unless told otherwise; with more, treat events as hints
+and refetch on reconnect.
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from database import SessionLocal
+from services.scheduling import due_counts
+
+# Events buffered per subscriber before it is considered stalled and dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def _put(self, message: str) -> None:
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer: end its stream so the client reconnects and refetches
+            self.closed = True
+
+
+class EventBroker:
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, data: dict) -> None:
+        """Fan an event out to all subscribers. Safe to call from any thread."""
+        with self._lock:
+            self._sequence += 1
+            message = f"id: {self._sequence}\nevent: {event_type}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription._put, message)
+
+
+broker = EventBroker()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def publish_change(db, event_type: str, **data) -> None:
+    """
+    Publish a change event with fresh queue counters. Call after commit.
+    No-op (and no queries) when nobody is subscribed. Values may be
+    zero-argument callables; they are only evaluated when publishing.
+    """
+    if not broker.has_subscribers():
+        return
+    data = {key: value() if callable(value) else value for key, value in data.items()}
+    broker.publish(event_type, {**data, "counters": due_counts(db)})
+
+
+def _seconds_until_midnight(now: datetime) -> float:
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+def _rollover_counters() -> dict:
+    with SessionLocal() as db:
+        return due_counts(db)
+
+
+async def run_day_rollover(stop: Optional[asyncio.Event] = None) -> None:
+    """Publish day.rollover with new counters at each UTC midnight. Runs for the app lifetime."""
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=_seconds_until_midnight(datetime.utcnow()) + 1)
+        except asyncio.TimeoutError:
+            if broker.has_subscribers():
+                counters = await asyncio.to_thread(_rollover_counters)
+                broker.publish("day.rollover", {"counters": counters})
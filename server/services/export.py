@@ -0,0 +1,495 @@
+"""
+Columnar analytics export.
+
+export() writes problems and attempts under EXPORT_DIR as columnar files
+that notebooks and other tools can map into memory directly, instead of
+paging JSON out of /api/history:
+
+    arrow  (needs pyarrow)  Arrow IPC files: problems.arrow,
+                            problem_tags.arrow and attempts/part-NNNNNN.arrow
+    npy    (fallback)       one .npy file per column under problems/,
+                            problem_tags/ and attempts/
+
+Low-cardinality strings are dictionary-encoded. Attempt outcome, problem
+difficulty and last_outcome are stored as int8 codes. Tags live in a
+separate problem_tags table of (problem_id, tag) rows, where tag is an
+int32 code. The dictionaries are kept in manifest.json, and the Arrow
+files also carry them as dictionary columns. In npy files a missing value
+is NaT for datetimes, NaN for time_spent_minutes and -1 for stages and
+codes. Notes and other free text are not exported.
+
+Exports are incremental. Attempts are never updated, so each run appends
+only the attempts with an id above the last one exported. This includes
+archived partitions, read through ATTEMPTS_ALL. In the npy format the
+column files grow in place (only the header is rewritten); in the Arrow
+format each page becomes a new part file. Attempts of problems deleted
+later stay in the export. Problems change in place and are few, so all of
+them are rewritten whenever the change-log token has moved. A run with
+neither a new token nor new attempts writes nothing.
+
+manifest.json is replaced last, and readers trust its row counts, so an
+interrupted run leaves the previous export readable. The next run
+truncates the partial appends. The token, the problems and the highest
+attempt id are read in one snapshot. Attempts up to that id are then read
+in EXPORT_CHUNK_ROWS keyset pages, each a short read, so a first export
+of a long history doesn't hold SQLite's shared lock, and so block
+writers, for its whole duration. Run one export per directory at a time.
+
+load() maps an export back without copying (numpy memmaps, or pyarrow
+tables over memory-mapped files):
+
+    data = load("exports")
+    data["attempts"]["attempted_at"]
+
+    python -m services.export run [--full] [--format npy]
+    python -m services.export info
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import func, select
+
+import config
+from database import SessionLocal, begin_read_snapshot
+from models import Outcome, Problem
+from services.archive import ATTEMPTS_ALL
+from services.changes import current_token
+from services.jobs import JobContext, job_handler
+
+if TYPE_CHECKING:
+    import numpy as np
+
+FORMATS = ("arrow", "npy")
+LAYOUT_VERSION = 1
+MANIFEST = "manifest.json"
+TABLES = ("problems", "problem_tags", "attempts")
+
+# Code columns -> the manifest dictionary that decodes them
+DICTIONARY_COLUMNS = {"outcome": "outcome", "last_outcome": "outcome", "difficulty": "difficulty", "tag": "tag"}
+
+_PROBLEMS = select(
+    Problem.id, Problem.title, Problem.difficulty, Problem.tags, Problem.mastery_stage, Problem.interval_days,
+    Problem.consecutive_successes, Problem.next_due_date, Problem.last_outcome, Problem.last_attempted_at,
+    Problem.created_at, Problem.updated_at, Problem.version,
+).order_by(Problem.id)
+
+_ATTEMPTS = select(
+    ATTEMPTS_ALL.c.id, ATTEMPTS_ALL.c.problem_id, ATTEMPTS_ALL.c.attempted_at, ATTEMPTS_ALL.c.outcome,
+    ATTEMPTS_ALL.c.time_spent_minutes, ATTEMPTS_ALL.c.stage_before, ATTEMPTS_ALL.c.stage_after,
+    ATTEMPTS_ALL.c.next_due_date_after,
+).order_by(ATTEMPTS_ALL.c.id)
+
+_lock = threading.Lock()
+
+
+class ExportError(RuntimeError):
+    pass
+
+
+def _installed(module: str) -> bool:
+    # numpy and pyarrow are optional and slow to import, so they are only
+    # imported by the functions that use them; this only looks them up
+    return importlib.util.find_spec(module) is not None
+
+
+def available() -> bool:
+    """Whether numpy, which every export needs, is installed."""
+    return _installed("numpy")
+
+
+def available_formats() -> list[str]:
+    """Formats this server can write: none without numpy, arrow only with pyarrow."""
+    if not available():
+        return []
+    return [fmt for fmt in FORMATS if fmt != "arrow" or _installed("pyarrow")]
+
+
+def resolve_format(fmt: Optional[str] = None) -> str:
+    """"auto" picks arrow when pyarrow is installed, npy otherwise."""
+    fmt = fmt or config.EXPORT_FORMAT
+    if fmt == "auto":
+        return "arrow" if _installed("pyarrow") else "npy"
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown export format {fmt!r}; use one of auto, {', '.join(FORMATS)}")
+    if fmt == "arrow" and not _installed("pyarrow"):
+        raise ExportError("The arrow export format needs pyarrow installed")
+    return fmt
+
+
+def read_manifest(directory: Optional[str] = None) -> Optional[dict]:
+    path = os.path.join(directory or config.EXPORT_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".partial", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".partial", path)
+
+
+# Row -> column conversion. Both formats start from these NumPy arrays.
+
+def _ints(values, dtype) -> "np.ndarray":
+    import numpy as np
+
+    return np.fromiter((-1 if value is None else value for value in values), dtype=dtype, count=len(values))
+
+
+def _datetimes(values) -> "np.ndarray":
+    import numpy as np
+
+    return np.array(values, dtype="datetime64[us]")
+
+
+def _codes(values, dictionary: list, dtype=None) -> "np.ndarray":
+    """Dictionary-encode `values`, appending unseen ones to `dictionary`; None is -1."""
+    import numpy as np
+
+    index = {value: code for code, value in enumerate(dictionary)}
+
+    def code(value):
+        if value is None:
+            return -1
+        if value not in index:
+            index[value] = len(dictionary)
+            dictionary.append(value)
+        return index[value]
+
+    return np.fromiter((code(value) for value in values), dtype=dtype or np.int8, count=len(values))
+
+
+def _attempt_columns(rows, dictionaries: dict) -> dict:
+    import numpy as np
+
+    ids, problem_ids, attempted_at, outcomes, minutes, before, after, due_after = list(zip(*rows)) or [()] * 8
+    return {
+        "id": _ints(ids, np.int64),
+        "problem_id": _ints(problem_ids, np.int64),
+        "attempted_at": _datetimes(attempted_at),
+        "outcome": _codes(outcomes, dictionaries["outcome"]),
+        "time_spent_minutes": np.array(minutes, dtype=np.float32),
+        "stage_before": _ints(before, np.int8),
+        "stage_after": _ints(after, np.int8),
+        "next_due_date_after": _datetimes(due_after),
+    }
+
+
+def _problem_columns(rows, dictionaries: dict) -> tuple[dict, dict]:
+    """Columns of problems and of problem_tags. Rebuilds the difficulty and tag dictionaries."""
+    import numpy as np
+
+    (ids, titles, difficulties, tags, stages, intervals, successes, due, last_outcomes, last_attempted,
+     created, updated, versions) = list(zip(*rows)) or [()] * 13
+    dictionaries["difficulty"] = []
+    dictionaries["tag"] = sorted({tag for problem_tags in tags for tag in problem_tags})
+    tag_codes = {tag: code for code, tag in enumerate(dictionaries["tag"])}
+    tag_count = sum(len(problem_tags) for problem_tags in tags)
+    problems = {
+        "id": _ints(ids, np.int64),
+        "title": np.array(titles, dtype=str),
+        "difficulty": _codes(difficulties, dictionaries["difficulty"]),
+        "mastery_stage": _ints(stages, np.int8),
+        "interval_days": _ints(intervals, np.int32),
+        "consecutive_successes": _ints(successes, np.int32),
+        "next_due_date": _datetimes(due),
+        "last_outcome": _codes(last_outcomes, dictionaries["outcome"]),
+        "last_attempted_at": _datetimes(last_attempted),
+        "created_at": _datetimes(created),
+        "updated_at": _datetimes(updated),
+        "version": _ints(versions, np.int32),
+    }
+    problem_tags = {
+        "problem_id": np.fromiter(
+            (problem_id for problem_id, problem_tags in zip(ids, tags) for _ in problem_tags),
+            dtype=np.int64, count=tag_count,
+        ),
+        "tag": np.fromiter(
+            (tag_codes[tag] for problem_tags in tags for tag in problem_tags), dtype=np.int32, count=tag_count
+        ),
+    }
+    return problems, problem_tags
+
+
+# npy layout: <table>/<column>.npy
+
+def _npy_path(directory: str, table: str, column: str) -> str:
+    return os.path.join(directory, table, column + ".npy")
+
+
+def _write_npy(directory: str, table: str, columns: dict) -> None:
+    import numpy as np
+
+    os.makedirs(os.path.join(directory, table), exist_ok=True)
+    for column, values in columns.items():
+        path = _npy_path(directory, table, column)
+        with open(path + ".partial", "wb") as f:
+            np.save(f, values)
+        os.replace(path + ".partial", path)
+
+
+def _append_npy(directory: str, table: str, columns: dict, rows: int) -> None:
+    """
+    Grow each column file from `rows` (the count the manifest trusts) by the
+    new values. Only the header changes in place: NumPy pads it so the shape
+    can grow without moving the data.
+    """
+    import numpy as np
+
+    os.makedirs(os.path.join(directory, table), exist_ok=True)
+    for column, values in columns.items():
+        path = _npy_path(directory, table, column)
+        if not os.path.exists(path):
+            if rows:
+                raise ExportError(f"{path} is missing; run a full export")
+            _write_npy(directory, table, {column: values})
+            continue
+        with open(path, "r+b") as f:
+            version = np.lib.format.read_magic(f)
+            read_header, write_header = (
+                (np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0) if version == (1, 0)
+                else (np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0)
+            )
+            _, _, dtype = read_header(f)
+            offset = f.tell()
+            # Drops whatever an interrupted run appended past the manifest's count
+            f.truncate(offset + rows * dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            f.seek(0)
+            write_header(f, {
+                "descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows + len(values),),
+            })
+            if f.tell() != offset:
+                raise ExportError(f"{path}: header size changed; run a full export")
+
+
+# arrow layout: problems.arrow, problem_tags.arrow, attempts/part-NNNNNN.arrow
+
+def _arrow_table(columns: dict, dictionaries: dict):
+    """A pyarrow Table from export columns: codes become dictionary columns, -1/NaN/NaT become nulls."""
+    import pyarrow as pa
+
+    arrays = {}
+    for name, values in columns.items():
+        if name in DICTIONARY_COLUMNS:
+            arrays[name] = pa.DictionaryArray.from_arrays(
+                pa.array(values, mask=values < 0), pa.array(dictionaries[DICTIONARY_COLUMNS[name]], type=pa.string())
+            )
+        elif values.dtype.kind == "i":
+            arrays[name] = pa.array(values, mask=values == -1)
+        else:
+            arrays[name] = pa.array(values, from_pandas=True)
+    return pa.table(arrays)
+
+
+def _write_arrow(path: str, table) -> None:
+    import pyarrow as pa
+
+    with pa.OSFile(path + ".partial", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + ".partial", path)
+
+
+def _clear(directory: str) -> None:
+    """Remove a previous export's files (and only those) from `directory`."""
+    for table in TABLES:
+        shutil.rmtree(os.path.join(directory, table), ignore_errors=True)
+        path = os.path.join(directory, table + ".arrow")
+        if os.path.exists(path):
+            os.remove(path)
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _new_manifest(fmt: str) -> dict:
+    return {
+        "layout": LAYOUT_VERSION,
+        "format": fmt,
+        "token": None,
+        "exported_at": None,
+        # Seeded so the usual outcomes keep the same codes in every export
+        "dictionaries": {"outcome": [outcome.value for outcome in Outcome], "difficulty": [], "tag": []},
+        "problems": {"rows": 0},
+        "problem_tags": {"rows": 0},
+        "attempts": {"rows": 0, "max_id": 0, "parts": []},
+    }
+
+
+def export(directory: Optional[str] = None, fmt: Optional[str] = None, full: bool = False,
+           chunk_rows: Optional[int] = None, progress=None) -> dict:
+    """
+    Bring the export in `directory` up to date. Returns what was written.
+    A different format, or full=True, starts the export over. `progress`,
+    if given, is called as progress(done, total) after each page.
+    """
+    if not available():
+        raise ExportError("The export needs numpy installed")
+    directory = directory or config.EXPORT_DIR
+    fmt = resolve_format(fmt)
+    chunk_rows = chunk_rows or config.EXPORT_CHUNK_ROWS
+    start = time.perf_counter()
+    with _lock:
+        os.makedirs(directory, exist_ok=True)
+        manifest = None if full else read_manifest(directory)
+        if manifest is None or manifest.get("layout") != LAYOUT_VERSION or manifest["format"] != fmt:
+            _clear(directory)
+            manifest = _new_manifest(fmt)
+        dictionaries = manifest["dictionaries"]
+        attempts = manifest["attempts"]
+
+        with SessionLocal() as db:
+            begin_read_snapshot(db)
+            token = current_token(db)
+            upper = db.execute(select(func.max(ATTEMPTS_ALL.c.id))).scalar() or 0
+            problems_changed = token != manifest["token"]
+            if not problems_changed and upper <= attempts["max_id"]:
+                return {"format": fmt, "directory": directory, "unchanged": True, "attempts": attempts["rows"]}
+            problem_rows = db.execute(_PROBLEMS).all() if problems_changed else None
+
+        if progress is not None:
+            progress(0, upper - attempts["max_id"])
+
+        appended = 0
+        with SessionLocal() as db:
+            while True:
+                rows = db.execute(
+                    _ATTEMPTS.where(ATTEMPTS_ALL.c.id > attempts["max_id"], ATTEMPTS_ALL.c.id <= upper).limit(chunk_rows)
+                ).all()
+                if not rows and (attempts["rows"] or attempts["parts"] or appended):
+                    break
+                columns = _attempt_columns(rows, dictionaries)
+                if fmt == "npy":
+                    _append_npy(directory, "attempts", columns, attempts["rows"])
+                else:
+                    os.makedirs(os.path.join(directory, "attempts"), exist_ok=True)
+                    part = f"part-{len(attempts['parts']) + 1:06d}.arrow"
+                    _write_arrow(os.path.join(directory, "attempts", part), _arrow_table(columns, dictionaries))
+                    attempts["parts"].append(part)
+                attempts["rows"] += len(rows)
+                appended += len(rows)
+                if rows:
+                    attempts["max_id"] = rows[-1][0]
+                if progress is not None:
+                    progress(appended, None)
+                if len(rows) < chunk_rows:
+                    break
+
+        if problem_rows is not None:
+            problems, problem_tags = _problem_columns(problem_rows, dictionaries)
+            if fmt == "npy":
+                _write_npy(directory, "problems", problems)
+                _write_npy(directory, "problem_tags", problem_tags)
+            else:
+                _write_arrow(os.path.join(directory, "problems.arrow"), _arrow_table(problems, dictionaries))
+                _write_arrow(os.path.join(directory, "problem_tags.arrow"), _arrow_table(problem_tags, dictionaries))
+            manifest["problems"]["rows"] = len(problems["id"])
+            manifest["problem_tags"]["rows"] = len(problem_tags["tag"])
+        manifest["token"] = token
+        manifest["exported_at"] = datetime.utcnow().isoformat()
+        _write_manifest(directory, manifest)
+
+    return {
+        "format": fmt,
+        "directory": directory,
+        "unchanged": False,
+        "problems": manifest["problems"]["rows"],
+        "problems_rewritten": problem_rows is not None,
+        "attempts": attempts["rows"],
+        "appended": appended,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def load(directory: Optional[str] = None) -> dict:
+    """
+    Map an export into memory without copying. Returns {"problems",
+    "problem_tags", "attempts", "dictionaries"}: pyarrow Tables for the
+    arrow format, {column: read-only numpy memmap} for npy.
+    """
+    directory = directory or config.EXPORT_DIR
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise ExportError(f"No export in {directory}")
+    data = {"dictionaries": manifest["dictionaries"]}
+    if manifest["format"] == "arrow":
+        if not _installed("pyarrow"):
+            raise ExportError("This export is in the arrow format; install pyarrow to load it")
+        import pyarrow as pa
+
+        def read(path):
+            return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+        data["problems"] = read(os.path.join(directory, "problems.arrow"))
+        data["problem_tags"] = read(os.path.join(directory, "problem_tags.arrow"))
+        # Chunks of one table; nothing is concatenated in memory
+        data["attempts"] = pa.concat_tables(
+            [read(os.path.join(directory, "attempts", part)) for part in manifest["attempts"]["parts"]]
+        )
+        return data
+
+    import numpy as np
+
+    for table in TABLES:
+        rows = manifest[table]["rows"]
+        folder = os.path.join(directory, table)
+        data[table] = {
+            # Empty files can't be mapped
+            name[:-len(".npy")]: np.load(os.path.join(folder, name), mmap_mode="r" if rows else None)[:rows]
+            for name in sorted(os.listdir(folder)) if name.endswith(".npy")
+        }
+    return data
+
+
+@job_handler("export_analytics")
+def export_analytics(ctx: JobContext) -> dict:
+    """
+    Update the columnar export in EXPORT_DIR. payload {"full": true}
+    rewrites it; {"format": "npy"} overrides LCTRACKER_EXPORT_FORMAT.
+    Progress counts attempts against the span of new attempt ids.
+    """
+    return export(fmt=ctx.payload.get("format"), full=bool(ctx.payload.get("full")), progress=ctx.set_progress)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m services.export", description="Columnar analytics export")
+    parser.add_argument("--dir", default=None, help="export directory (default LCTRACKER_EXPORT_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="bring the export up to date")
+    run_parser.add_argument("--full", action="store_true", help="rewrite instead of appending")
+    run_parser.add_argument("--format", choices=("auto", *FORMATS), default=None)
+    commands.add_parser("info", help="show the manifest")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        result = export(args.dir, args.format, args.full)
+        if result["unchanged"]:
+            print(f"{result['directory']} is up to date ({result['attempts']} attempts)")
+        else:
+            print(f"Exported {result['problems']} problems and {result['appended']} new attempts "
+                  f"({result['attempts']} total) as {result['format']} to {result['directory']} in {result['seconds']}s")
+    elif args.command == "info":
+        manifest = read_manifest(args.dir)
+        if manifest is None:
+            print(f"No export in {args.dir or config.EXPORT_DIR}")
+            return 1
+        print(json.dumps({key: value for key, value in manifest.items() if key != "dictionaries"}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+In-process background job runner backed by the `jobs` table.
+
+Handlers are plain functions registered with @job_handler("kind"). The
+runner is an asyncio task started from the app lifespan; it claims one
+queued job at a time and runs its handler in a worker thread so request
+handling is never blocked. Handlers report progress and honour
+cancellation through JobContext, and should write through
+JobContext.run_in_chunks so each transaction (and SQLite write lock) stays
+short.
+
+Failed jobs are retried with exponential backoff up to max_attempts. Claims
+are a conditional UPDATE, so several app workers can share one table.
+While a handler runs, a heartbeat thread refreshes heartbeat_at every
+JOB_HEARTBEAT_SECONDS, so a long single step (a backup, an export) is not
+mistaken for an orphan; only a job whose runner stopped heartbeating is
+requeued, and one that has used up max_attempts is failed instead.
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import config
+from database import SessionLocal
+from models import Job, JobStatus
+
+logger = logging.getLogger("lctracker.jobs")
+
+# Modules whose import registers handlers; loaded on first use
+HANDLER_MODULES = [
+    "services.maintenance", "services.archive", "services.timing", "services.backup", "services.due_index",
+    "services.export",
+]
+
+_handlers: dict[str, Callable] = {}
+_handlers_loaded = False
+
+
+def job_handler(kind: str):
+    """Register `fn(ctx: JobContext) -> Optional[dict]` as the handler for `kind`."""
+
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+
+    return decorator
+
+
+def get_handlers() -> dict[str, Callable]:
+    global _handlers_loaded
+    if not _handlers_loaded:
+        for module in HANDLER_MODULES:
+            importlib.import_module(module)
+        _handlers_loaded = True
+    return _handlers
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Handle passed to job handlers for progress, cancellation and chunked writes."""
+
+    def __init__(self, job_id: int, payload: dict):
+        self.job_id = job_id
+        self.payload = payload
+        self.done = 0
+        self.total: Optional[int] = None
+
+    def set_progress(self, done: int, total: Optional[int] = None) -> None:
+        """Record progress and heartbeat; raises JobCancelled if cancellation was requested."""
+        self.done = done
+        if total is not None:
+            self.total = total
+        with SessionLocal() as db:
+            job = db.get(Job, self.job_id)
+            job.progress_done = self.done
+            job.progress_total = self.total
+            job.heartbeat_at = datetime.utcnow()
+            cancel = bool(job.cancel_requested)
+            db.commit()
+        if cancel:
+            raise JobCancelled()
+
+    def run_in_chunks(
+        self,
+        items: list,
+        apply: Callable[[Session, list], None],
+        chunk_size: Optional[int] = None,
+    ) -> None:
+        """
+        Call apply(db, chunk) for successive chunks of `items`, committing after
+        each one and updating progress in between.
+        """
+        chunk_size = chunk_size or config.JOB_CHUNK_SIZE
+        self.set_progress(0, len(items))
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            with SessionLocal() as db:
+                apply(db, chunk)
+                db.commit()
+            self.set_progress(start + len(chunk))
+            # Let waiting writers take the lock between chunks
+            time.sleep(0)
+
+
+def submit_job(db: Session, kind: str, payload: Optional[dict] = None, max_attempts: int = 3) -> Job:
+    """
+    Queue a job. Raises ValueError for an unknown kind. Caller commits, then
+    calls runner.wake() so the job starts without waiting for the next poll.
+    """
+    if kind not in get_handlers():
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(kind=kind, payload=json.dumps(payload or {}), max_attempts=max_attempts)
+    db.add(job)
+    return job
+
+
+def request_cancel(db: Session, job: Job) -> None:
+    """Cancel a queued job immediately, or flag a running one. Caller commits."""
+    if job.status == JobStatus.QUEUED.value:
+        job.status = JobStatus.CANCELLED.value
+        job.finished_at = datetime.utcnow()
+    elif job.status == JobStatus.RUNNING.value:
+        job.cancel_requested = 1
+
+
+def _claim_next() -> Optional[tuple[int, str, dict]]:
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=config.JOB_STALE_SECONDS)
+    with SessionLocal() as db:
+        # Jobs whose runner went away (process crash, restart): requeue them,
+        # unless they keep taking their runner down and have no attempts left
+        stale = (Job.status == JobStatus.RUNNING.value, Job.heartbeat_at < stale_before)
+        db.execute(
+            update(Job)
+            .where(*stale, Job.attempts >= Job.max_attempts)
+            .values(
+                status=JobStatus.FAILED.value,
+                finished_at=now,
+                error="Runner stopped responding; no attempts left",
+            )
+        )
+        db.execute(update(Job).where(*stale).values(status=JobStatus.QUEUED.value))
+        db.commit()
+
+        candidates = (
+            db.query(Job.id)
+            .filter(Job.status == JobStatus.QUEUED.value, Job.run_after <= now)
+            .order_by(Job.created_at.asc())
+            .limit(5)
+            .all()
+        )
+        for (job_id,) in candidates:
+            claimed = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.QUEUED.value)
+                .values(
+                    status=JobStatus.RUNNING.value,
+                    attempts=Job.attempts + 1,
+                    started_at=now,
+                    heartbeat_at=now,
+                )
+            ).rowcount
+            db.commit()
+            if claimed:
+                job = db.get(Job, job_id)
+                return job.id, job.kind, json.loads(job.payload or "{}")
+    return None
+
+
+def _finish(job_id: int, status: JobStatus, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        now = datetime.utcnow()
+        if status == JobStatus.FAILED and job.attempts < job.max_attempts and not job.cancel_requested:
+            job.status = JobStatus.QUEUED.value
+            job.run_after = now + timedelta(seconds=2 ** job.attempts)
+        else:
+            job.status = status.value
+            job.finished_at = now
+        job.error = error
+        if result is not None:
+            job.result = json.dumps(result)
+        db.commit()
+
+
+class _Heartbeat:
+    """Thread that keeps a running job's heartbeat_at fresh while its handler works."""
+
+    def __init__(self, job_id: int, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-{job_id}-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                with SessionLocal() as db:
+                    db.execute(
+                        update(Job)
+                        .where(Job.id == self.job_id, Job.status == JobStatus.RUNNING.value)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    db.commit()
+            except Exception:
+                # A missed beat (e.g. the handler holds the SQLite write lock) is retried next interval
+                logger.warning("Heartbeat for job %s failed", self.job_id, exc_info=True)
+
+
+def _run_job(job_id: int, kind: str, payload: dict) -> None:
+    """Runs in a worker thread."""
+    handler = get_handlers().get(kind)
+    if handler is None:
+        _finish(job_id, JobStatus.FAILED, error=f"Unknown job kind: {kind}")
+        return
+    try:
+        with _Heartbeat(job_id, config.JOB_HEARTBEAT_SECONDS):
+            result = handler(JobContext(job_id, payload))
+    except JobCancelled:
+        _finish(job_id, JobStatus.CANCELLED)
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed", job_id, kind)
+        _finish(job_id, JobStatus.FAILED, error=f"{type(exc).__name__}: {exc}")
+    else:
+        _finish(job_id, JobStatus.SUCCEEDED, result=result)
+
+
+class JobRunner:
+    """Asyncio loop that runs queued jobs one at a time in a worker thread."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop claiming new jobs and wait for the current one to finish."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def wake(self) -> None:
+        """Called from any thread after a job is submitted."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                claimed = await asyncio.to_thread(_claim_next)
+            except Exception:
+                logger.exception("Failed to claim job")
+                claimed = None
+
+            if claimed is not None:
+                await asyncio.to_thread(_run_job, *claimed)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=config.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+runner = JobRunner()
+
+
+def iter_ids(db: Session, column, *criteria) -> list:
+    """Primary keys matching `criteria`, for feeding JobContext.run_in_chunks."""
+    query = db.query(column)
+    for criterion in criteria:
+        query = query.filter(criterion)
+    return [row[0] for row in query.order_by(column).all()]
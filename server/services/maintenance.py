@@ -0,0 +1,42 @@
+"""
+Maintenance job handlers. Registered with the job runner on first use.
+"""
+
+from sqlalchemy import or_
+
+from database import SessionLocal
+from models import Outcome, Problem
+from services.jobs import JobContext, iter_ids, job_handler
+from services.scheduling import ladder_schedule
+
+
+@job_handler("recompute_schedules")
+def recompute_schedules(ctx: JobContext) -> dict:
+    """
+    Re-derive interval_days and next_due_date from each problem's mastery
+    stage, last attempt and last outcome, e.g. after INTERVAL_LADDER changes.
+    A postponed problem keeps its pushed date.
+    """
+    with SessionLocal() as db:
+        # Archived problems stay unscheduled
+        ids = iter_ids(
+            db, Problem.id, Problem.last_attempted_at.isnot(None), Problem.archived_at.is_(None),
+            or_(Problem.last_outcome.is_(None), Problem.last_outcome != Outcome.POSTPONE.value),
+        )
+
+    changed = 0
+
+    def apply(db, chunk):
+        nonlocal changed
+        for problem in db.query(Problem).filter(Problem.id.in_(chunk)):
+            schedule = ladder_schedule(problem)
+            if schedule is None:
+                continue
+            interval, next_due_date = schedule
+            if problem.interval_days != interval or problem.next_due_date != next_due_date:
+                problem.interval_days = interval
+                problem.next_due_date = next_due_date
+                changed += 1
+
+    ctx.run_in_chunks(ids, apply)
+    return {"problems_scanned": len(ids), "problems_changed": changed}
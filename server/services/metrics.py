@@ -0,0 +1,368 @@
+"""
+In-process request and database metrics, rendered in Prometheus text format.
+
+Latency is recorded per route template (e.g. /api/problems/{problem_id}) by
+MetricsMiddleware. Database work is attributed to the route that issued it
+through a context variable that the SQLAlchemy cursor hooks update.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, (counts, total, count) in items:
+            base = _format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _join_labels(base, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _join_labels(base, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_wrap(base)} {total}")
+            lines.append(f"{self.name}_count{_wrap(base)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values) -> None:
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        with self._lock:
+            return self._series.get(label_values, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_wrap(_format_labels(self.labels, label_values))} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _join_labels(base: str, extra: str) -> str:
+    return "{" + (f"{base},{extra}" if base else extra) + "}"
+
+
+def _wrap(labels: str) -> str:
+    return "{" + labels + "}" if labels else ""
+
+
+# Registry
+REQUEST_LATENCY = Histogram(
+    "lctracker_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    labels=("method", "route"),
+)
+REQUESTS_TOTAL = Counter(
+    "lctracker_http_requests_total",
+    "HTTP requests by route template and status code.",
+    labels=("method", "route", "status"),
+)
+REQUEST_DB_TIME = Histogram(
+    "lctracker_http_request_db_seconds",
+    "Time spent executing SQL per request.",
+    labels=("method", "route"),
+)
+REQUEST_STATEMENTS = Histogram(
+    "lctracker_http_request_db_statements",
+    "SQL statements issued per request.",
+    labels=("method", "route"),
+    buckets=STATEMENT_COUNT_BUCKETS,
+)
+DB_STATEMENT_LATENCY = Histogram(
+    "lctracker_db_statement_duration_seconds",
+    "Latency of individual SQL statements.",
+    labels=("route",),
+)
+DB_STATEMENTS_TOTAL = Counter(
+    "lctracker_db_statements_total",
+    "SQL statements executed, by issuing route.",
+    labels=("route",),
+)
+DB_ROWS_AFFECTED_TOTAL = Counter(
+    "lctracker_db_rows_affected_total",
+    "Rows reported by the cursor for INSERT/UPDATE/DELETE statements.",
+    labels=("route",),
+)
+ORM_ROWS_LOADED_TOTAL = Counter(
+    "lctracker_orm_rows_loaded_total",
+    "ORM instances hydrated from query results.",
+    labels=("route",),
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "lctracker_db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+)
+COMPILED_CACHE_TOTAL = Counter(
+    "lctracker_db_compiled_cache_total",
+    "SQLAlchemy compiled statement cache lookups by result.",
+    labels=("result",),
+)
+DB_COMMIT_LATENCY = Histogram(
+    "lctracker_db_commit_duration_seconds",
+    "Session COMMIT latency, including any wait for the SQLite write lock.",
+    labels=("route",),
+)
+DB_WRITE_LOCK_WAIT = Histogram(
+    "lctracker_db_write_lock_wait_seconds",
+    "Duration of the first write statement in each transaction, which acquires the "
+    "SQLite write lock (PostgreSQL: the first row locks); includes the statement itself.",
+    labels=("route",),
+)
+DB_LOCK_ERRORS_TOTAL = Counter(
+    "lctracker_db_lock_errors_total",
+    "Statements that failed because the database stayed locked past the busy timeout.",
+    labels=("route",),
+)
+
+REGISTRY = [
+    REQUEST_LATENCY,
+    REQUESTS_TOTAL,
+    REQUEST_DB_TIME,
+    REQUEST_STATEMENTS,
+    DB_STATEMENT_LATENCY,
+    DB_STATEMENTS_TOTAL,
+    DB_ROWS_AFFECTED_TOTAL,
+    ORM_ROWS_LOADED_TOTAL,
+    POOL_CHECKOUT_WAIT,
+    COMPILED_CACHE_TOTAL,
+    DB_COMMIT_LATENCY,
+    DB_WRITE_LOCK_WAIT,
+    DB_LOCK_ERRORS_TOTAL,
+]
+
+# Driver messages for lock contention: SQLite busy timeout, PostgreSQL lock_timeout / deadlock
+_LOCK_ERROR_MESSAGES = ("database is locked", "database table is locked", "lock timeout", "deadlock detected")
+
+
+def is_lock_error(exc: BaseException) -> bool:
+    """True if `exc` (or the DBAPI error it wraps) reports lock contention."""
+    message = str(getattr(exc, "orig", None) or exc).lower()
+    return any(text in message for text in _LOCK_ERROR_MESSAGES)
+
+
+class RequestStats:
+    """Mutable per-request accumulator shared with worker threads via a ContextVar."""
+
+    __slots__ = ("scope", "db_time", "statements", "commit_time")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.db_time = 0.0
+        self.statements = 0
+        self.commit_time = 0.0
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope before calling the endpoint
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def _current_route() -> str:
+    stats = current_request.get()
+    return stats.route if stats is not None else "background"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and DB usage per route template.
+
+    With server_timing=True each response also carries a Server-Timing
+    header (db, commit and app time so far), which lets a load generator
+    see database waits from every worker rather than whichever one
+    answers /metrics.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    timing = (
+                        f"db;dur={stats.db_time * 1000:.2f}, commit;dur={stats.commit_time * 1000:.2f}, "
+                        f"app;dur={(time.perf_counter() - start) * 1000:.2f}"
+                    )
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route_path = stats.route
+            method = scope["method"]
+            REQUEST_LATENCY.observe(elapsed, method, route_path)
+            REQUESTS_TOTAL.inc(1, method, route_path, str(status))
+            REQUEST_DB_TIME.observe(stats.db_time, method, route_path)
+            REQUEST_STATEMENTS.observe(stats.statements, method, route_path)
+
+
+def observe_pool_checkout(seconds: float) -> None:
+    POOL_CHECKOUT_WAIT.observe(seconds)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach cursor timing and compiled-cache hooks to an engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        route = _current_route()
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.statements += 1
+        DB_STATEMENT_LATENCY.observe(elapsed, route)
+        DB_STATEMENTS_TOTAL.inc(1, route)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            DB_ROWS_AFFECTED_TOTAL.inc(cursor.rowcount, route)
+        if context is not None:
+            COMPILED_CACHE_TOTAL.inc(1, context.cache_hit.name.lower())
+            if (context.isinsert or context.isupdate or context.isdelete) and not conn.info.get("wrote"):
+                # pysqlite opens the transaction lazily, so the first write is where it waits for the lock
+                conn.info["wrote"] = True
+                DB_WRITE_LOCK_WAIT.observe(elapsed, route)
+
+    @event.listens_for(engine, "commit")
+    @event.listens_for(engine, "rollback")
+    def _end_transaction(conn):
+        conn.info.pop("wrote", None)
+
+    @event.listens_for(engine, "reset")
+    def _reset_on_return(dbapi_connection, connection_record, reset_state):
+        # A session closed without commit/rollback ends its transaction here
+        connection_record.info.pop("wrote", None)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        started = conn.info.get("query_start") if conn is not None else None
+        if started:
+            elapsed = time.perf_counter() - started.pop()
+            stats = current_request.get()
+            if stats is not None:
+                stats.db_time += elapsed
+        if is_lock_error(exception_context.original_exception):
+            DB_LOCK_ERRORS_TOTAL.inc(1, _current_route())
+
+
+def instrument_sessions(session_factory) -> None:
+    """Time the COMMIT of each session transaction (after its final flush)."""
+
+    @event.listens_for(session_factory, "before_commit")
+    def _before_commit(session):
+        session.info["commit_start"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_flush_postexec")
+    def _after_flush_postexec(session, flush_context):
+        # The flush inside commit() is statement time, not commit time
+        if "commit_start" in session.info:
+            session.info["commit_start"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_commit")
+    def _after_commit(session):
+        started = session.info.pop("commit_start", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats = current_request.get()
+        if stats is not None:
+            stats.commit_time += elapsed
+        DB_COMMIT_LATENCY.observe(elapsed, _current_route())
+
+    @event.listens_for(session_factory, "after_rollback")
+    def _after_rollback(session):
+        session.info.pop("commit_start", None)
+
+
+def instrument_orm(base) -> None:
+    """Count ORM instance loads for every mapped class under a declarative base."""
+
+    @event.listens_for(base, "load", propagate=True)
+    def _on_load(target, context):
+        ORM_ROWS_LOADED_TOTAL.inc(1, _current_route())
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
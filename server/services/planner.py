@@ -0,0 +1,370 @@
+"""
+Time-budgeted review session planning for /api/today/plan.
+
+Each due problem gets:
+
+- a cost: the median of its own time_spent_minutes (kept precomputed in
+  problem_timing_sketches.median_minutes), else the p50 for its difficulty
+  over the last year from the timing sketches, else DEFAULT_MINUTES;
+- a value: the mastery it is expected to lose if skipped. Intervals are
+  treated as the point where recall has dropped to TARGET_RECALL, so after
+  `elapsed` days recall is TARGET_RECALL ** (elapsed / interval_days); the
+  chance it is forgotten, 1 - recall, grows with overdue days, and is
+  weighted by mastery_stage + 1 because a forgotten problem falls back down
+  the ladder from wherever it was.
+
+Selection is a 0/1 knapsack over whole minutes. Problems are ranked by
+value per minute and the best MAX_CANDIDATES (enough to cover a few times
+the budget) are solved exactly with a NumPy dynamic program over the
+budget: O(candidates x minutes) vector work.
+
+The per-problem inputs (due date, interval, stage, last attempt, median
+minutes, difficulty) are held in memory as NumPy columns by PlanStats and
+brought up to date from the change log, like the related-problem index,
+so a plan costs one version check plus vector arithmetic rather than a
+scan of due problems. Attempts are never read. Without NumPy the planner
+queries due problems per request and fills the budget greedily by value
+per minute.
+"""
+
+import importlib.util
+import math
+import threading
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Change, Problem, ProblemTimingSketch
+from services.problem_cache import snapshots_for
+from services.timing import timing_stats
+
+TARGET_RECALL = 0.9
+DEFAULT_MINUTES = {"EASY": 15, "MEDIUM": 30, "HARD": 45}
+FALLBACK_MINUTES = 30
+# Months of difficulty-wide timing used when a problem has no history
+DIFFICULTY_MONTHS = 12
+# Candidates passed to the exact solver: enough to cover this many budgets
+CANDIDATE_BUDGETS = 4
+MAX_CANDIDATES = 512
+# Above this share of problems changed since the last sync, reload everything
+_RELOAD_FRACTION = 0.25
+
+_EPOCH = datetime(1970, 1, 1)
+_DAY = 86400.0
+_DIFFICULTIES = list(DEFAULT_MINUTES)
+
+_PLAN_COLUMNS = (
+    Problem.id, Problem.updated_at, Problem.difficulty, Problem.next_due_date, Problem.interval_days,
+    Problem.mastery_stage, Problem.last_attempted_at, ProblemTimingSketch.median_minutes,
+)
+
+
+def _seconds(value: Optional[datetime]) -> float:
+    return (value - _EPOCH).total_seconds() if value is not None else math.nan
+
+
+def recall_probability(elapsed_days: float, interval_days: int) -> float:
+    return TARGET_RECALL ** (max(elapsed_days, 0.0) / max(interval_days or 1, 1))
+
+
+def _difficulty_minutes(db: Session) -> dict:
+    minutes = dict(DEFAULT_MINUTES)
+    for row in timing_stats(db, DIFFICULTY_MONTHS)["by_difficulty"]:
+        if row["p50"] is not None:
+            minutes[row["difficulty"]] = row["p50"]
+    return minutes
+
+
+def _plan_query(db: Session):
+    return db.query(*_PLAN_COLUMNS).outerjoin(ProblemTimingSketch, ProblemTimingSketch.problem_id == Problem.id)
+
+
+class PlanStats:
+    """
+    Planner inputs for every problem as NumPy columns, one row per problem.
+    sync() follows the change-log token (problem writes, including the
+    schedule changes every attempt makes) and the newest sketch write
+    (which also moves when rebuild_timing_sketches rewrites medians).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._token: Optional[int] = None
+        self._sketch_version = None
+        # The NumPy columns are allocated by the first sync(), so importing
+        # the planner doesn't import NumPy
+        self._rows: dict[int, int] = {}
+        self._size = 0
+
+    def _reset(self) -> None:
+        import numpy as np
+
+        self._rows: dict[int, int] = {}  # problem id -> row
+        self._size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.versions = np.empty(0, dtype=object)
+        self.difficulty = np.zeros(0, dtype=np.int8)
+        self.due = np.zeros(0)
+        self.interval = np.ones(0)
+        self.stage = np.zeros(0)
+        self.last_attempted = np.full(0, np.nan)
+        self.median = np.full(0, np.nan)
+        self.alive = np.zeros(0, dtype=bool)
+
+    def _grow(self, needed: int) -> None:
+        import numpy as np
+
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        extra = max(needed, capacity * 2, 64) - capacity
+        for name, fill in (("ids", 0), ("versions", None), ("difficulty", 0), ("due", 0.0), ("interval", 1.0),
+                           ("stage", 0.0), ("last_attempted", np.nan), ("median", np.nan), ("alive", False)):
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.full(extra, fill, dtype=column.dtype)]))
+
+    def _put(self, rows) -> None:
+        rows = list(rows)
+        self._grow(self._size + len(rows))
+        for problem_id, version, difficulty, due, interval, stage, last_attempted, median in rows:
+            row = self._rows.get(problem_id)
+            if row is None:
+                row = self._rows[problem_id] = self._size
+                self._size += 1
+            self.ids[row] = problem_id
+            self.versions[row] = version
+            self.difficulty[row] = _DIFFICULTIES.index(difficulty) if difficulty in DEFAULT_MINUTES else -1
+            self.due[row] = _seconds(due)
+            self.interval[row] = max(interval or 1, 1)
+            self.stage[row] = stage or 0
+            self.last_attempted[row] = _seconds(last_attempted)
+            self.median[row] = math.nan if median is None else median
+            self.alive[row] = True
+
+    def _version(self, db: Session) -> tuple:
+        newest_sketch = select(func.max(ProblemTimingSketch.updated_at)).scalar_subquery()
+        return tuple(db.query(func.max(Change.token), newest_sketch).one())
+
+    def _load_all(self, db: Session) -> None:
+        self._reset()
+        self._put(_plan_query(db).all())
+
+    def sync(self, db: Session) -> None:
+        import numpy as np
+
+        token, sketch_version = self._version(db)
+        token = token or 0
+        with self._lock:
+            if self._token is None:
+                self._load_all(db)
+                self._token, self._sketch_version = token, sketch_version
+                return
+            if token != self._token:
+                changed = {
+                    problem_id
+                    for (problem_id,) in db.query(Change.entity_id).filter(
+                        Change.entity == "problem", Change.token > self._token, Change.token <= token
+                    ).distinct()
+                }
+                if len(changed) > max(1, len(self._rows)) * _RELOAD_FRACTION:
+                    self._load_all(db)
+                    self._token, self._sketch_version = token, sketch_version
+                    return
+                if changed:
+                    rows = _plan_query(db).filter(Problem.id.in_(changed)).all()
+                    self._put(rows)
+                    for problem_id in changed - {row[0] for row in rows}:
+                        row = self._rows.get(problem_id)
+                        if row is not None:
+                            self.alive[row] = False
+                self._token = token
+            if sketch_version != self._sketch_version:
+                query = db.query(ProblemTimingSketch.problem_id, ProblemTimingSketch.median_minutes)
+                if sketch_version is None or self._sketch_version is None or sketch_version < self._sketch_version:
+                    self.median[:] = np.nan
+                else:
+                    query = query.filter(ProblemTimingSketch.updated_at > self._sketch_version)
+                for problem_id, median in query:
+                    row = self._rows.get(problem_id)
+                    if row is not None:
+                        self.median[row] = math.nan if median is None else median
+                self._sketch_version = sketch_version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._token = None
+
+    def due_rows(self, end: datetime) -> dict:
+        """Copies of the numeric columns for problems due by `end`."""
+        import numpy as np
+
+        with self._lock:
+            size = self._size
+            rows = np.nonzero(self.alive[:size] & (self.due[:size] <= _seconds(end)))[0]
+            return {
+                name: getattr(self, name)[rows]
+                for name in ("ids", "difficulty", "due", "interval", "stage", "last_attempted", "median")
+            }
+
+    def versions_for(self, ids: list[int]) -> list:
+        """updated_at of each problem id, for snapshot lookups."""
+        with self._lock:
+            return [self.versions[self._rows[problem_id]] for problem_id in ids]
+
+
+def available() -> bool:
+    """Whether numpy is installed; without it the planner queries and selects greedily."""
+    return importlib.util.find_spec("numpy") is not None
+
+
+plan_stats = PlanStats() if available() else None
+
+
+def _knapsack(costs, values, budget: int) -> list[int]:
+    """Indices of the value-maximizing subset with total cost <= budget."""
+    import numpy as np
+
+    best = np.zeros(budget + 1)
+    taken = np.zeros((len(costs), budget + 1), dtype=bool)
+    for i, (cost, value) in enumerate(zip(costs, values)):
+        if cost > budget:
+            continue
+        with_item = best[:-cost] + value
+        improved = with_item > best[cost:]
+        taken[i, cost:] = improved
+        best[cost:] = np.where(improved, with_item, best[cost:])
+    chosen = []
+    remaining = budget
+    for i in range(len(costs) - 1, -1, -1):
+        if taken[i, remaining]:
+            chosen.append(i)
+            remaining -= costs[i]
+    return chosen
+
+
+def _greedy(costs: list[int], values: list[float], budget: int) -> list[int]:
+    chosen, used = [], 0
+    for i, cost in enumerate(costs):
+        if used + cost <= budget:
+            chosen.append(i)
+            used += cost
+    # Greedy by density can miss one large valuable problem; take it alone if better
+    fitting = [i for i, cost in enumerate(costs) if cost <= budget]
+    if fitting:
+        single = max(fitting, key=lambda i: values[i])
+        if values[single] > sum(values[i] for i in chosen):
+            return [single]
+    return chosen
+
+
+def _candidate(row, cost, estimate, overdue_days, recall, value) -> dict:
+    return {"row": row, "cost": cost, "estimate": estimate, "overdue_days": overdue_days, "recall": recall,
+            "value": value}
+
+
+def _shortlist_arrays(db: Session, minutes: int, now: datetime, end: datetime) -> tuple[list[dict], int, float]:
+    """Score every due problem with vector arithmetic; returns (shortlist in rank order, due count, total value)."""
+    import numpy as np
+
+    plan_stats.sync(db)
+    due = plan_stats.due_rows(end)
+    if not len(due["ids"]):
+        return [], 0, 0.0
+    now_seconds = _seconds(now)
+    median = due["median"]
+    no_history = np.isnan(median)
+    costs = median
+    if no_history.any():
+        difficulty_minutes = _difficulty_minutes(db)
+        by_code = np.array([difficulty_minutes[name] for name in _DIFFICULTIES] + [FALLBACK_MINUTES])
+        costs = np.where(no_history, by_code[due["difficulty"]], median)
+    costs = np.maximum(np.ceil(costs), 1).astype(np.int64)
+    overdue = np.maximum((now_seconds - due["due"]) / _DAY, 0.0)
+    elapsed = np.where(
+        np.isnan(due["last_attempted"]), due["interval"] + overdue, (now_seconds - due["last_attempted"]) / _DAY
+    )
+    recall = TARGET_RECALL ** (np.maximum(elapsed, 0.0) / due["interval"])
+    values = (1 - recall) * (due["stage"] + 1)
+
+    # Best value per minute first, cheaper first on ties. Only the top
+    # MAX_CANDIDATES can make the shortlist, so partition before sorting.
+    density = values / costs
+    top = np.arange(len(density))
+    if len(top) > MAX_CANDIDATES:
+        top = np.argpartition(-density, MAX_CANDIDATES - 1)[:MAX_CANDIDATES]
+    order = top[np.lexsort((costs[top], -density[top]))]
+    covered_before = np.cumsum(costs[order]) - costs[order]
+    order = order[covered_before < CANDIDATE_BUDGETS * minutes]
+    ids = due["ids"][order].tolist()
+    shortlist = [
+        _candidate((problem_id, version), int(costs[i]), "difficulty" if no_history[i] else "history",
+                   round(float(overdue[i]), 2), round(float(recall[i]), 3), float(values[i]))
+        for i, problem_id, version in zip(order, ids, plan_stats.versions_for(ids))
+    ]
+    return shortlist, len(due["ids"]), float(values.sum())
+
+
+def _shortlist_query(db: Session, minutes: int, now: datetime, end: datetime) -> tuple[list[dict], int, float]:
+    """The same scoring row by row, for when NumPy is not installed."""
+    difficulty_minutes = None
+    candidates = []
+    for problem_id, version, difficulty, due, interval, stage, last_attempted, median in _plan_query(db).filter(
+        Problem.next_due_date <= end
+    ):
+        if median is not None:
+            cost, source = median, "history"
+        else:
+            if difficulty_minutes is None:
+                difficulty_minutes = _difficulty_minutes(db)
+            cost, source = difficulty_minutes.get(difficulty, FALLBACK_MINUTES), "difficulty"
+        overdue_days = max((now - due).total_seconds() / _DAY, 0.0)
+        if last_attempted is not None:
+            elapsed = (now - last_attempted).total_seconds() / _DAY
+        else:
+            elapsed = (interval or 1) + overdue_days
+        recall = recall_probability(elapsed, interval)
+        candidates.append(_candidate((problem_id, version), max(1, math.ceil(cost)), source, round(overdue_days, 2),
+                                     round(recall, 3), (1 - recall) * ((stage or 0) + 1)))
+    candidates.sort(key=lambda item: (-item["value"] / item["cost"], item["cost"]))
+    return candidates, len(candidates), sum(item["value"] for item in candidates)
+
+
+def plan_session(db: Session, minutes: int, now: Optional[datetime] = None) -> dict:
+    """Pick due problems that fit in `minutes`, most valuable first."""
+    now = now or datetime.utcnow()
+    end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+    if plan_stats is not None:
+        shortlist, due_count, value_all_due = _shortlist_arrays(db, minutes, now, end_of_today)
+        costs = [item["cost"] for item in shortlist]
+        chosen, method = _knapsack(costs, [item["value"] for item in shortlist], minutes), "knapsack"
+    else:
+        shortlist, due_count, value_all_due = _shortlist_query(db, minutes, now, end_of_today)
+        costs = [item["cost"] for item in shortlist]
+        chosen, method = _greedy(costs, [item["value"] for item in shortlist], minutes), "greedy"
+    selected = sorted((shortlist[i] for i in chosen), key=lambda item: -item["value"])
+
+    snapshots = snapshots_for(db, [item["row"] for item in selected])
+    by_id = {snapshot["id"]: snapshot for snapshot in snapshots}
+    items = [
+        {
+            "problem": by_id[item["row"][0]],
+            "estimated_minutes": item["cost"],
+            "estimate": item["estimate"],
+            "overdue_days": item["overdue_days"],
+            "recall": item["recall"],
+            "value": round(item["value"], 4),
+        }
+        for item in selected
+        if item["row"][0] in by_id
+    ]
+    return {
+        "minutes": minutes,
+        "planned_minutes": sum(item["estimated_minutes"] for item in items),
+        "due_count": due_count,
+        "value": round(sum(item["value"] for item in selected), 4),
+        "value_all_due": round(value_all_due, 4),
+        "method": method,
+        "items": items,
+    }
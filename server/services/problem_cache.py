@@ -0,0 +1,250 @@
+"""
+Bounded LRU cache of pre-serialized problem snapshots.
+
+Entries are keyed by problem id and stamped with the row's updated_at,
+which changes on every write to the row (including schedule updates from
+attempts). List endpoints select only (id, updated_at) and take matching
+snapshots from here, so hot rows skip ORM hydration and tag decoding.
+The detail endpoint also caches the attempt list and, by default, serves a
+hit with no SQL at all.
+
+Invalidation is write-through: Session hooks collect the ids of problems
+(and parents of attempts) flushed in a transaction and drop them after
+commit. A per-id generation counter stops a reader that loaded old data
+before a commit from re-inserting it afterwards.
+
+The cache is per process. List reads are always version-checked, but
+detail hits are only checked against the database when
+LCTRACKER_PROBLEM_CACHE_VERIFY is set; set it when running several workers.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import config
+from models import Attempt, Problem
+from services import metrics
+
+PROBLEM_CACHE_TOTAL = metrics.Counter(
+    "lctracker_problem_cache_total",
+    "Problem snapshot cache lookups by result.",
+    labels=("result",),
+)
+metrics.REGISTRY.append(PROBLEM_CACHE_TOTAL)
+
+
+def problem_to_response(problem: Problem) -> dict:
+    """Convert Problem model to response dict with parsed tags."""
+    return {
+        "id": problem.id,
+        "title": problem.title,
+        "platform": problem.platform,
+        "url": problem.url,
+        "difficulty": problem.difficulty,
+        "tags": problem.tags or [],
+        "notes_trick": problem.notes_trick,
+        "notes_mistakes": problem.notes_mistakes,
+        "notes_edge_cases": problem.notes_edge_cases,
+        "created_at": problem.created_at,
+        "updated_at": problem.updated_at,
+        "next_due_date": problem.next_due_date,
+        "interval_days": problem.interval_days,
+        "mastery_stage": problem.mastery_stage,
+        "consecutive_successes": problem.consecutive_successes,
+        "last_outcome": problem.last_outcome,
+        "last_attempted_at": problem.last_attempted_at,
+        "archived_at": problem.archived_at,
+        "version": problem.version,
+    }
+
+
+def attempt_to_response(attempt: Attempt) -> dict:
+    """Convert Attempt model to response dict."""
+    return {
+        "id": attempt.id,
+        "problem_id": attempt.problem_id,
+        "attempted_at": attempt.attempted_at,
+        "outcome": attempt.outcome,
+        "time_spent_minutes": attempt.time_spent_minutes,
+        "notes": attempt.notes,
+        "stage_before": attempt.stage_before,
+        "stage_after": attempt.stage_after,
+        "next_due_date_after": attempt.next_due_date_after,
+    }
+
+
+class CacheEntry:
+    __slots__ = ("version", "problem", "attempts")
+
+    def __init__(self, version, problem: dict, attempts: Optional[list]):
+        self.version = version
+        self.problem = problem
+        self.attempts = attempts
+
+
+class ProblemCache:
+    """Thread-safe LRU of CacheEntry by problem id. Snapshots are shared: treat them as read-only."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[int, CacheEntry] = OrderedDict()
+        self._generations: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def generation(self, problem_id: int) -> int:
+        return self._generations.get(problem_id, 0)
+
+    def get(self, problem_id: int, version=None, with_attempts: bool = False) -> Optional[CacheEntry]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(problem_id)
+            hit = (
+                entry is not None
+                and (version is None or entry.version == version)
+                and (not with_attempts or entry.attempts is not None)
+            )
+            if hit:
+                self._entries.move_to_end(problem_id)
+        PROBLEM_CACHE_TOTAL.inc(1, "hit" if hit else "miss")
+        return entry if hit else None
+
+    def put(self, problem_id: int, version, problem: dict, attempts: Optional[list] = None,
+            generation: Optional[int] = None) -> None:
+        """Store a snapshot, unless the id was invalidated since `generation` was read."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and self._generations.get(problem_id, 0) != generation:
+                return
+            existing = self._entries.get(problem_id)
+            if attempts is None and existing is not None and existing.version == version:
+                attempts = existing.attempts
+            self._entries[problem_id] = CacheEntry(version, problem, attempts)
+            self._entries.move_to_end(problem_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, problem_ids: Iterable[int]) -> None:
+        with self._lock:
+            for problem_id in problem_ids:
+                self._entries.pop(problem_id, None)
+                self._generations[problem_id] = self._generations.get(problem_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            problem_ids = list(self._entries)
+        self.invalidate(problem_ids)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+problem_cache = ProblemCache(config.PROBLEM_CACHE_SIZE)
+
+
+def snapshots_for(db: Session, rows: list) -> list[dict]:
+    """
+    Snapshots for (id, updated_at) rows, in order. Misses are loaded with a
+    single IN query and added to the cache.
+    """
+    snapshots = {}
+    missing = []
+    for problem_id, version in rows:
+        entry = problem_cache.get(problem_id, version)
+        if entry is not None:
+            snapshots[problem_id] = entry.problem
+        else:
+            missing.append(problem_id)
+
+    if missing:
+        generations = {problem_id: problem_cache.generation(problem_id) for problem_id in missing}
+        for problem in db.query(Problem).filter(Problem.id.in_(missing)):
+            snapshot = problem_to_response(problem)
+            snapshots[problem.id] = snapshot
+            problem_cache.put(problem.id, problem.updated_at, snapshot, generation=generations[problem.id])
+
+    return [snapshots[problem_id] for problem_id, _ in rows if problem_id in snapshots]
+
+
+def details_for(db: Session, rows: list) -> list[dict]:
+    """
+    Snapshots with their attempt lists (newest first) for (id, updated_at)
+    rows, in order. Misses are loaded with one IN query for the problems and
+    one for their attempts, and added to the cache.
+    """
+    details = {}
+    missing = []
+    for problem_id, version in rows:
+        entry = problem_cache.get(problem_id, version, with_attempts=True)
+        if entry is not None:
+            details[problem_id] = {**entry.problem, "attempts": entry.attempts}
+        else:
+            missing.append(problem_id)
+
+    if missing:
+        generations = {problem_id: problem_cache.generation(problem_id) for problem_id in missing}
+        problems = db.query(Problem).filter(Problem.id.in_(missing)).all()
+        attempts = {problem.id: [] for problem in problems}
+        if problems:
+            for attempt in (
+                db.query(Attempt)
+                .filter(Attempt.problem_id.in_(list(attempts)))
+                .order_by(Attempt.attempted_at.desc())
+            ):
+                attempts[attempt.problem_id].append(attempt_to_response(attempt))
+        for problem in problems:
+            snapshot = problem_to_response(problem)
+            details[problem.id] = {**snapshot, "attempts": attempts[problem.id]}
+            problem_cache.put(problem.id, problem.updated_at, snapshot, attempts[problem.id], generations[problem.id])
+
+    return [details[problem_id] for problem_id, _ in rows if problem_id in details]
+
+
+def warm(db: Session) -> int:
+    """Fill the cache with the problems due soonest. Returns the number loaded."""
+    if not problem_cache.enabled:
+        return 0
+    problems = db.query(Problem).order_by(Problem.next_due_date.asc()).limit(problem_cache.maxsize).all()
+    for problem in problems:
+        problem_cache.put(problem.id, problem.updated_at, problem_to_response(problem))
+    return len(problems)
+
+
+# Write-through invalidation
+_PENDING_KEY = "problem_cache.pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_problems(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Problem):
+            pending.add(obj.id)
+        elif isinstance(obj, Attempt):
+            pending.add(obj.problem_id)
+
+
+def invalidate_on_commit(session: Session, problem_ids: Iterable[int]) -> None:
+    """Invalidate `problem_ids` when `session` commits; for writes that bypass the ORM."""
+    session.info.setdefault(_PENDING_KEY, set()).update(problem_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        problem_cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
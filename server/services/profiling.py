@@ -0,0 +1,331 @@
+"""
+On-demand profiling of single requests.
+
+Off unless LCTRACKER_PROFILING is set; install() then adds the hooks and
+ProfilingMiddleware profiles only requests that ask for it:
+
+    curl -H 'X-Profile: cprofile' http://localhost:8000/api/stats
+    curl 'http://localhost:8000/api/problems?_profile=sample'
+
+With LCTRACKER_PROFILE_TOKEN set the request must also carry it in
+X-Profile-Token (or ?_profile_token=). The response gets an X-Profile-Id
+header; PROFILE_DIR then holds, per id:
+
+- <id>.json: method, path, status, wall and DB time, and every SQL
+  statement with its duration and the thread that ran it;
+- cprofile mode: <id>.prof, a pstats file (python -m pstats, snakeviz)
+  merged from the event loop thread and every worker-thread call the
+  request made (endpoint, sync dependencies, response validation);
+- sample mode: <id>.speedscope.json (https://www.speedscope.app), stacks
+  of the request's worker threads sampled every
+  PROFILE_SAMPLE_INTERVAL_MS.
+
+Request work reaches worker threads through FastAPI's run_in_threadpool;
+install() wraps it so a call made while a profile is active runs under
+that profile. One request is profiled at a time; a trigger that arrives
+while another profile is running is served unprofiled with
+X-Profile-Status: busy. The event-loop profile (cprofile mode) can include
+other requests' async code that ran concurrently.
+
+Untriggered requests pay one header scan and a ContextVar lookup per
+threadpool call and SQL statement.
+"""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+
+logger = logging.getLogger("lctracker.profiling")
+
+MODES = ("cprofile", "sample")
+PROFILE_HEADER = b"x-profile"
+TOKEN_HEADER = b"x-profile-token"
+
+
+class RequestProfile:
+    """Profiler state for one triggered request."""
+
+    def __init__(self, mode: str, method: str, path: str):
+        self.id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.statements: list[dict] = []
+        self.profiles: list[cProfile.Profile] = []
+        self.threads: set[int] = set()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._sampler: Optional[_Sampler] = _Sampler(self) if mode == "sample" else None
+
+    def run_in_thread(self, func):
+        """Wrap a threadpool call so it runs under this profile."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            thread_id = threading.get_ident()
+            with self._lock:
+                self.threads.add(thread_id)
+            profiler = cProfile.Profile() if self.mode == "cprofile" else None
+            try:
+                if profiler is None:
+                    return func(*args, **kwargs)
+                return profiler.runcall(func, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.threads.discard(thread_id)
+                    if profiler is not None:
+                        self.profiles.append(profiler)
+
+        return wrapper
+
+    def record_statement(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.statements.append({
+                "sql": statement,
+                "ms": round(seconds * 1000, 3),
+                "at_ms": round((time.perf_counter() - self.started - seconds) * 1000, 3),
+                "thread": threading.get_ident(),
+            })
+
+    def save(self, directory: str, status: int, elapsed: float) -> None:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.id)
+        if self.mode == "cprofile" and self.profiles:
+            stats = pstats.Stats(self.profiles[0])
+            for profiler in self.profiles[1:]:
+                stats.add(profiler)
+            stats.dump_stats(base + ".prof")
+        elif self._sampler is not None:
+            with open(base + ".speedscope.json", "w") as f:
+                json.dump(self._sampler.speedscope(f"{self.method} {self.path}"), f)
+        summary = {
+            "id": self.id,
+            "mode": self.mode,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "wall_ms": round(elapsed * 1000, 3),
+            "db_ms": round(sum(statement["ms"] for statement in self.statements), 3),
+            "statement_count": len(self.statements),
+            "statements": self.statements,
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(summary, f, indent=2)
+        _rotate(directory, config.PROFILE_KEEP)
+
+
+class _Sampler(threading.Thread):
+    """Samples the stacks of a profile's worker threads at a fixed interval."""
+
+    def __init__(self, profile: RequestProfile):
+        super().__init__(name=f"profile-sampler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.interval = config.PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self.frames: dict[tuple, int] = {}
+        self.samples: dict[int, list] = {}  # thread id -> [(stack, weight_ms)]
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight = (now - last) * 1000
+            last = now
+            with self.profile._lock:
+                threads = list(self.profile.threads)
+            current = sys._current_frames()
+            for thread_id in threads:
+                frame = current.get(thread_id)
+                if frame is not None:
+                    self.samples.setdefault(thread_id, []).append((self._stack(frame), weight))
+
+    def _stack(self, frame) -> list[int]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            stack.append(self.frames.setdefault(key, len(self.frames)))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def speedscope(self, name: str) -> dict:
+        frames = [None] * len(self.frames)
+        for (function, filename, line), index in self.frames.items():
+            frames[index] = {"name": function, "file": filename, "line": line}
+        profiles = []
+        for thread_id, samples in self.samples.items():
+            total = sum(weight for _, weight in samples)
+            profiles.append({
+                "type": "sampled",
+                "name": f"thread {thread_id}",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": [stack for stack, _ in samples],
+                "weights": [weight for _, weight in samples],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "lctracker",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+_active = threading.Lock()
+
+
+def _rotate(directory: str, keep: int) -> None:
+    ids = sorted({name.split(".", 1)[0] for name in os.listdir(directory) if name.endswith(".json")})
+    stale = set(ids[:-keep]) if keep > 0 else set()
+    for name in os.listdir(directory):
+        if name.split(".", 1)[0] in stale:
+            os.remove(os.path.join(directory, name))
+
+
+def _trigger(scope) -> tuple[Optional[str], Optional[str]]:
+    """(mode, token) requested by headers or query string; mode None if not triggered."""
+    mode = token = None
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            mode = value.decode("latin-1").strip().lower()
+        elif name == TOKEN_HEADER:
+            token = value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if mode is None and b"_profile=" in query:
+        params = parse_qs(query.decode("latin-1"))
+        mode = params.get("_profile", [None])[0]
+        token = token or params.get("_profile_token", [None])[0]
+    if mode in ("1", "true", "yes"):
+        mode = MODES[0]
+    return mode, token
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it; everything else passes straight through."""
+
+    def __init__(self, app, directory: str, token: str = ""):
+        self.app = app
+        self.directory = directory
+        self.token = token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode, token = _trigger(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if mode not in MODES or (self.token and token != self.token):
+            await self._reject(send, 400 if mode not in MODES else 403,
+                               f"X-Profile must be one of {', '.join(MODES)}" if mode not in MODES
+                               else "Invalid profile token")
+            return
+        if not _active.acquire(blocking=False):
+            await self.app(scope, receive, _with_headers(send, [(b"x-profile-status", b"busy")]))
+            return
+
+        profile = RequestProfile(mode, scope["method"], scope["path"])
+        status = 500
+        loop_profiler = cProfile.Profile() if mode == "cprofile" else None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token_reset = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            if profile._sampler is not None:
+                profile._sampler.start()
+            if loop_profiler is not None:
+                loop_profiler.enable()
+            await self.app(scope, receive, _with_headers(send_wrapper, [(b"x-profile-id", profile.id.encode())]))
+        finally:
+            if loop_profiler is not None:
+                loop_profiler.disable()
+                profile.profiles.append(loop_profiler)
+            if profile._sampler is not None:
+                profile._sampler.stop()
+            current_profile.reset(token_reset)
+            _active.release()
+            elapsed = time.perf_counter() - start
+            try:
+                profile.save(self.directory, status, elapsed)
+                logger.info("profile %s: %s %s %.1f ms", profile.id, profile.method, profile.path, elapsed * 1000)
+            except OSError:
+                logger.exception("could not save profile %s", profile.id)
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _with_headers(send, headers: list):
+    async def wrapper(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", []), *headers]}
+        await send(message)
+
+    return wrapper
+
+
+def _profiled_threadpool(run_in_threadpool):
+    @functools.wraps(run_in_threadpool)
+    async def wrapper(func, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is not None:
+            func = profile.run_in_thread(func)
+        return await run_in_threadpool(func, *args, **kwargs)
+
+    return wrapper
+
+
+def install(engine: Engine) -> None:
+    """Add the SQL and threadpool hooks. Only called when config.PROFILING is set."""
+    import fastapi.dependencies.utils
+    import fastapi.routing
+
+    # Endpoints, sync dependencies and response validation all go through these
+    for module in (fastapi.routing, fastapi.dependencies.utils):
+        module.run_in_threadpool = _profiled_threadpool(module.run_in_threadpool)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        starts = conn.info.get("profile_start")
+        if profile is not None and starts:
+            profile.record_statement(statement, time.perf_counter() - starts.pop())
@@ -0,0 +1,143 @@
+"""
+Per-endpoint SQL statement budgets, for use from tests.
+
+Every route registered in routers/ must have an entry in QUERY_BUDGETS;
+missing_budgets() lists the ones that don't. assert_query_budget issues a
+request through a TestClient and fails if the endpoint ran more statements
+than its budget allows. tests/test_query_budgets.py runs both for every
+route:
+
+    client = TestClient(app)
+    assert not missing_budgets()
+    assert_query_budget(client, "GET", "/api/problems/{problem_id}", problem_id=1)
+"""
+
+import importlib
+import pkgutil
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+import routers
+
+from database import IS_POSTGRESQL, engine
+from services.metrics import current_request
+
+# Writes on PostgreSQL first take the change-log token lock (services/changes.py)
+_LOG_LOCK = 1 if IS_POSTGRESQL else 0
+
+# (method, route template) -> statements per request with every in-process
+# cache empty, as measured by tests/test_query_budgets.py; only writes that
+# take the change-log lock on PostgreSQL get one more
+QUERY_BUDGETS = {
+    # Lists: id/version select plus one IN query for cache misses
+    ("GET", "/api/problems"): 2,
+    ("GET", "/api/problems/{problem_id}"): 2,
+    # id/version select, problem misses, their attempts with include_attempts
+    ("POST", "/api/problems/batch-get"): 3,
+    # Related index: token check and rebuild, then id/version + misses
+    ("GET", "/api/problems/{problem_id}/related"): 4,
+    ("POST", "/api/problems"): 2 + _LOG_LOCK,
+    ("PUT", "/api/problems/{problem_id}"): 2 + _LOG_LOCK,
+    # Problem select, its DELETE (attempts cascade in the database), change log
+    ("DELETE", "/api/problems/{problem_id}"): 3 + _LOG_LOCK,
+    # One set-based DELETE/UPDATE ... RETURNING, then the change log
+    ("POST", "/api/problems/bulk-delete"): 2 + _LOG_LOCK,
+    ("POST", "/api/problems/bulk-archive"): 2 + _LOG_LOCK,
+    ("POST", "/api/problems/bulk-unarchive"): 2 + _LOG_LOCK,
+    # INSERT ... SELECT, UPDATE and the change log, then the timing sketches:
+    # lock, create and lock again the tag sketches and the problem's, update both
+    ("POST", "/api/problems/{problem_id}/attempt"): 11 + _LOG_LOCK,
+    ("POST", "/api/problems/{problem_id}/postpone"): 4 + _LOG_LOCK,
+    # Due and new id lists, their misses, and with group_related the related
+    # index token check and rebuild
+    ("GET", "/api/today"): 6,
+    # Plan stats version and full load, difficulty timing (version + merge)
+    # for problems with no history, snapshot misses
+    ("GET", "/api/today/plan"): 5,
+    ("GET", "/api/stats"): 6,
+    ("GET", "/api/stats/tags"): 3,
+    # Sketch version check, sketch rows on a miss, the problem's sketch
+    ("GET", "/api/stats/timing"): 3,
+    ("GET", "/api/history"): 2,
+    # BEGIN, then today (4), stats (6) and history (2) inside it
+    ("GET", "/api/dashboard"): 13,
+    ("GET", "/api/jobs/kinds"): 0,
+    ("GET", "/api/jobs"): 1,
+    ("POST", "/api/jobs"): 2,
+    ("GET", "/api/jobs/{job_id}"): 1,
+    ("POST", "/api/jobs/{job_id}/cancel"): 3,
+    # Token check, then the index rebuild: problems and their attempt counts
+    ("GET", "/api/suggest"): 3,
+    # Manifest is a file; the run itself is a job
+    ("GET", "/api/export"): 0,
+    ("POST", "/api/export"): 2,
+    ("GET", "/api/events"): 0,
+    ("GET", "/api/sync"): 4,
+    ("POST", "/api/sync/push"): 7 + _LOG_LOCK,
+}
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_statements():
+    """
+    Count statements executed on the engine inside the block while serving a
+    request (background work such as the job runner is not counted).
+    """
+    counter = StatementCounter()
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_request.get() is not None:
+            counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def missing_budgets() -> list[tuple[str, str]]:
+    """Routes defined in the routers package that have no declared budget."""
+    missing = []
+    for module_info in pkgutil.iter_modules(routers.__path__):
+        module = importlib.import_module(f"routers.{module_info.name}")
+        router = getattr(module, "router", None)
+        if router is None:
+            continue
+        for route in router.routes:
+            for method in sorted(route.methods):
+                if (method, route.path) not in QUERY_BUDGETS:
+                    missing.append((method, route.path))
+    return missing
+
+
+def assert_query_budget(client, method: str, route: str, expected_status: int = None, **kwargs):
+    """
+    Issue a request to `route` (path params filled from kwargs) and assert the
+    statement count is within budget. Remaining kwargs go to client.request.
+    Returns the response.
+    """
+    budget = QUERY_BUDGETS[(method, route)]
+    path_params = {key: kwargs.pop(key) for key in list(kwargs) if "{" + key + "}" in route}
+    path = route.format(**path_params)
+
+    with count_statements() as counter:
+        response = client.request(method, path, **kwargs)
+
+    if expected_status is not None:
+        assert response.status_code == expected_status, response.text
+    assert counter.count <= budget, (
+        f"{method} {route} issued {counter.count} statements (budget {budget}):\n"
+        + "\n".join(counter.statements)
+    )
+    return response
@@ -0,0 +1,110 @@
+"""
+Development-mode N+1 query detector.
+
+When config.DEBUG_QUERIES is set, QueryDebugMiddleware traces every SQL
+statement and ORM lazy load issued while serving a request and logs:
+- identical statements (same SQL and parameters) executed more than once
+- the same SQL text executed N_PLUS_ONE_THRESHOLD or more times
+- relationship lazy loads (e.g. touching problem.attempts)
+
+Each finding is logged once per request with the stack of its first occurrence.
+"""
+
+import logging
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import config
+
+logger = logging.getLogger("lctracker.queries")
+
+# Frames from these packages are noise in the reported stacks
+_IGNORED_FRAMES = ("site-packages", "asyncio", "concurrent", "threading.py", "anyio", "contextlib.py")
+
+
+class QueryTrace:
+    """Statements and lazy loads observed during a single request."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.statements = Counter()
+        self.identical = Counter()
+        self.first_stack = {}
+        self.lazy_loads = []
+
+    def record_statement(self, statement: str, parameters) -> None:
+        self.statements[statement] += 1
+        self.identical[(statement, repr(parameters))] += 1
+        if statement not in self.first_stack:
+            self.first_stack[statement] = _stack()
+
+    def record_lazy_load(self, description: str) -> None:
+        self.lazy_loads.append((description, _stack()))
+
+    def findings(self) -> list[str]:
+        found = []
+        for (statement, _), count in self.identical.items():
+            if count > 1:
+                found.append(f"identical statement x{count}: {statement}\n{self.first_stack[statement]}")
+        for statement, count in self.statements.items():
+            if count >= config.N_PLUS_ONE_THRESHOLD:
+                found.append(f"possible N+1, statement x{count}: {statement}\n{self.first_stack[statement]}")
+        for description, stack in self.lazy_loads:
+            found.append(f"lazy load of {description}\n{stack}")
+        return found
+
+
+current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("current_trace", default=None)
+
+
+def _stack() -> str:
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename != __file__ and not any(part in frame.filename for part in _IGNORED_FRAMES)
+    ]
+    return "".join(traceback.format_list(frames[-8:]))
+
+
+def install(engine: Engine) -> None:
+    """Register the tracing hooks. Only called when config.DEBUG_QUERIES is set."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.record_statement(statement, parameters)
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _do_orm_execute(orm_execute_state):
+        trace = current_trace.get()
+        if trace is not None and orm_execute_state.lazy_loaded_from is not None:
+            state = orm_execute_state.lazy_loaded_from
+            identity = ", ".join(str(value) for value in state.identity)
+            trace.record_lazy_load(f"{state.class_.__name__}({identity})")
+
+
+class QueryDebugMiddleware:
+    """ASGI middleware that reports suspicious query patterns per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = QueryTrace(f"{scope['method']} {scope['path']}")
+        token = current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_trace.reset(token)
+            for finding in trace.findings():
+                logger.warning("%s: %s", trace.path, finding)
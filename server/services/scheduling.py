@@ -1,5 +1,10 @@
 from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import DateTime, bindparam, case, literal, null
+from sqlalchemy.orm import Session
+
 from models import Problem, Outcome
+from services import due_index
 
 # Interval ladder: stage -> days
 INTERVAL_LADDER = {
@@ -12,7 +17,7 @@ INTERVAL_LADDER = {
 }
 
 
-def update_schedule(problem: Problem, outcome: str) -> None:
+def update_schedule(problem: Problem, outcome: str, now: Optional[datetime] = None) -> None:
     """
     Update problem scheduling based on attempt outcome.
 
@@ -22,10 +27,14 @@ def update_schedule(problem: Problem, outcome: str) -> None:
     - FAIL: Reset to stage 0, reset consecutive successes, due tomorrow
     - SKIP: No mastery change, due tomorrow
     - POSTPONE: No mastery change, push due date by 1 day
+
+    Any attempt brings an archived problem back into rotation.
+    `now` defaults to the current time; replayed offline attempts pass their own timestamp.
     """
-    now = datetime.utcnow()
+    now = now or datetime.utcnow()
     problem.last_attempted_at = now
     problem.last_outcome = outcome
+    problem.archived_at = None
 
     if outcome == Outcome.PASS.value:
         # Advance up the ladder
@@ -55,8 +64,91 @@ def update_schedule(problem: Problem, outcome: str) -> None:
         problem.next_due_date = now + timedelta(days=1)
 
     elif outcome == Outcome.POSTPONE.value:
-        # No mastery change, push due date by 1 day
-        problem.next_due_date = problem.next_due_date + timedelta(days=1)
+        # No mastery change, push due date by 1 day (from now if it had none)
+        problem.next_due_date = (problem.next_due_date or now) + timedelta(days=1)
+
+
+def ladder_schedule(problem: Problem) -> Optional[tuple[int, datetime]]:
+    """
+    (interval_days, next_due_date) that update_schedule() left on `problem`
+    after its last attempt, under the current INTERVAL_LADDER. Keep the two
+    in step. None for POSTPONE, whose pushed date can't be derived again,
+    and for problems never attempted.
+    """
+    outcome = problem.last_outcome
+    if problem.last_attempted_at is None or outcome == Outcome.POSTPONE.value:
+        return None
+    if outcome == Outcome.FAIL.value:
+        return 1, problem.last_attempted_at + timedelta(days=1)
+    if outcome == Outcome.SKIP.value:
+        # SKIP leaves the interval alone
+        return problem.interval_days, problem.last_attempted_at + timedelta(days=1)
+    interval = INTERVAL_LADDER[problem.mastery_stage]
+    return interval, problem.last_attempted_at + timedelta(days=interval)
+
+
+def _due_in(days: int):
+    return bindparam(f"due_in_{days}d", type_=DateTime)
+
+
+def schedule_values(outcome: str) -> Optional[dict]:
+    """
+    update_schedule() as UPDATE ... SET values computed from the row's own
+    columns, so one statement applies the transition to whatever state the
+    row is in when it runs. Keep the two in step. The ladder is small, so
+    every stage's new interval is a CASE constant and its due date a bound
+    parameter: execute with schedule_params(now). The expressions only
+    depend on the outcome, so callers can build their statements once.
+
+    Returns None for POSTPONE: its due date moves relative to the stored
+    one, and date arithmetic differs per dialect.
+    """
+    stage = Problem.mastery_stage
+    values = {
+        "last_attempted_at": bindparam("now", type_=DateTime),
+        "last_outcome": literal(outcome),
+        "archived_at": null(),
+    }
+
+    if outcome in (Outcome.PASS.value, Outcome.SHAKY.value):
+        # PASS climbs the ladder, SHAKY drops one stage
+        step = 1 if outcome == Outcome.PASS.value else -1
+        top = max(INTERVAL_LADDER)
+        new_stages = {s: min(max(s + step, 0), top) for s in INTERVAL_LADDER}
+        values["mastery_stage"] = case(new_stages, value=stage, else_=stage)
+        values["consecutive_successes"] = (
+            Problem.consecutive_successes + 1 if outcome == Outcome.PASS.value else literal(0)
+        )
+        values["interval_days"] = case(
+            {s: INTERVAL_LADDER[new] for s, new in new_stages.items()}, value=stage, else_=Problem.interval_days
+        )
+        values["next_due_date"] = case(
+            {s: _due_in(INTERVAL_LADDER[new]) for s, new in new_stages.items()},
+            value=stage,
+            else_=Problem.next_due_date,
+        )
+
+    elif outcome == Outcome.FAIL.value:
+        values.update(
+            mastery_stage=literal(0), consecutive_successes=literal(0), interval_days=literal(1),
+            next_due_date=_due_in(1),
+        )
+
+    elif outcome == Outcome.SKIP.value:
+        values["next_due_date"] = _due_in(1)
+
+    else:
+        return None
+
+    return values
+
+
+def schedule_params(now: datetime) -> dict:
+    """Bound values for schedule_values() expressions."""
+    return {
+        "now": now,
+        **{f"due_in_{days}d": now + timedelta(days=days) for days in {1, *INTERVAL_LADDER.values()}},
+    }
 
 
 def get_mastery_label(stage: int) -> str:
@@ -70,3 +162,22 @@ def get_mastery_label(stage: int) -> str:
         5: "Mastered",
     }
     return labels.get(stage, "Unknown")
+
+
+def due_counts(db: Session, now: Optional[datetime] = None) -> dict:
+    """
+    Queue counters shown on the dashboard:
+    - total_problems: all tracked problems
+    - due_today: next_due_date <= end of today (includes overdue)
+    - overdue: next_due_date < start of today
+    """
+    now = now or datetime.utcnow()
+    start_of_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_of_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+    if due_index.ready(db):
+        return due_index.due_index.counts(start_of_today, end_of_today)
+    return {
+        "total_problems": db.query(Problem).count(),
+        "due_today": db.query(Problem).filter(Problem.next_due_date <= end_of_today).count(),
+        "overdue": db.query(Problem).filter(Problem.next_due_date < start_of_today).count(),
+    }
@@ -0,0 +1,307 @@
+"""
+Typeahead index for /api/suggest: problem titles and tags.
+
+Titles are normalized (lowercased, runs of punctuation and spaces
+collapsed to one space) and kept in two sorted arrays: the whole title,
+and the rest of it from each later word. "Two Sum II" is stored as "two
+sum ii", and as "sum ii" and "ii", so "two s" and "sum" both find it. Tags are
+stored squashed, with every separator removed, so "hash-map", "hash_map"
+and "hashmap" share the key "hashmap". Typing "hashm" then lists them
+side by side, which is exactly where inconsistent tags show up.
+
+A prefix lookup bisects to the first key >= the query and scans while
+the prefix still matches. Matches are ranked by usage: tags by the number
+of problems carrying them, titles by their attempts in the hot attempts
+table. Titles that start with the query come before those matching at a
+later word; the latter are only searched when the former don't fill the
+list, which keeps one-letter queries on large libraries cheap.
+
+When a query has fewer prefix matches than requested, the remaining
+slots go to fuzzy tag matches. These are tags whose character bigrams
+(of the squashed form, padded at both ends) have a Dice similarity of at
+least FUZZY_MIN_SIMILARITY with the query's. A bigram inverted index
+keeps the comparison to tags sharing at least one bigram. "hashmaps" and
+"hahsmap" both suggest "hash-map".
+
+Like the related index, this is per process and follows the change log.
+Each lookup reads the current token and re-indexes only the problems
+changed since the token it last applied. Results are cached per query
+until the index changes.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Attempt, Change, Problem
+from services.changes import current_token
+
+FUZZY_MIN_SIMILARITY = 0.5
+# Above this share of the library changed at once, rebuilding is cheaper than patching
+_REBUILD_FRACTION = 0.25
+_CACHE_SIZE = 1024
+# Key sorting after every key sharing the prefix it is appended to
+_PREFIX_END = "\U0010ffff"
+
+_SEPARATORS = re.compile(r"[\W_]+")
+_INDEXED_COLUMNS = (Problem.id, Problem.title, Problem.difficulty, Problem.tags)
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase words separated by single spaces."""
+    return " ".join(word for word in _SEPARATORS.split((text or "").lower()) if word)
+
+
+def squash(tag: Optional[str]) -> str:
+    """A tag with case and separators removed: "Hash-Map" -> "hashmap"."""
+    return _SEPARATORS.sub("", (tag or "").lower())
+
+
+def bigrams(key: str) -> frozenset:
+    padded = f"^{key}$"
+    return frozenset(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+def dice(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _title_keys(title: str) -> tuple[str, set[str]]:
+    """The normalized title, and the rest of it from each later word."""
+    words = normalize(title).split(" ")
+    return " ".join(words), {" ".join(words[i:]) for i in range(1, len(words))}
+
+
+def _prefix_range(keys: list, prefix: str) -> tuple[int, int]:
+    return bisect.bisect_left(keys, (prefix,)), bisect.bisect_left(keys, (prefix + _PREFIX_END,))
+
+
+class SuggestIndex:
+    """Thread-safe prefix index over problem titles and tags, synced from the change log."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._token: Optional[int] = None
+        self._problems: dict[int, tuple] = {}  # id -> (title, difficulty, tags)
+        self._attempts: dict[int, int] = {}
+        self._rank: dict[int, tuple] = {}  # id -> (-attempts, title), the title sort key
+        self._starts: list[tuple[str, int]] = []  # (normalized title, id), sorted
+        self._rests: list[tuple[str, int]] = []  # (title from its second, third, ... word, id), sorted
+        self._tag_counts: dict[str, int] = {}
+        self._tags: list[tuple[str, str]] = []  # (squashed tag, tag), sorted
+        self._grams: dict[str, set[str]] = {}  # bigram -> tags
+        self._tag_grams: dict[str, frozenset] = {}
+        self._cache: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._problems)
+
+    # Maintenance
+
+    def _add_tag(self, tag: str) -> None:
+        count = self._tag_counts.get(tag, 0)
+        self._tag_counts[tag] = count + 1
+        if count:
+            return
+        key = squash(tag)
+        bisect.insort(self._tags, (key, tag))
+        grams = bigrams(key)
+        self._tag_grams[tag] = grams
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(tag)
+
+    def _drop_tag(self, tag: str) -> None:
+        count = self._tag_counts.get(tag, 0) - 1
+        if count > 0:
+            self._tag_counts[tag] = count
+            return
+        self._tag_counts.pop(tag, None)
+        key = squash(tag)
+        position = bisect.bisect_left(self._tags, (key, tag))
+        if position < len(self._tags) and self._tags[position] == (key, tag):
+            del self._tags[position]
+        for gram in self._tag_grams.pop(tag, ()):
+            tags = self._grams.get(gram)
+            if tags is not None:
+                tags.discard(tag)
+                if not tags:
+                    del self._grams[gram]
+
+    def _remove(self, problem_id: int) -> None:
+        entry = self._problems.pop(problem_id, None)
+        self._attempts.pop(problem_id, None)
+        self._rank.pop(problem_id, None)
+        if entry is None:
+            return
+        title, _, tags = entry
+        start, rests = _title_keys(title)
+        for keys, key in [(self._starts, start)] + [(self._rests, rest) for rest in rests]:
+            position = bisect.bisect_left(keys, (key, problem_id))
+            if position < len(keys) and keys[position] == (key, problem_id):
+                del keys[position]
+        for tag in set(tags):
+            self._drop_tag(tag)
+
+    def _set(self, problem_id: int, title: str, difficulty: str, tags, attempts: int) -> None:
+        tags = list(tags or [])
+        self._problems[problem_id] = (title, difficulty, tags)
+        self._attempts[problem_id] = attempts
+        self._rank[problem_id] = (-attempts, title)
+        for tag in set(tags):
+            self._add_tag(tag)
+
+    def _add(self, rows, attempts: dict) -> None:
+        """(Re)index (id, title, difficulty, tags) rows."""
+        for problem_id, title, difficulty, tags in rows:
+            self._remove(problem_id)
+            self._set(problem_id, title, difficulty, tags, attempts.get(problem_id, 0))
+            start, rests = _title_keys(title)
+            bisect.insort(self._starts, (start, problem_id))
+            for rest in rests:
+                bisect.insort(self._rests, (rest, problem_id))
+
+    def _reset(self) -> None:
+        self._problems.clear()
+        self._attempts.clear()
+        self._rank.clear()
+        self._starts = []
+        self._rests = []
+        self._tag_counts.clear()
+        self._tags = []
+        self._grams.clear()
+        self._tag_grams.clear()
+
+    @staticmethod
+    def _attempt_counts(db: Session, problem_ids=None) -> dict:
+        query = db.query(Attempt.problem_id, func.count(Attempt.id))
+        if problem_ids is not None:
+            query = query.filter(Attempt.problem_id.in_(problem_ids))
+        return dict(query.group_by(Attempt.problem_id).all())
+
+    def _rebuild(self, db: Session, token: int) -> None:
+        self._reset()
+        rows = db.query(*_INDEXED_COLUMNS).all()
+        attempts = self._attempt_counts(db)
+        for problem_id, title, difficulty, tags in rows:
+            self._set(problem_id, title, difficulty, tags, attempts.get(problem_id, 0))
+            start, rests = _title_keys(title)
+            self._starts.append((start, problem_id))
+            self._rests.extend((rest, problem_id) for rest in rests)
+        # One sort each instead of an insort per key
+        self._starts.sort()
+        self._rests.sort()
+        self._token = token
+
+    def sync(self, db: Session) -> None:
+        """Bring the index up to the current change-log token."""
+        token = current_token(db)
+        with self._lock:
+            if self._token == token:
+                return
+            self._cache.clear()
+            if self._token is None:
+                self._rebuild(db, token)
+                return
+            changed = {
+                problem_id
+                for (problem_id,) in db.query(Change.entity_id).filter(
+                    Change.entity == "problem", Change.token > self._token, Change.token <= token
+                ).distinct()
+            }
+            if len(changed) > max(1, len(self._problems)) * _REBUILD_FRACTION:
+                self._rebuild(db, token)
+                return
+            if changed:
+                rows = db.query(*_INDEXED_COLUMNS).filter(Problem.id.in_(changed)).all()
+                self._add(rows, self._attempt_counts(db, changed))
+                # Changed but gone: deleted
+                for problem_id in changed - {row[0] for row in rows}:
+                    self._remove(problem_id)
+            self._token = token
+
+    def clear(self) -> None:
+        with self._lock:
+            self._token = None
+            self._cache.clear()
+            self._reset()
+
+    # Queries
+
+    def _suggest_tags(self, query: str, limit: int) -> list[dict]:
+        key = squash(query)
+        if not key:
+            return []
+        low, high = _prefix_range(self._tags, key)
+        prefixed = heapq.nsmallest(
+            limit, (tag for _, tag in self._tags[low:high]), key=lambda tag: (-self._tag_counts[tag], tag)
+        )
+        results = [
+            {"tag": tag, "count": self._tag_counts[tag], "match": "prefix", "similarity": None} for tag in prefixed
+        ]
+        if len(results) < limit and len(key) >= 2:
+            grams = bigrams(key)
+            candidates = set().union(*(self._grams.get(gram, ()) for gram in grams)) - set(prefixed)
+            scored = []
+            for tag in candidates:
+                similarity = dice(grams, self._tag_grams[tag])
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    scored.append((-similarity, -self._tag_counts[tag], tag))
+            results += [
+                {"tag": tag, "count": -count, "match": "fuzzy", "similarity": round(-similarity, 3)}
+                for similarity, count, tag in heapq.nsmallest(limit - len(results), scored)
+            ]
+        return results
+
+    def _suggest_titles(self, query: str, limit: int) -> list[dict]:
+        key = normalize(query)
+        if not key:
+            return []
+        # Titles starting with the query rank above titles matching at a later
+        # word, which are only looked up when the first kind doesn't fill `limit`
+        low, high = _prefix_range(self._starts, key)
+        ranked = heapq.nsmallest(limit, (problem_id for _, problem_id in self._starts[low:high]),
+                                 key=self._rank.__getitem__)
+        if len(ranked) < limit:
+            low, high = _prefix_range(self._rests, key)
+            later = {problem_id for _, problem_id in self._rests[low:high]}.difference(ranked)
+            ranked += heapq.nsmallest(limit - len(ranked), later, key=self._rank.__getitem__)
+        return [
+            {
+                "id": problem_id,
+                "title": self._problems[problem_id][0],
+                "difficulty": self._problems[problem_id][1],
+                "attempts": self._attempts[problem_id],
+            }
+            for problem_id in ranked
+        ]
+
+    def suggest(self, query: str, limit: int = 10, kind: Optional[str] = None) -> dict:
+        """
+        {"tags": [...], "titles": [...]} for `query`, best first. kind "tag"
+        or "title" leaves the other list empty.
+        """
+        cache_key = (query, limit, kind)
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+            result = {
+                "tags": self._suggest_tags(query, limit) if kind in (None, "tag") else [],
+                "titles": self._suggest_titles(query, limit) if kind in (None, "title") else [],
+            }
+            self._cache[cache_key] = result
+            if len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return result
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,196 @@
+"""
+Tag analytics for /api/stats/tags, computed with NumPy.
+
+Problems and their tags become a problem x tag incidence matrix X (built
+from index arrays, stored dense as float32: 10k problems x 200 tags is
+8 MB). Attempts in the window are counted per problem in SQL and become
+count vectors n (all graded attempts) and f (FAIL or SHAKY). Everything
+else is a matrix product:
+
+    co-occurrence       X.T @ X
+    mastery histograms  X.T @ onehot(mastery_stage)
+    per-tag attempts    X.T @ n, X.T @ f
+    pair attempts       (X * n).T @ X, (X * f).T @ X
+
+Results are cached per (change-log token, UTC day, parameters). The token
+moves on every problem or attempt write. The window is whole days and at
+most ARCHIVE_AFTER_DAYS, so archival never changes a cached answer.
+"""
+
+import importlib.util
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from models import Attempt, Problem
+from services.changes import current_token
+
+GRADED_OUTCOMES = ("PASS", "SHAKY", "FAIL")
+FAILED_OUTCOMES = ("SHAKY", "FAIL")
+MASTERY_STAGES = 6
+# Two-sided 95% normal quantile for Wilson intervals
+Z_95 = 1.959963984540054
+
+_CACHE_SIZE = 16
+_cache: OrderedDict = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def available() -> bool:
+    """Whether numpy is installed; it is imported on first use, not with the app."""
+    return importlib.util.find_spec("numpy") is not None
+
+
+def wilson_interval(successes, totals, z: float = Z_95):
+    """Vectorized Wilson score interval; (nan, nan) where totals is 0."""
+    import numpy as np
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = successes / totals
+        denominator = 1 + z * z / totals
+        center = (p + z * z / (2 * totals)) / denominator
+        margin = z * np.sqrt(p * (1 - p) / totals + z * z / (4 * totals * totals)) / denominator
+    return center - margin, center + margin
+
+
+def _round(value, digits: int = 4):
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+
+def compute(problems: list, attempt_counts: list, min_pair_attempts: int, limit: int) -> dict:
+    """
+    problems: (id, tags, mastery_stage) rows sorted by id. attempt_counts:
+    (problem_id, graded_attempts, failed_attempts) rows for the window.
+    """
+    import numpy as np
+
+    tags = sorted({tag for _, problem_tags, _ in problems for tag in problem_tags})
+    tag_index = {tag: i for i, tag in enumerate(tags)}
+    n_problems, n_tags = len(problems), len(tags)
+
+    rows = [i for i, (_, problem_tags, _) in enumerate(problems) for _ in problem_tags]
+    cols = [tag_index[tag] for _, problem_tags, _ in problems for tag in problem_tags]
+    X = np.zeros((n_problems, n_tags), dtype=np.float32)
+    X[rows, cols] = 1
+
+    stages = np.clip(np.fromiter((stage or 0 for _, _, stage in problems), dtype=np.int64, count=n_problems),
+                     0, MASTERY_STAGES - 1)
+    stage_onehot = np.zeros((n_problems, MASTERY_STAGES), dtype=np.float32)
+    stage_onehot[np.arange(n_problems), stages] = 1
+
+    # Attempt counts arrive aggregated per problem; problems are sorted by id
+    problem_ids = np.fromiter((problem_id for problem_id, _, _ in problems), dtype=np.int64, count=n_problems)
+    counts = np.array(attempt_counts, dtype=np.int64).reshape(-1, 3)
+    positions = np.searchsorted(problem_ids, counts[:, 0])
+    known = positions < n_problems
+    known[known] = problem_ids[positions[known]] == counts[known, 0]
+    n = np.zeros(n_problems, dtype=np.float32)
+    f = np.zeros(n_problems, dtype=np.float32)
+    n[positions[known]] = counts[known, 1]
+    f[positions[known]] = counts[known, 2]
+
+    co_occurrence = X.T @ X
+    mastery = X.T @ stage_onehot
+    tag_attempts = X.T @ n
+    tag_failures = X.T @ f
+    tag_passes = tag_attempts - tag_failures
+    pass_low, pass_high = wilson_interval(tag_passes, tag_attempts)
+    pair_attempts = (X * n[:, None]).T @ X
+    pair_failures = (X * f[:, None]).T @ X
+
+    total_attempts = float(n.sum())
+    baseline = float(f.sum()) / total_attempts if total_attempts else 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tag_fail_rate = tag_failures / tag_attempts
+        pair_fail_rate = pair_failures / pair_attempts
+
+    upper = np.triu(np.ones((n_tags, n_tags), dtype=bool), k=1)
+
+    # Most frequent tag pairs, with Jaccard similarity of their problem sets
+    problem_counts = np.diag(co_occurrence)
+    pair_i, pair_j = np.nonzero(upper & (co_occurrence > 0))
+    shared = co_occurrence[pair_i, pair_j]
+    order = np.argsort(-shared, kind="stable")[:limit]
+    co_pairs = [
+        {
+            "tags": [tags[pair_i[k]], tags[pair_j[k]]],
+            "problems": int(shared[k]),
+            "jaccard": _round(shared[k] / (problem_counts[pair_i[k]] + problem_counts[pair_j[k]] - shared[k])),
+        }
+        for k in order
+    ]
+
+    # Pairs whose combined fail rate is highest relative to the overall rate
+    pair_i, pair_j = np.nonzero(upper & (pair_attempts >= min_pair_attempts))
+    rates = pair_fail_rate[pair_i, pair_j]
+    lift = rates / baseline if baseline else np.zeros_like(rates)
+    order = np.argsort(-lift, kind="stable")[:limit]
+    lift_pairs = [
+        {
+            "tags": [tags[pair_i[k]], tags[pair_j[k]]],
+            "attempts": int(pair_attempts[pair_i[k], pair_j[k]]),
+            "fail_rate": _round(rates[k]),
+            "lift": _round(lift[k]),
+            # Positive when the pair fails more than either tag does on its own
+            "excess_fail_rate": _round(rates[k] - max(tag_fail_rate[pair_i[k]], tag_fail_rate[pair_j[k]])),
+        }
+        for k in order
+    ]
+
+    return {
+        "problems": n_problems,
+        "attempts": int(total_attempts),
+        "baseline_fail_rate": _round(baseline),
+        "tags": [
+            {
+                "tag": tag,
+                "problems": int(problem_counts[i]),
+                "attempts": int(tag_attempts[i]),
+                "pass_rate": _round(tag_passes[i] / tag_attempts[i]) if tag_attempts[i] else None,
+                "pass_rate_ci": [_round(pass_low[i]), _round(pass_high[i])] if tag_attempts[i] else None,
+                "mastery_histogram": [int(count) for count in mastery[i]],
+            }
+            for i, tag in enumerate(tags)
+        ],
+        "co_occurrence": co_pairs,
+        "pair_lift": lift_pairs,
+    }
+
+
+def tag_stats(db: Session, days: int, min_pair_attempts: int, limit: int) -> dict:
+    """Tag analytics over the last `days` whole UTC days, cached by data version."""
+    token = current_token(db)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    key = (token, today, days, min_pair_attempts, limit)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    problems = db.query(Problem.id, Problem.tags, Problem.mastery_stage).order_by(Problem.id).all()
+    attempt_counts = (
+        db.query(
+            Attempt.problem_id,
+            func.count(Attempt.id),
+            func.sum(case((Attempt.outcome.in_(FAILED_OUTCOMES), 1), else_=0)),
+        )
+        .filter(Attempt.attempted_at >= today - timedelta(days=days), Attempt.outcome.in_(GRADED_OUTCOMES))
+        .group_by(Attempt.problem_id)
+        .all()
+    )
+    result = {
+        "data_version": token,
+        "window_days": days,
+        **compute(problems, attempt_counts, min_pair_attempts, limit),
+    }
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,152 @@
+"""
+Merging t-digest (Dunning & Ertl) for streaming quantiles.
+
+A digest is a sorted list of centroids (mean, weight) whose sizes follow
+the k1 scale function k(q) = compression / (2 pi) * asin(2q - 1): centroids
+are small near q = 0 and q = 1 and large in the middle, so tail quantiles
+(p90, p99) stay accurate with ~compression centroids in total. Digests
+merge by pooling centroids and compressing again, so per-month or per-tag
+digests can be combined at query time.
+
+The binary form is a version byte, count, min and max followed by one
+(float32 mean, uint32 weight) pair per centroid: at most a few hundred
+bytes at the default compression. Weights are whole numbers of samples.
+"""
+
+import math
+import struct
+from typing import Iterable, Optional
+
+DEFAULT_COMPRESSION = 100
+
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<BIdd")
+_CENTROID = struct.Struct("<fI")
+
+
+class TDigest:
+    __slots__ = ("compression", "centroids", "count", "min", "max", "_buffer")
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.centroids: list[tuple] = []  # (mean, weight), sorted by mean
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: list[tuple] = []
+
+    def add(self, value: float, weight: int = 1) -> None:
+        self._buffer.append((float(value), weight))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) > 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Fold `other` into this digest; returns self."""
+        if other.count:
+            other._compress()
+            self._buffer.extend(other.centroids)
+            self.count += other.count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            if len(self._buffer) > 5 * self.compression:
+                self._compress()
+        return self
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k: float) -> float:
+        return (math.sin(min(max(k * 2 * math.pi / self.compression, -math.pi / 2), math.pi / 2)) + 1) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = self.centroids + self._buffer
+        points.sort()
+        self._buffer = []
+        total = self.count
+        merged = []
+        current_mean, current_weight = points[0]
+        q0 = 0.0
+        q_limit = self._k_inverse(self._k(q0) + 1)
+        for mean, weight in points[1:]:
+            if q0 + (current_weight + weight) / total <= q_limit:
+                # Weighted running mean keeps the centroid's centre of mass
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                merged.append((current_mean, current_weight))
+                q0 += current_weight / total
+                q_limit = self._k_inverse(self._k(q0) + 1)
+                current_mean, current_weight = mean, weight
+        merged.append((current_mean, current_weight))
+        self.centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q in [0, 1]; None when empty."""
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1 or q <= 0:
+            return self.min if q <= 0 else self.centroids[0][0]
+        if q >= 1:
+            return self.max
+
+        target = q * self.count
+        # Each centroid's weight is centred on its mean; interpolate between
+        # neighbouring centres, and against min/max beyond the outer halves
+        first_mean, first_weight = self.centroids[0]
+        if target < first_weight / 2:
+            return self.min + (first_mean - self.min) * target / (first_weight / 2)
+        cumulative = first_weight / 2
+        for (left_mean, left_weight), (right_mean, right_weight) in zip(self.centroids, self.centroids[1:]):
+            step = (left_weight + right_weight) / 2
+            if target < cumulative + step:
+                # Singleton centroids are exact samples; don't smear between them
+                if left_weight == 1 and target - cumulative < 0.5:
+                    return left_mean
+                if right_weight == 1 and cumulative + step - target <= 0.5:
+                    return right_mean
+                return left_mean + (right_mean - left_mean) * (target - cumulative) / step
+            cumulative += step
+        last_mean, last_weight = self.centroids[-1]
+        remaining = self.count - cumulative
+        return last_mean + (self.max - last_mean) * min(1.0, (target - cumulative) / remaining) if remaining else last_mean
+
+    def to_bytes(self) -> bytes:
+        self._compress()
+        header = _HEADER.pack(_FORMAT_VERSION, self.count, self.min, self.max)
+        return header + b"".join(_CENTROID.pack(mean, int(weight)) for mean, weight in self.centroids)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, compression: float = DEFAULT_COMPRESSION) -> "TDigest":
+        digest = cls(compression)
+        version, digest.count, digest.min, digest.max = _HEADER.unpack_from(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unknown t-digest format version {version}")
+        digest.centroids = list(_CENTROID.iter_unpack(data[_HEADER.size:]))
+        return digest
+
+    @classmethod
+    def of(cls, values: Iterable[float], compression: float = DEFAULT_COMPRESSION) -> "TDigest":
+        digest = cls(compression)
+        for value in values:
+            digest.add(value)
+        return digest
+
+
+def merge_all(digests: Iterable[TDigest], compression: float = DEFAULT_COMPRESSION) -> TDigest:
+    """Pool the centroids of every digest and compress once."""
+    result = TDigest(compression)
+    for digest in digests:
+        if digest.count:
+            digest._compress()
+            result._buffer.extend(digest.centroids)
+            result.count += digest.count
+            result.min = min(result.min, digest.min)
+            result.max = max(result.max, digest.max)
+    result._compress()
+    return result
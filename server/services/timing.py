@@ -0,0 +1,260 @@
+"""
+Time-spent percentiles from t-digest sketches.
+
+Every graded attempt with time_spent_minutes is added, inside the attempt's
+transaction, to:
+
+- the (difficulty, tag, month) sketch of each of the problem's tags,
+- the (difficulty, "", month) sketch, which counts every attempt once
+  whatever its tags,
+- the problem's all-time sketch, with its median stored next to it for
+  the session planner (services/planner.py).
+
+/api/stats/timing merges the stored sketches instead of reading attempts,
+so its cost depends on the number of sketches (difficulties x tags x
+months), not on attempt history, and archived attempts stay counted.
+Merged results are cached until the next sketch write.
+Sketches record the problem's difficulty and tags at attempt time; after
+retagging problems, run the rebuild_timing_sketches job (or
+`python -m services.timing`) to recompute everything from attempts_all.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Problem, ProblemTimingSketch, TimingSketch
+from services.jobs import JobContext, job_handler
+from services.tdigest import TDigest, merge_all
+
+ALL_TAGS = ""
+TIMED_OUTCOMES = ("PASS", "SHAKY", "FAIL")
+QUANTILES = {"p50": 0.5, "p90": 0.9}
+
+_CACHE_SIZE = 16
+_cache: OrderedDict = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _month(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+
+def months_back(months: int, now: Optional[datetime] = None) -> str:
+    """YYYY-MM of the first month in a window of `months` ending with the current one."""
+    now = now or datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _sketch_tags(tags) -> list[str]:
+    return [ALL_TAGS, *dict.fromkeys(tag for tag in tags or [] if tag)]
+
+
+# Sketch rows loaded in the current transaction. Sessions don't autoflush,
+# so a second attempt in the same transaction (group commit, sync push) must
+# find the first one's modified rows here, not by querying.
+_SESSION_KEY = "timing.sketches"
+_EMPTY = TDigest().to_bytes()
+
+
+def _create_missing(db: Session, model, rows: list[dict]) -> None:
+    """
+    INSERT ... ON CONFLICT DO NOTHING, so two transactions adding the first
+    attempt of a month both end up updating the one row instead of one
+    failing on the primary key.
+    """
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(dialect_insert(model).values(rows).on_conflict_do_nothing())
+
+
+def record_time(db: Session, problem: Problem, outcome: str, minutes: Optional[int], attempted_at: datetime) -> None:
+    """Add one attempt's time to its sketches. Caller commits."""
+    # Negative minutes predate input validation; keep them out of the percentiles
+    if minutes is None or minutes < 0 or outcome not in TIMED_OUTCOMES:
+        return
+    month = _month(attempted_at)
+    loaded = db.info.setdefault(_SESSION_KEY, {})
+    keys = [(problem.difficulty, tag, month) for tag in _sketch_tags(problem.tags)]
+
+    missing = [key for key in keys if key not in loaded]
+    if missing or problem.id not in loaded:
+        # Sketches are read-modify-write. Flushing the attempt first starts
+        # the write transaction, which on SQLite holds the write lock from
+        # here to commit; on PostgreSQL the row locks below do the same.
+        # Either way a concurrent attempt can't read a sketch this one is
+        # about to overwrite.
+        db.flush()
+    if missing:
+        def lock_sketches():
+            return db.query(TimingSketch).filter(
+                TimingSketch.difficulty == problem.difficulty,
+                TimingSketch.month == month,
+                TimingSketch.tag.in_([tag for _, tag, _ in missing]),
+            ).with_for_update().all()
+
+        sketches = lock_sketches()
+        if len(sketches) < len(missing):
+            _create_missing(db, TimingSketch, [
+                {"difficulty": difficulty, "tag": tag, "month": month, "count": 0, "digest": _EMPTY}
+                for difficulty, tag, month in missing
+            ])
+            sketches = lock_sketches()
+        for sketch in sketches:
+            loaded[(sketch.difficulty, sketch.tag, sketch.month)] = sketch
+    if problem.id not in loaded:
+        sketch = db.get(ProblemTimingSketch, problem.id, with_for_update=True)
+        if sketch is None:
+            _create_missing(db, ProblemTimingSketch, [{"problem_id": problem.id, "count": 0, "digest": _EMPTY}])
+            sketch = db.get(ProblemTimingSketch, problem.id, with_for_update=True, populate_existing=True)
+        loaded[problem.id] = sketch
+
+    for key in (*keys, problem.id):
+        sketch = loaded[key]
+        digest = TDigest.from_bytes(sketch.digest)
+        digest.add(minutes)
+        sketch.digest = digest.to_bytes()
+        sketch.count = digest.count
+        if key == problem.id:
+            sketch.median_minutes = digest.quantile(0.5)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_loaded_sketches(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def _summary(digest: TDigest) -> dict:
+    summary = {"count": digest.count}
+    for name, q in QUANTILES.items():
+        value = digest.quantile(q)
+        summary[name] = round(value, 1) if value is not None else None
+    return summary
+
+
+def timing_stats(db: Session, months: int, difficulty: Optional[str] = None, tag: Optional[str] = None,
+                 problem_id: Optional[int] = None) -> dict:
+    """
+    p50/p90 minutes over the last `months` calendar months, merged from
+    sketches: overall, per difficulty, per tag and per month (trend). The
+    difficulty and tag filters narrow every breakdown they apply to.
+    """
+    start_month = months_back(months)
+    # Every sketch write (attempt or rebuild) moves max(updated_at)
+    version = tuple(db.query(func.max(TimingSketch.updated_at), func.count()).select_from(TimingSketch).one())
+    key = (version, start_month, difficulty, tag)
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+    if result is None:
+        result = _merge_sketches(db, start_month, difficulty, tag)
+        with _cache_lock:
+            _cache[key] = result
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    problem = None
+    if problem_id is not None:
+        sketch = db.get(ProblemTimingSketch, problem_id)
+        problem = {"problem_id": problem_id, **_summary(TDigest.from_bytes(sketch.digest) if sketch else TDigest())}
+    return {"months": months, **result, "problem": problem}
+
+
+def _merge_sketches(db: Session, start_month: str, difficulty: Optional[str], tag: Optional[str]) -> dict:
+    query = db.query(TimingSketch.difficulty, TimingSketch.tag, TimingSketch.month, TimingSketch.digest).filter(
+        TimingSketch.month >= start_month
+    )
+    if difficulty:
+        query = query.filter(TimingSketch.difficulty == difficulty)
+
+    by_difficulty = defaultdict(list)
+    by_tag = defaultdict(list)
+    by_month = defaultdict(list)
+    scope_tag = tag or ALL_TAGS
+    for row_difficulty, row_tag, month, data in query:
+        digest = TDigest.from_bytes(data)
+        if row_tag == scope_tag:
+            by_difficulty[row_difficulty].append(digest)
+            by_month[month].append(digest)
+        if row_tag != ALL_TAGS and (tag is None or row_tag == tag):
+            by_tag[row_tag].append(digest)
+
+    by_difficulty = {key: merge_all(digests) for key, digests in by_difficulty.items()}
+    by_tag = {key: merge_all(digests) for key, digests in by_tag.items()}
+    by_month = {key: merge_all(digests) for key, digests in by_month.items()}
+
+    return {
+        "overall": _summary(merge_all(by_month.values())),
+        "by_difficulty": [
+            {"difficulty": key, **_summary(digest)} for key, digest in sorted(by_difficulty.items())
+        ],
+        "by_tag": sorted(
+            ({"tag": key, **_summary(digest)} for key, digest in by_tag.items()),
+            key=lambda row: (-row["count"], row["tag"]),
+        ),
+        "trend": [{"month": key, **_summary(digest)} for key, digest in sorted(by_month.items())],
+    }
+
+
+def rebuild(conn: Connection) -> dict:
+    """Recompute every sketch from attempts_all. Runs in the caller's transaction."""
+    from services.archive import ATTEMPTS_ALL
+
+    groups = defaultdict(TDigest)
+    problems = defaultdict(TDigest)
+    rows = conn.execute(
+        select(ATTEMPTS_ALL.c.time_spent_minutes, ATTEMPTS_ALL.c.attempted_at, Problem.id, Problem.difficulty,
+               Problem.tags)
+        .join(Problem, Problem.id == ATTEMPTS_ALL.c.problem_id)
+        .where(ATTEMPTS_ALL.c.time_spent_minutes >= 0, ATTEMPTS_ALL.c.outcome.in_(TIMED_OUTCOMES))
+    )
+    attempts = 0
+    for minutes, attempted_at, problem_id, difficulty, tags in rows:
+        month = _month(attempted_at)
+        for tag in _sketch_tags(tags):
+            groups[(difficulty, tag, month)].add(minutes)
+        problems[problem_id].add(minutes)
+        attempts += 1
+
+    conn.execute(delete(TimingSketch))
+    conn.execute(delete(ProblemTimingSketch))
+    if groups:
+        conn.execute(insert(TimingSketch), [
+            {"difficulty": difficulty, "tag": tag, "month": month, "count": digest.count, "digest": digest.to_bytes()}
+            for (difficulty, tag, month), digest in groups.items()
+        ])
+    if problems:
+        conn.execute(insert(ProblemTimingSketch), [
+            {"problem_id": problem_id, "count": digest.count, "digest": digest.to_bytes(),
+             "median_minutes": digest.quantile(0.5)}
+            for problem_id, digest in problems.items()
+        ])
+    return {"attempts": attempts, "sketches": len(groups), "problem_sketches": len(problems)}
+
+
+@job_handler("rebuild_timing_sketches")
+def rebuild_timing_sketches(ctx: JobContext) -> dict:
+    """
+    Recompute all time-spent sketches from attempts_all in one transaction,
+    e.g. after retagging problems or changing difficulties.
+    """
+    with SessionLocal() as db:
+        result = rebuild(db.connection())
+        db.commit()
+    return result
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        result = rebuild(db.connection())
+        db.commit()
+    print(f"Rebuilt timing sketches: {result}")
@@ -0,0 +1,51 @@
+"""
+Shared fixtures. The engine is bound when `database` is first imported, so
+the scratch database is chosen here, before any app module loads. Set
+LCTRACKER_DATABASE_URL to run the suite against another database (for
+PostgreSQL, an empty one); tests/test_backends.py does that per backend.
+
+Run from the server directory:
+
+    python -m pytest
+"""
+
+import os
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+_workdir = tempfile.mkdtemp(prefix="lctracker-tests-")
+os.environ.setdefault("LCTRACKER_DATABASE_URL", f"sqlite:///{os.path.join(_workdir, 'test.db')}")
+# Tests drive jobs explicitly; a background runner would race them
+os.environ["LCTRACKER_JOBS_ENABLED"] = "0"
+for _name in ("EXPORT_DIR", "BACKUP_DIR", "PROFILE_DIR"):
+    os.environ[f"LCTRACKER_{_name}"] = os.path.join(_workdir, _name.split("_")[0].lower())
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient over the seeded scratch database, shared by the session."""
+    from fastapi.testclient import TestClient
+
+    import seed
+    from main import app
+
+    seed.seed_database()
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def make_problem(client):
+    """Create a problem through the API; returns its JSON."""
+
+    def make(title: str = "Test Problem", difficulty: str = "EASY", **fields) -> dict:
+        response = client.post("/api/problems", json={"title": title, "difficulty": difficulty, **fields})
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return make
@@ -0,0 +1,126 @@
+"""
+apply_attempt (INSERT ... SELECT plus UPDATE ... RETURNING) against the ORM
+read-modify-write path, and under concurrent writers: every problem's
+attempts must form an unbroken stage chain and its version must count
+every write, so no update is lost.
+"""
+
+import random
+import threading
+
+import pytest
+
+from database import SessionLocal
+from models import Attempt, Problem
+from services.attempts import VersionConflict, apply_attempt, record_attempt
+from services.scheduling import INTERVAL_LADDER
+
+OUTCOMES = ["PASS", "SHAKY", "FAIL", "SKIP", "POSTPONE"]
+SCHEDULE_COLUMNS = ("mastery_stage", "consecutive_successes", "interval_days", "last_outcome")
+
+
+def _problems(count: int, stage: int = 0) -> list[int]:
+    with SessionLocal() as db:
+        problems = [Problem(title="Attempt Writes", difficulty="MEDIUM", mastery_stage=stage) for _ in range(count)]
+        db.add_all(problems)
+        db.commit()
+        return [p.id for p in problems]
+
+
+def _log(problem_id: int, outcome: str, expected_version=None) -> None:
+    with SessionLocal() as db:
+        apply_attempt(db, problem_id, outcome, expected_version=expected_version)
+        db.commit()
+
+
+@pytest.mark.parametrize("stage", list(INTERVAL_LADDER))
+@pytest.mark.parametrize("outcome", OUTCOMES)
+def test_matches_orm_path(client, stage, outcome):
+    orm_id, atomic_id = _problems(2, stage)
+    with SessionLocal() as db:
+        record_attempt(db, db.get(Problem, orm_id), outcome)
+        db.commit()
+    _log(atomic_id, outcome)
+
+    with SessionLocal() as db:
+        orm, atomic = db.get(Problem, orm_id), db.get(Problem, atomic_id)
+        for column in SCHEDULE_COLUMNS:
+            assert getattr(orm, column) == getattr(atomic, column), column
+        if outcome != "POSTPONE":
+            # Due dates are relative to each write's own clock
+            drift = (orm.next_due_date - orm.last_attempted_at) - (atomic.next_due_date - atomic.last_attempted_at)
+            assert abs(drift.total_seconds()) < 1
+        assert atomic.version == 2
+        orm_attempt, atomic_attempt = (
+            db.query(Attempt).filter(Attempt.problem_id == problem_id).one() for problem_id in (orm_id, atomic_id)
+        )
+        for column in ("stage_before", "stage_after", "outcome"):
+            assert getattr(orm_attempt, column) == getattr(atomic_attempt, column), column
+        assert atomic_attempt.next_due_date_after == atomic.next_due_date
+
+
+def _run_threads(count: int, target) -> list:
+    errors = []
+
+    def run(seed):
+        try:
+            target(seed)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_attempts_lose_no_updates(client):
+    ids = _problems(2)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(15):
+            _log(rng.choice(ids), rng.choice(OUTCOMES))
+
+    assert _run_threads(6, worker) == []
+
+    with SessionLocal() as db:
+        total = 0
+        for problem in db.query(Problem).filter(Problem.id.in_(ids)):
+            chain = db.query(Attempt).filter(Attempt.problem_id == problem.id).order_by(Attempt.id).all()
+            total += len(chain)
+            for before, after in zip(chain, chain[1:]):
+                assert after.stage_before == before.stage_after
+            assert chain[-1].stage_after == problem.mastery_stage
+            assert problem.version == 1 + len(chain)
+        assert total == 6 * 15
+
+
+def test_concurrent_writers_on_one_version_conflict(client):
+    (problem_id,) = _problems(1)
+    outcomes = []
+
+    def worker(seed):
+        try:
+            _log(problem_id, "PASS", expected_version=1)
+        except VersionConflict:
+            outcomes.append("conflict")
+        else:
+            outcomes.append("applied")
+
+    assert _run_threads(6, worker) == []
+    assert sorted(outcomes) == ["applied"] + ["conflict"] * 5
+    with SessionLocal() as db:
+        assert db.get(Problem, problem_id).version == 2
+        assert db.query(Attempt).filter(Attempt.problem_id == problem_id).count() == 1
+
+
+def test_stale_expected_version_returns_409(client, make_problem):
+    problem = make_problem("Version Conflict")
+    url = f"/api/problems/{problem['id']}/attempt"
+    assert client.post(url, json={"outcome": "PASS", "expected_version": problem["version"]}).status_code == 200
+    response = client.post(url, json={"outcome": "PASS", "expected_version": problem["version"]})
+    assert response.status_code == 409
+    assert client.post(url, json={"outcome": "SKIP", "expected_version": problem["version"] + 1}).status_code == 200
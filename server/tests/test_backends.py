@@ -0,0 +1,127 @@
+"""
+Backend matrix: the rest of the suite against each supported database.
+
+The engine is bound when the app is imported, so the suite runs in-process
+on one database (LCTRACKER_DATABASE_URL, a scratch SQLite file by default)
+and here once more in a subprocess per other backend. PostgreSQL needs a
+driver (pip install "psycopg[binary]") and either
+
+    LCTRACKER_TEST_POSTGRES_URL=postgresql+psycopg://me@localhost/postgres
+
+naming a role allowed to CREATE DATABASE (a uniquely named database is
+created for the run and dropped afterwards), or initdb and pg_ctl on PATH
+for a throwaway cluster. Without either it is skipped, unless
+LCTRACKER_TEST_REQUIRE_POSTGRES=1 makes that a failure; CI
+(.github/workflows/tests.yml) sets it, so the PostgreSQL-only SQL (JSONB
+and GIN DDL, the change-log advisory lock, INSERT ... SELECT ... FOR
+UPDATE ... RETURNING) runs against a real server before merge. Locally,
+with a container:
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=pg postgres:16
+    LCTRACKER_TEST_POSTGRES_URL=postgresql+psycopg://postgres:pg@localhost/postgres \
+        LCTRACKER_TEST_REQUIRE_POSTGRES=1 python -m pytest
+"""
+
+import importlib.util
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Set in the subprocess so it doesn't start a matrix of its own
+CHILD_FLAG = "LCTRACKER_TEST_BACKEND_CHILD"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def pg_ctl_cluster():
+    """Start a throwaway PostgreSQL cluster with initdb/pg_ctl; yields its admin URL."""
+    datadir = tempfile.mkdtemp(prefix="lctracker-pg-")
+    port = _free_port()
+    subprocess.run(
+        ["initdb", "-D", datadir, "-U", "postgres", "-A", "trust", "-E", "UTF8", "--locale=C"],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    subprocess.run(
+        ["pg_ctl", "-D", datadir, "-o", f"-p {port} -k {datadir}", "-w", "start"],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    try:
+        yield f"postgresql+psycopg://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run(["pg_ctl", "-D", datadir, "-m", "fast", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(datadir, ignore_errors=True)
+
+
+@contextmanager
+def scratch_postgres(admin_url: str):
+    """Create a uniquely named database next to `admin_url`, drop it afterwards."""
+    name = f"lctracker_test_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(admin_url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    try:
+        yield make_url(admin_url).set(database=name).render_as_string(hide_password=False)
+    finally:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+
+def _unavailable(reason: str):
+    if os.environ.get("LCTRACKER_TEST_REQUIRE_POSTGRES") == "1":
+        pytest.fail(f"PostgreSQL is required: {reason}")
+    pytest.skip(reason)
+
+
+@contextmanager
+def _postgres():
+    if importlib.util.find_spec("psycopg") is None:
+        _unavailable("psycopg is not installed")
+    admin_url = os.environ.get("LCTRACKER_TEST_POSTGRES_URL")
+    if admin_url:
+        with scratch_postgres(admin_url) as url:
+            yield url
+    elif shutil.which("initdb") and shutil.which("pg_ctl"):
+        with pg_ctl_cluster() as admin_url, scratch_postgres(admin_url) as url:
+            yield url
+    else:
+        _unavailable("set LCTRACKER_TEST_POSTGRES_URL or put initdb/pg_ctl on PATH")
+
+
+@contextmanager
+def _sqlite():
+    with tempfile.TemporaryDirectory() as workdir:
+        yield f"sqlite:///{os.path.join(workdir, 'test.db')}"
+
+
+BACKENDS = {"sqlite": _sqlite, "postgresql": _postgres}
+
+
+@pytest.mark.skipif(os.environ.get(CHILD_FLAG) == "1", reason="running inside the backend matrix")
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_suite_passes_on(backend):
+    if make_url(os.environ["LCTRACKER_DATABASE_URL"]).get_backend_name() == backend:
+        pytest.skip(f"this session already runs the suite on {backend}")
+    with BACKENDS[backend]() as database_url:
+        result = subprocess.run(
+            [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "tests"],
+            cwd=SERVER_DIR,
+            env={**os.environ, "LCTRACKER_DATABASE_URL": database_url, CHILD_FLAG: "1"},
+            capture_output=True, text=True,
+        )
+    assert result.returncode == 0, f"{backend}:\n{result.stdout[-4000:]}{result.stderr[-2000:]}"
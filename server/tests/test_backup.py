@@ -0,0 +1,47 @@
+import os
+import threading
+
+import pytest
+from sqlalchemy.engine import make_url
+
+import config
+from services import backup
+
+pytestmark = pytest.mark.skipif(
+    make_url(config.DATABASE_URL).get_backend_name() != "sqlite", reason="snapshots are SQLite-only"
+)
+
+
+def _together(target, count: int) -> list:
+    results, errors = [], []
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    return results
+
+
+def test_schedulers_firing_together_take_one_snapshot(client, tmp_path):
+    directory = str(tmp_path)
+    results = _together(lambda: backup.snapshot_if_due(directory, 3600), 4)
+    assert sum(result is not None for result in results) == 1
+    assert len(backup.list_snapshots(directory)) == 1
+
+
+def test_concurrent_snapshots_in_one_second_do_not_collide(client, tmp_path):
+    directory = str(tmp_path)
+    results = _together(lambda: backup.snapshot(directory), 3)
+    assert len(results) == 3
+    assert not [name for name in os.listdir(directory) if name.endswith(".partial")]
+    assert all(backup.verify(path) == "ok" for path in backup.list_snapshots(directory))
@@ -0,0 +1,45 @@
+"""
+Change-log tokens must become visible in token order, or a reader that
+takes max(token) as its cursor skips a change committed late.
+"""
+
+import threading
+
+from database import SessionLocal
+from services.changes import changes_since, current_token, record_changes
+
+
+def _read(since: int) -> tuple[int, set]:
+    with SessionLocal() as db:
+        token = current_token(db)
+        latest, _, _ = changes_since(db, since, token, limit=1000)
+        return token, set(latest["problem"])
+
+
+def test_interleaved_writers_do_not_skip_changes(client):
+    # Entity ids that no real problem uses; the log doesn't check them
+    first_id, second_id = 10_000_001, 10_000_002
+    with SessionLocal() as db:
+        start = current_token(db)
+
+    first = SessionLocal()
+    record_changes(first, "problem", [first_id])  # token drawn, not committed
+
+    def second_writer():
+        with SessionLocal() as db:
+            record_changes(db, "problem", [second_id])
+            db.commit()
+
+    second = threading.Thread(target=second_writer)
+    second.start()
+    # Give the second writer time to commit, if nothing makes it wait for the first
+    second.join(timeout=0.5)
+
+    cursor, seen = _read(start)
+    first.commit()
+    first.close()
+    second.join()
+
+    _, later = _read(cursor)
+    assert {first_id, second_id} <= seen | later
+
@@ -0,0 +1,84 @@
+"""
+Paths that are written differently per database: tag containment, title
+search, UPDATE ... RETURNING, and ON DELETE CASCADE with foreign keys.
+tests/test_backends.py runs these on each backend; the last tests check
+the PostgreSQL-only SQL directly.
+"""
+
+import pytest
+from sqlalchemy import func, inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError
+
+from database import IS_POSTGRESQL, SessionLocal, engine
+from models import Attempt, ProblemTimingSketch
+from services.changes import record_changes
+from services.query_budget import count_statements
+
+postgresql_only = pytest.mark.skipif(not IS_POSTGRESQL, reason="PostgreSQL-only SQL")
+
+
+def test_tag_filter(client):
+    body = client.get("/api/problems", params={"tag": "array"}).json()
+    assert body and all("array" in p["tags"] for p in body)
+
+
+def test_title_search(client):
+    body = client.get("/api/problems", params={"search": "valid pal"}).json()
+    assert [p["title"] for p in body] == ["Valid Palindrome"]
+
+
+def test_update_returning(client, make_problem):
+    before = make_problem("Update Returning", tags=["a"])
+    after = client.put(f"/api/problems/{before['id']}", json={"tags": ["b", "a"]}).json()
+    assert after["tags"] == ["b", "a"]
+    assert after["updated_at"] > before["updated_at"] and after["version"] == before["version"] + 1
+    assert client.get(f"/api/problems/{before['id']}").json()["tags"] == ["b", "a"]
+
+
+def test_delete_cascades_and_foreign_keys_hold(client, make_problem):
+    problem_id = make_problem("Cascade Target")["id"]
+    for outcome in ("PASS", "FAIL", "SHAKY"):
+        client.post(f"/api/problems/{problem_id}/attempt", json={"outcome": outcome, "time_spent_minutes": 10})
+    assert client.delete(f"/api/problems/{problem_id}").status_code == 204
+
+    with SessionLocal() as db:
+        assert not db.query(func.count(Attempt.id)).filter(Attempt.problem_id == problem_id).scalar()
+        assert db.get(ProblemTimingSketch, problem_id) is None
+        db.add(Attempt(problem_id=problem_id, outcome="PASS"))
+        with pytest.raises(IntegrityError):
+            db.flush()
+
+
+@postgresql_only
+def test_tags_are_jsonb_with_gin_indexes(client):
+    tags = next(column for column in inspect(engine).get_columns("problems") if column["name"] == "tags")
+    assert isinstance(tags["type"], JSONB)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'problems'"))
+        indexes = dict(rows.all())
+    for name in ("ix_problems_tags_gin", "ix_problems_title_fts"):
+        assert "USING gin" in indexes[name]
+
+
+@postgresql_only
+def test_change_log_writer_holds_advisory_lock(client):
+    with SessionLocal() as db:
+        record_changes(db, "problem", [10_000_003])
+        held = db.execute(text(
+            "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted"
+        )).scalar()
+        db.rollback()
+    assert held == 1
+
+
+@postgresql_only
+def test_attempt_uses_insert_select_for_update_returning(client, make_problem):
+    problem_id = make_problem("Ladder Statement")["id"]
+    with count_statements() as counter:
+        response = client.post(f"/api/problems/{problem_id}/attempt", json={"outcome": "PASS"})
+    assert response.status_code == 200, response.text
+    assert any(
+        statement.startswith("INSERT INTO attempts") and "FOR UPDATE" in statement and "RETURNING" in statement
+        for statement in counter.statements
+    ), counter.statements
@@ -0,0 +1,43 @@
+import msgpack
+import pytest
+
+from services.encoding import _quality
+
+
+@pytest.mark.parametrize("header,token,expected", [
+    ("gzip, br", "br", 1.0),
+    ("br;q=0.5, gzip", "br", 0.5),
+    ("br;q=0", "br", 0.0),
+    ("BR ; Q=0.3", "br", 0.3),
+    ("gzip", "br", 0.0),
+    ("*", "br", 0.0),
+    ("br;q=nope", "br", 0.0),
+])
+def test_quality(header, token, expected):
+    assert _quality(header, token) == expected
+
+
+def test_q_zero_is_not_acceptable(client):
+    response = client.get("/api/problems", headers={"Accept": "application/msgpack;q=0", "Accept-Encoding": "br;q=0"})
+    assert response.headers["content-type"].startswith("application/json")
+    assert "content-encoding" not in response.headers
+
+
+def test_highest_q_wins(client):
+    response = client.get("/api/problems", headers={
+        "Accept": "application/msgpack, application/json;q=0.5",
+        "Accept-Encoding": "br;q=0.2, gzip;q=0.8",
+    })
+    assert response.headers["content-type"] == "application/msgpack"
+    assert response.headers["content-encoding"] == "gzip"
+    assert isinstance(msgpack.unpackb(response.content), list)
+
+
+def test_errors_keep_their_shape(client):
+    response = client.post("/api/problems", json={}, headers={
+        "X-Response-Shape": "compact", "Accept": "application/msgpack",
+    })
+    assert response.status_code == 422
+    assert response.headers["content-type"].startswith("application/json")
+    assert "x-response-shape" not in response.headers
+    assert response.json()["detail"][0]["msg"]
@@ -0,0 +1,19 @@
+from services.metrics import DB_WRITE_LOCK_WAIT
+
+
+def _write_lock_observations() -> int:
+    return sum(count for _, _, count in DB_WRITE_LOCK_WAIT._series.values())
+
+
+def test_health_probe_only_reads(client):
+    body = client.get("/health").json()
+    assert body["status"] == "healthy"
+    assert set(body["database"]) == {"reachable", "latency_ms"}
+
+
+def test_write_lock_wait_observed_once_per_transaction(client, make_problem):
+    before = _write_lock_observations()
+    # INSERT into problems, then the change log, in one transaction
+    make_problem("Lock Wait")
+    assert _write_lock_observations() == before + 1
+    assert "lctracker_db_write_lock_wait_seconds_count" in client.get("/metrics").text
@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import config
+from database import SessionLocal
+from models import Job, JobStatus, Problem
+from services import jobs
+
+
+def _running_job(kind: str, **fields) -> int:
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        job = Job(kind=kind, status=JobStatus.RUNNING.value, attempts=1, started_at=now, heartbeat_at=now, **fields)
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+def _job(job_id: int) -> Job:
+    with SessionLocal() as db:
+        return db.get(Job, job_id)
+
+
+def test_long_step_is_not_requeued(client, monkeypatch):
+    monkeypatch.setattr(config, "JOB_STALE_SECONDS", 0.5)
+    monkeypatch.setattr(config, "JOB_HEARTBEAT_SECONDS", 0.1)
+    runs = []
+
+    def one_long_step(ctx):
+        runs.append(ctx.job_id)
+        time.sleep(1.2)
+        return {}
+
+    monkeypatch.setitem(jobs.get_handlers(), "test_long_step", one_long_step)
+    job_id = _running_job("test_long_step")
+    worker = threading.Thread(target=jobs._run_job, args=(job_id, "test_long_step", {}))
+    worker.start()
+    time.sleep(0.9)
+    jobs._claim_next()
+    job = _job(job_id)
+    assert job.status == JobStatus.RUNNING.value and job.attempts == 1
+    worker.join()
+
+    job = _job(job_id)
+    assert job.status == JobStatus.SUCCEEDED.value
+    assert job.attempts == 1 and runs == [job_id]
+
+
+def test_stale_job_is_requeued_until_attempts_run_out(client):
+    long_ago = datetime.utcnow() - timedelta(seconds=config.JOB_STALE_SECONDS + 60)
+    later = datetime.utcnow() + timedelta(hours=1)  # keeps the requeued job from being claimed again
+    retry_id = _running_job("recompute_schedules", max_attempts=3, run_after=later)
+    exhausted_id = _running_job("recompute_schedules", max_attempts=1, run_after=later)
+    with SessionLocal() as db:
+        for job_id in (retry_id, exhausted_id):
+            db.get(Job, job_id).heartbeat_at = long_ago
+        db.commit()
+
+    jobs._claim_next()
+
+    assert _job(retry_id).status == JobStatus.QUEUED.value
+    exhausted = _job(exhausted_id)
+    assert exhausted.status == JobStatus.FAILED.value
+    assert exhausted.finished_at is not None and exhausted.error
+
+
+@pytest.mark.parametrize("outcome, stage, interval, due_in_days, expected", [
+    # (interval_days, due in days) after the job; ladder 3 -> 14, 2 -> 7
+    ("PASS", 3, 3, 3, (14, 14)),
+    ("SHAKY", 2, 3, 3, (7, 7)),
+    ("FAIL", 0, 7, 7, (1, 1)),
+    ("SKIP", 3, 14, 1, (14, 1)),
+    ("POSTPONE", 3, 14, 2, (14, 2)),
+])
+def test_recompute_schedules_follows_last_outcome(client, make_problem, outcome, stage, interval, due_in_days,
+                                                  expected):
+    problem_id = make_problem(f"Recompute {outcome}")["id"]
+    last = datetime(2026, 3, 1, 12, 0)
+    with SessionLocal() as db:
+        problem = db.get(Problem, problem_id)
+        problem.mastery_stage, problem.interval_days, problem.last_outcome = stage, interval, outcome
+        problem.last_attempted_at, problem.next_due_date = last, last + timedelta(days=due_in_days)
+        db.commit()
+
+    job_id = _running_job("recompute_schedules")
+    jobs._run_job(job_id, "recompute_schedules", {})
+    assert _job(job_id).status == JobStatus.SUCCEEDED.value
+
+    with SessionLocal() as db:
+        problem = db.get(Problem, problem_id)
+        assert (problem.interval_days, problem.next_due_date) == (expected[0], last + timedelta(days=expected[1]))
@@ -0,0 +1,162 @@
+"""
+Every route has a statement budget in services/query_budget.py, and one
+representative request per route stays within it. Each request sets up
+what it needs first, outside the counted request, and runs with every
+in-process cache empty: budgets are the cold-path counts, so a request
+that only passes while cached can't hide an N+1.
+"""
+
+import uuid
+
+import anyio
+import pytest
+
+from services import planner, tag_analytics, timing
+from services.problem_cache import problem_cache
+from services.query_budget import QUERY_BUDGETS, assert_query_budget, count_statements, missing_budgets
+from services.similarity import related_index
+from services.suggest import suggest_index
+
+
+def _attempts(client, problem_id: int) -> None:
+    for outcome in ("PASS", "FAIL", "SHAKY"):
+        client.post(f"/api/problems/{problem_id}/attempt", json={"outcome": outcome, "time_spent_minutes": 10})
+
+
+def _job(client) -> int:
+    return client.post("/api/jobs", json={"kind": "recompute_schedules"}).json()["id"]
+
+
+def _bulk_delete_target(make_problem, client) -> dict:
+    _attempts(client, make_problem("Budget Bulk Target")["id"])
+    return {"json": {"filter": {"search": "Budget Bulk Target"}}}
+
+
+def _cold_caches() -> None:
+    problem_cache.clear()
+    related_index.clear()
+    suggest_index.clear()
+    if planner.plan_stats is not None:
+        planner.plan_stats.clear()
+    for module in (tag_analytics, timing):
+        with module._cache_lock:
+            module._cache.clear()
+
+
+def _changed_since(client, make_problem) -> dict:
+    # Both a problem and an attempt changed since the cursor
+    since = client.get("/api/sync", params={"since": 0}).json()["token"]
+    _attempts(client, make_problem("Budget Sync")["id"])
+    return {"params": {"since": since}}
+
+
+def _new_problem(make_problem) -> dict:
+    make_problem("Budget New")
+    return {}
+
+
+def _archived(make_problem, client) -> int:
+    problem_id = make_problem("Budget Archived")["id"]
+    client.post("/api/problems/bulk-archive", json={"ids": [problem_id]})
+    return problem_id
+
+
+# (method, route) -> fn(client, make_problem, problem_id) returning assert_query_budget kwargs
+REQUESTS = {
+    ("GET", "/api/problems"): lambda c, mk, pid: {"params": {"sort": "difficulty"}},
+    ("GET", "/api/problems/{problem_id}"): lambda c, mk, pid: {"problem_id": pid},
+    ("POST", "/api/problems/batch-get"): lambda c, mk, pid: {
+        "json": {"ids": [pid, pid + 1], "include_attempts": True}
+    },
+    ("POST", "/api/problems"): lambda c, mk, pid: {
+        "json": {"title": "Budget Check", "difficulty": "HARD", "tags": ["budget-check"]}
+    },
+    ("PUT", "/api/problems/{problem_id}"): lambda c, mk, pid: {"problem_id": pid, "json": {"notes_trick": "checked"}},
+    ("DELETE", "/api/problems/{problem_id}"): lambda c, mk, pid: {"problem_id": mk("Budget Delete")["id"]},
+    ("POST", "/api/problems/bulk-delete"): lambda c, mk, pid: _bulk_delete_target(mk, c),
+    ("POST", "/api/problems/bulk-archive"): lambda c, mk, pid: {
+        "json": {"ids": [mk("Budget Archive", tags=["budget-archive"])["id"]]}
+    },
+    ("POST", "/api/problems/bulk-unarchive"): lambda c, mk, pid: {"json": {"ids": [_archived(mk, c)]}},
+    # First timed attempt of the problem and of its tag this month: both create their sketches
+    ("POST", "/api/problems/{problem_id}/attempt"): lambda c, mk, pid: {
+        "problem_id": mk("Budget Attempt", tags=[f"budget-{uuid.uuid4().hex}"])["id"],
+        "json": {"outcome": "PASS", "time_spent_minutes": 25},
+    },
+    ("POST", "/api/problems/{problem_id}/postpone"): lambda c, mk, pid: {"problem_id": pid},
+    ("GET", "/api/problems/{problem_id}/related"): lambda c, mk, pid: {"problem_id": pid},
+    # A never-attempted problem, so the new list has cache misses to load too
+    ("GET", "/api/today"): lambda c, mk, pid: {"params": {"group_related": True}, **_new_problem(mk)},
+    ("GET", "/api/today/plan"): lambda c, mk, pid: {"params": {"minutes": 90}},
+    ("GET", "/api/stats"): lambda c, mk, pid: {},
+    ("GET", "/api/stats/tags"): lambda c, mk, pid: {},
+    ("GET", "/api/stats/timing"): lambda c, mk, pid: {"params": {"problem_id": pid}},
+    ("GET", "/api/history"): lambda c, mk, pid: {},
+    ("GET", "/api/dashboard"): lambda c, mk, pid: _new_problem(mk),
+    ("GET", "/api/jobs/kinds"): lambda c, mk, pid: {},
+    ("GET", "/api/jobs"): lambda c, mk, pid: {},
+    ("POST", "/api/jobs"): lambda c, mk, pid: {"json": {"kind": "recompute_schedules"}},
+    ("GET", "/api/jobs/{job_id}"): lambda c, mk, pid: {"job_id": _job(c)},
+    ("POST", "/api/jobs/{job_id}/cancel"): lambda c, mk, pid: {"job_id": _job(c)},
+    ("GET", "/api/suggest"): lambda c, mk, pid: {"params": {"q": "two"}},
+    ("GET", "/api/export"): lambda c, mk, pid: {},
+    ("POST", "/api/export"): lambda c, mk, pid: {"json": {"format": "npy"}},
+    ("GET", "/api/sync"): lambda c, mk, pid: _changed_since(c, mk),
+    ("POST", "/api/sync/push"): lambda c, mk, pid: {"json": {"attempts": [
+        {"client_id": uuid.uuid4().hex, "problem_id": pid, "outcome": "SHAKY"}
+    ]}},
+}
+
+
+def test_every_route_has_a_budget():
+    assert missing_budgets() == []
+
+
+def test_every_budgeted_route_is_exercised():
+    # /api/events never completes, so it has its own test below
+    assert set(QUERY_BUDGETS) - {("GET", "/api/events")} == set(REQUESTS)
+
+
+@pytest.mark.parametrize("key", list(REQUESTS), ids=lambda key: f"{key[0]} {key[1]}")
+def test_route_within_budget(client, make_problem, key):
+    method, route = key
+    problem_id = client.get("/api/problems").json()[0]["id"]
+    kwargs = REQUESTS[key](client, make_problem, problem_id)
+    _cold_caches()
+    response = assert_query_budget(client, method, route, **kwargs)
+    assert response.status_code < 400, f"{response.status_code} {response.text[:200]}"
+
+
+def test_event_stream_within_budget(client):
+    from main import app
+
+    # TestClient reads a response to the end, and this one never ends: call
+    # the app directly and disconnect after the first chunk
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/api/events", "raw_path": b"/api/events", "root_path": "", "query_string": b"", "headers": [],
+        "server": ("testserver", 80), "client": ("testclient", 50000),
+    }
+
+    async def open_stream():
+        sent = []
+        first_chunk = anyio.Event()
+
+        async def receive():
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body":
+                first_chunk.set()
+
+        with anyio.fail_after(10):
+            await app(scope, receive, send)
+        return sent
+
+    with count_statements() as counter:
+        sent = anyio.run(open_stream)
+    assert sent[0]["status"] == 200
+    assert sent[1]["body"].startswith(b"retry:")
+    assert counter.count <= QUERY_BUDGETS[("GET", "/api/events")], counter.statements
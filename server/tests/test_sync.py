@@ -0,0 +1,107 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from database import SessionLocal
+from models import Attempt, Problem
+from services.attempts import record_attempt
+
+
+def _push(client, *attempts) -> dict:
+    response = client.post("/api/sync/push", json={"attempts": list(attempts)})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _stored(client_id: str) -> Attempt:
+    with SessionLocal() as db:
+        return db.query(Attempt).filter(Attempt.client_id == client_id).one()
+
+
+def test_push_converts_offsets_to_utc(client, make_problem):
+    problem_id = make_problem("Sync Offset")["id"]
+    client_id = uuid.uuid4().hex
+    _push(client, {
+        "client_id": client_id, "problem_id": problem_id, "outcome": "PASS",
+        "attempted_at": "2026-01-19T10:00:00+05:00",
+    })
+    assert _stored(client_id).attempted_at == datetime(2026, 1, 19, 5, 0)
+
+
+def test_concurrent_push_of_same_attempt_is_a_duplicate(client, make_problem):
+    problem_id = make_problem("Sync Race")["id"]
+    client_id = uuid.uuid4().hex
+    results = []
+
+    first = SessionLocal()
+    # Applied but not committed: a second push passes the duplicate pre-check
+    record_attempt(first, first.get(Problem, problem_id), "PASS", client_id=client_id)
+
+    second = threading.Thread(target=lambda: results.append(
+        _push(client, {"client_id": client_id, "problem_id": problem_id, "outcome": "FAIL"})
+    ))
+    second.start()
+    second.join(timeout=0.5)
+    first.commit()
+    first.close()
+    second.join()
+
+    assert results[0]["applied"] == [] and results[0]["duplicates"] == [client_id]
+    assert _stored(client_id).outcome == "PASS"
+    with SessionLocal() as db:
+        problem = db.get(Problem, problem_id)
+        assert problem.last_outcome == "PASS" and problem.mastery_stage == 1
+
+
+def test_attempt_older_than_last_is_history_only(client, make_problem):
+    problem_id = make_problem("Sync Late Replay")["id"]
+    client.post(f"/api/problems/{problem_id}/attempt", json={"outcome": "PASS"})
+    with SessionLocal() as db:
+        before = db.get(Problem, problem_id)
+        schedule = (before.mastery_stage, before.next_due_date, before.last_attempted_at, before.last_outcome)
+
+    client_id = uuid.uuid4().hex
+    body = _push(client, {
+        "client_id": client_id, "problem_id": problem_id, "outcome": "FAIL",
+        "attempted_at": (datetime.utcnow() - timedelta(days=2)).isoformat(),
+    })
+    assert [a["outcome"] for a in body["applied"]] == ["FAIL"]
+
+    with SessionLocal() as db:
+        after = db.get(Problem, problem_id)
+        assert (after.mastery_stage, after.next_due_date, after.last_attempted_at, after.last_outcome) == schedule
+    stored = _stored(client_id)
+    assert stored.stage_before == stored.stage_after == schedule[0]
+    assert stored.next_due_date_after is None
+
+
+def test_push_replays_in_order_and_skips_known_attempts(client, make_problem):
+    problem_id = make_problem("Sync Replay")["id"]
+    now = datetime.utcnow()
+    attempts = [
+        {"client_id": uuid.uuid4().hex, "problem_id": problem_id, "outcome": outcome,
+         "attempted_at": (now - timedelta(hours=hours)).isoformat()}
+        for outcome, hours in (("PASS", 3), ("PASS", 2), ("SHAKY", 1))
+    ]
+    assert len(_push(client, *reversed(attempts))["applied"]) == 3
+    retry = _push(client, *attempts)
+    assert retry["applied"] == [] and sorted(retry["duplicates"]) == sorted(a["client_id"] for a in attempts)
+    with SessionLocal() as db:
+        problem = db.get(Problem, problem_id)
+        assert (problem.mastery_stage, problem.last_outcome) == (1, "SHAKY")
+
+
+def test_late_attempt_shows_in_problem_detail(client, make_problem):
+    problem_id = make_problem("Sync Late Detail")["id"]
+    client.post(f"/api/problems/{problem_id}/attempt", json={"outcome": "PASS"})
+    # Cache the problem before the replay
+    assert len(client.get(f"/api/problems/{problem_id}").json()["attempts"]) == 1
+
+    _push(client, {
+        "client_id": uuid.uuid4().hex, "problem_id": problem_id, "outcome": "FAIL",
+        "attempted_at": (datetime.utcnow() - timedelta(days=2)).isoformat(),
+    })
+
+    assert len(client.get(f"/api/problems/{problem_id}").json()["attempts"]) == 2
+    batch = client.post("/api/problems/batch-get", json={"ids": [problem_id], "include_attempts": True}).json()
+    assert len(batch[0]["attempts"]) == 2
@@ -0,0 +1,127 @@
+"""
+Time-spent sketch accuracy against exact percentiles, measured as rank
+error: how far the estimate's rank is from the requested quantile.
+"""
+
+import bisect
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from services.tdigest import TDigest, merge_all
+
+LOG_MINUTES = {"EASY": 2.6, "MEDIUM": 3.1, "HARD": 3.6}
+MAX_RANK_ERROR = 0.02
+
+
+def rank_error(sorted_values: list, estimate: float, q: float) -> float:
+    """
+    Distance from q to the ranks of the samples on either side of the
+    estimate. Minutes are whole numbers, so an estimate between two sample
+    values counts as matching any rank either of them covers.
+    """
+    n = len(sorted_values)
+    low_value = sorted_values[max(bisect.bisect_right(sorted_values, estimate) - 1, 0)]
+    high_value = sorted_values[min(bisect.bisect_left(sorted_values, estimate), n - 1)]
+    low = bisect.bisect_left(sorted_values, low_value) / n
+    high = bisect.bisect_right(sorted_values, high_value) / n
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+def _minutes(rng: random.Random, difficulty: str) -> int:
+    return max(1, round(rng.lognormvariate(LOG_MINUTES[difficulty], 0.5)))
+
+
+def test_merged_sketches_match_exact_percentiles():
+    # One sketch per (difficulty, tag, month), round-tripped through bytes and
+    # merged per difficulty, tag and month the way /api/stats/timing does
+    rng = random.Random(0)
+    tag_names = [f"tag-{i}" for i in range(20)]
+    stored = defaultdict(TDigest)
+    exact = {"difficulty": defaultdict(list), "tag": defaultdict(list), "month": defaultdict(list)}
+    for _ in range(30_000):
+        difficulty = rng.choice(list(LOG_MINUTES))
+        month = f"m{rng.randrange(12):02d}"
+        minutes = _minutes(rng, difficulty)
+        stored[(difficulty, "", month)].add(minutes)
+        for tag in set(rng.sample(tag_names, rng.randint(1, 3))):
+            stored[(difficulty, tag, month)].add(minutes)
+            exact["tag"][tag].append(minutes)
+        exact["difficulty"][difficulty].append(minutes)
+        exact["month"][month].append(minutes)
+
+    pooled = {"difficulty": defaultdict(list), "tag": defaultdict(list), "month": defaultdict(list)}
+    for (difficulty, tag, month), digest in stored.items():
+        digest = TDigest.from_bytes(digest.to_bytes())
+        if tag:
+            pooled["tag"][tag].append(digest)
+        else:
+            pooled["difficulty"][difficulty].append(digest)
+            pooled["month"][month].append(digest)
+
+    for scope, groups in exact.items():
+        for key, values in groups.items():
+            values.sort()
+            merged = merge_all(pooled[scope][key])
+            for q in (0.5, 0.9):
+                assert rank_error(values, merged.quantile(q), q) <= MAX_RANK_ERROR, (scope, key, q)
+
+
+def test_timing_endpoint_matches_exact_percentiles(client):
+    from database import SessionLocal
+    from models import Problem
+    from services.attempts import record_attempt
+    from services.jobs import JobContext
+    from services.timing import rebuild_timing_sketches
+
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    tags = ["timing-a", "timing-b", "timing-c"]
+    exact = defaultdict(list)
+    with SessionLocal() as db:
+        problems = [
+            Problem(title=f"Timing {i}", difficulty=difficulty, tags=rng.sample(tags, rng.randint(1, 2)))
+            for i, difficulty in enumerate(list(LOG_MINUTES) * 4)
+        ]
+        db.add_all(problems)
+        db.flush()
+        for _ in range(2000):
+            problem = rng.choice(problems)
+            minutes = _minutes(rng, problem.difficulty)
+            record_attempt(db, problem, rng.choice(["PASS", "SHAKY", "FAIL"]), minutes,
+                           attempted_at=now - timedelta(days=rng.randrange(300)))
+            for tag in problem.tags:
+                exact[tag].append(minutes)
+        db.commit()
+    for values in exact.values():
+        values.sort()
+
+    def assert_accurate():
+        rows = {row["tag"]: row for row in client.get("/api/stats/timing", params={"months": 12}).json()["by_tag"]}
+        for tag, values in exact.items():
+            assert rows[tag]["count"] == len(values)
+            for name, q in (("p50", 0.5), ("p90", 0.9)):
+                assert rank_error(values, rows[tag][name], q) <= MAX_RANK_ERROR, (tag, name)
+
+    assert_accurate()
+    rebuild_timing_sketches(JobContext(0, {}))
+    assert_accurate()
+
+
+def test_negative_minutes_rejected(client, make_problem):
+    problem_id = make_problem("Negative Minutes", tags=["timing-negative"])["id"]
+    response = client.post(f"/api/problems/{problem_id}/attempt", json={"outcome": "PASS", "time_spent_minutes": -5})
+    assert response.status_code == 422
+    assert client.get("/api/stats/timing", params={"problem_id": problem_id}).json()["problem"]["count"] == 0
+
+
+def test_negative_minutes_kept_out_of_sketches(client, make_problem):
+    from database import SessionLocal
+    from models import Problem
+    from services.timing import record_time
+
+    problem_id = make_problem("Negative Stored", tags=["timing-negative"])["id"]
+    with SessionLocal() as db:
+        record_time(db, db.get(Problem, problem_id), "PASS", -5, datetime.utcnow())
+        db.commit()
+    assert client.get("/api/stats/timing", params={"problem_id": problem_id}).json()["problem"]["count"] == 0